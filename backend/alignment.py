@@ -3,10 +3,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable
+from functools import lru_cache
+from typing import Iterable, Sequence
 
+import numpy as np
 from Bio.Align import PairwiseAligner
 
+from backend.banded_alignment import AlignmentTooLargeError, BandPolicy, banded_global_align
+
+_GAP = ord("-")
+
 
 @dataclass
 class AlignmentResult:
@@ -16,83 +22,318 @@ class AlignmentResult:
     alignment_length: int
 
 
-def _compute_identity(alignment_tuple) -> tuple[float, int]:
-    seq_a, seq_b, score, _, _ = alignment_tuple
-    matches = sum(1 for a, b in zip(seq_a, seq_b) if a == b and a != "-" and b != "-")
-    alignment_length = max(len(seq_a.replace("-", "")), len(seq_b.replace("-", "")))
-    if alignment_length == 0:
-        return 0.0, 0
-    identity = (matches / alignment_length) * 100
-    return identity, alignment_length
-
-
-def _build_aligned_strings(alignment, seq_a: str, seq_b: str) -> tuple[str, str]:
-    coords_a = alignment.aligned[0]
-    coords_b = alignment.aligned[1]
-    pieces_a: list[str] = []
-    pieces_b: list[str] = []
-    pos_a = 0
-    pos_b = 0
-    for (start_a, end_a), (start_b, end_b) in zip(coords_a, coords_b):
-        if start_a > pos_a:
-            pieces_a.append(seq_a[pos_a:start_a])
-            pieces_b.append("-" * (start_a - pos_a))
-        if start_b > pos_b:
-            pieces_b.append(seq_b[pos_b:start_b])
-            pieces_a.append("-" * (start_b - pos_b))
-        pieces_a.append(seq_a[start_a:end_a])
-        pieces_b.append(seq_b[start_b:end_b])
-        pos_a = end_a
-        pos_b = end_b
-    if pos_a < len(seq_a):
-        pieces_a.append(seq_a[pos_a:])
-        pieces_b.append("-" * (len(seq_a) - pos_a))
-    if pos_b < len(seq_b):
-        pieces_b.append(seq_b[pos_b:])
-        pieces_a.append("-" * (len(seq_b) - pos_b))
-    aligned_a = "".join(pieces_a)
-    aligned_b = "".join(pieces_b)
-    return aligned_a, aligned_b
-
-
-def align_sequences(seq_a: str, seq_b: str) -> AlignmentResult:
-    """Align two sequences and derive simple alignment metrics."""
+@dataclass(frozen=True)
+class ScoringProfile:
+    """Scoring parameters used to configure a pairwise aligner."""
+
+    mode: str = "global"
+    match_score: float = 1
+    mismatch_score: float = 0
+    open_gap_score: float = -1
+    extend_gap_score: float = -0.5
+
+
+DEFAULT_PROFILE = ScoringProfile()
+
+
+def _as_bytes(sequence: str) -> np.ndarray:
+    return np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)
+
+
+def count_aligned_matches(coordinates, seq_a: np.ndarray, seq_b: np.ndarray) -> int:
+    """Count identical, non-gap residues across the aligned blocks of an alignment."""
+
+    matches = 0
+    for (start_a, end_a), (start_b, end_b) in zip(coordinates[0], coordinates[1]):
+        block_a = seq_a[start_a:end_a]
+        matches += int(np.count_nonzero((block_a == seq_b[start_b:end_b]) & (block_a != _GAP)))
+    return matches
+
+
+class AlignerEngine:
+    """A pairwise aligner configured once for a scoring profile.
+
+    Engines are not mutated after construction, so a single instance can be
+    shared across threads. With a ``band`` policy, pairs large enough to fall
+    under it are aligned by the banded kernel instead of the full-matrix
+    aligner. Its band widens until the score is provably optimal, so scores
+    agree with the full-matrix aligner, though co-optimal alignments may differ
+    in match count; only a pair whose band would outgrow the policy's DP
+    memory cap first keeps a lower-bound score.
+    """
+
+    def __init__(self, profile: ScoringProfile = DEFAULT_PROFILE, band: BandPolicy | None = None) -> None:
+        if band is not None and (profile.mode != "global" or profile.open_gap_score > profile.extend_gap_score):
+            raise ValueError("Banded alignment requires a global profile with open_gap_score <= extend_gap_score.")
+        self.profile = profile
+        self.band = band
+        aligner = PairwiseAligner()
+        aligner.mode = profile.mode
+        aligner.match_score = profile.match_score
+        aligner.mismatch_score = profile.mismatch_score
+        aligner.open_gap_score = profile.open_gap_score
+        aligner.extend_gap_score = profile.extend_gap_score
+        self.aligner = aligner
+
+    def align(self, seq_a: str, seq_b: str) -> AlignmentResult:
+        """Align two sequences and derive simple alignment metrics."""
+
+        if not seq_a or not seq_b:
+            return AlignmentResult(score=0.0, identity=0.0, coverage=0.0, alignment_length=0)
+
+        upper_a = seq_a.upper()
+        upper_b = seq_b.upper()
+        bytes_a = _as_bytes(upper_a)
+        bytes_b = _as_bytes(upper_b)
+        if self.band is not None and self.band.applies(len(upper_a), len(upper_b)):
+            banded = banded_global_align(
+                bytes_a,
+                bytes_b,
+                self.band,
+                match_score=self.profile.match_score,
+                mismatch_score=self.profile.mismatch_score,
+                open_gap_score=self.profile.open_gap_score,
+                extend_gap_score=self.profile.extend_gap_score,
+            )
+            score = banded.score
+            matches = banded.matches
+        else:
+            alignment = self.aligner.align(upper_a, upper_b)[0]
+            score = alignment.score
+            matches = count_aligned_matches(alignment.aligned, bytes_a, bytes_b)
+
+        # Every residue of both inputs appears once in a global alignment, so the
+        # ungapped lengths are the input lengths minus any literal gap characters.
+        alignment_length = max(
+            len(bytes_a) - int(np.count_nonzero(bytes_a == _GAP)),
+            len(bytes_b) - int(np.count_nonzero(bytes_b == _GAP)),
+        )
+        identity = (matches / alignment_length) * 100 if alignment_length else 0.0
 
-    if not seq_a or not seq_b:
-        return AlignmentResult(score=0.0, identity=0.0, coverage=0.0, alignment_length=0)
-
-    aligner = PairwiseAligner()
-    aligner.mode = "global"
-    aligner.match_score = 1
-    aligner.mismatch_score = 0
-    aligner.open_gap_score = -1
-    aligner.extend_gap_score = -0.5
-
-    alignment = aligner.align(seq_a.upper(), seq_b.upper())[0]
-    aligned_a, aligned_b = _build_aligned_strings(alignment, seq_a.upper(), seq_b.upper())
-    identity, alignment_length = _compute_identity((aligned_a, aligned_b, alignment.score, None, None))
-    score = alignment.score
-
-    coverage = 0.0
-    if len(seq_b) > 0:
         coverage = min(100.0, (alignment_length / len(seq_b)) * 100)
 
-    return AlignmentResult(
-        score=score,
-        identity=round(identity, 2),
-        coverage=round(coverage, 2),
-        alignment_length=alignment_length,
+        return AlignmentResult(
+            score=score,
+            identity=round(identity, 2),
+            coverage=round(coverage, 2),
+            alignment_length=alignment_length,
+        )
+
+
+@lru_cache(maxsize=None)
+def _engine_for(profile: ScoringProfile, band: BandPolicy | None) -> AlignerEngine:
+    return AlignerEngine(profile, band)
+
+
+def get_engine(profile: ScoringProfile = DEFAULT_PROFILE, band: BandPolicy | None = None) -> AlignerEngine:
+    """Return the shared engine for ``profile`` and ``band``, building it on first use."""
+
+    return _engine_for(profile, band)
+
+
+def align_sequences(seq_a: str, seq_b: str, *, engine: AlignerEngine | None = None) -> AlignmentResult:
+    """Align two sequences and derive simple alignment metrics."""
+
+    return (engine or get_engine()).align(seq_a, seq_b)
+
+
+def is_better_match(candidate: AlignmentResult, current: AlignmentResult) -> bool:
+    """Return True when ``candidate`` beats ``current``: higher identity, then higher score."""
+
+    return candidate.identity > current.identity or (
+        candidate.identity == current.identity and candidate.score > current.score
     )
 
 
-def best_match(sequence: str, reference_records: Iterable[tuple[str, str]]) -> tuple[str, AlignmentResult]:
-    best_label = ""
+@dataclass
+class MatchStats:
+    """Counts of references aligned, pruned and skipped as too large by ``best_match``."""
+
+    aligned: int = 0
+    pruned: int = 0
+    oversized: int = 0
+
+    def merge(self, other: "MatchStats") -> None:
+        self.aligned += other.aligned
+        self.pruned += other.pruned
+        self.oversized += other.oversized
+
+    def as_dict(self) -> dict[str, int]:
+        return {"aligned": self.aligned, "pruned": self.pruned, "oversized": self.oversized}
+
+
+def align_within_cap(
+    engine: AlignerEngine, seq_a: str, seq_b: str, stats: MatchStats | None = None
+) -> AlignmentResult | None:
+    """Align a pair, or return None when it would exceed the band policy's DP memory cap.
+
+    Skipped pairs are counted in ``stats.oversized``; a query whose every
+    candidate is skipped is reported unaligned instead of failing its batch.
+    """
+
+    try:
+        return engine.align(seq_a, seq_b)
+    except AlignmentTooLargeError:
+        if stats is not None:
+            stats.oversized += 1
+        return None
+
+
+def base_composition(sequence: str) -> tuple[np.ndarray, int]:
+    """Return the per-byte counts of upper-cased ``sequence``, gaps excluded, and their total."""
+
+    counts = np.bincount(_as_bytes(sequence.upper()), minlength=256)
+    counts[_GAP] = 0
+    return counts, int(counts.sum())
+
+
+def _bound(shared: int, length_a: int, length_b: int) -> float:
+    longest = max(length_a, length_b)
+    if longest == 0:
+        return 0.0
+    return round(shared / longest * 100, 2)
+
+
+def identity_upper_bound(seq_a: str, seq_b: str) -> float:
+    """Return an upper bound on ``align_sequences(seq_a, seq_b).identity``.
+
+    Matches cannot exceed the shared base composition of the two sequences
+    (itself at most the shorter length), and identity divides matches by the
+    longer ungapped length. The bound is rounded like the identity it bounds.
+    Searches over a catalog use :class:`ReferenceCompositions` instead, so that
+    neither side is counted more than once.
+    """
+
+    if not seq_a or not seq_b:
+        return 0.0
+    counts_a, length_a = base_composition(seq_a)
+    counts_b, length_b = base_composition(seq_b)
+    return _bound(int(np.minimum(counts_a, counts_b).sum()), length_a, length_b)
+
+
+class ReferenceCompositions:
+    """Base compositions of a reference catalog, counted once for :func:`identity_upper_bound` pruning.
+
+    Counts are kept for the bytes that occur in the catalog only; a query byte
+    absent from every reference cannot be shared with any of them.
+    """
+
+    def __init__(self, alphabet: np.ndarray, counts: np.ndarray, lengths: np.ndarray) -> None:
+        self.alphabet = alphabet
+        self.counts = counts
+        self.lengths = lengths
+
+    @classmethod
+    def from_records(cls, records: Iterable[tuple[str, str]]) -> "ReferenceCompositions":
+        sparse = []
+        for _, sequence in records:
+            codes, counts = np.unique(_as_bytes(str(sequence).upper()), return_counts=True)
+            keep = codes != _GAP
+            sparse.append((codes[keep], counts[keep]))
+        alphabet = np.unique(np.concatenate([codes for codes, _ in sparse])) if sparse else np.empty(0, np.uint8)
+        columns = np.full(256, -1, dtype=np.int64)
+        columns[alphabet] = np.arange(len(alphabet))
+        matrix = np.zeros((len(sparse), len(alphabet)), dtype=np.int32)
+        for row, (codes, counts) in enumerate(sparse):
+            matrix[row, columns[codes]] = counts
+        return cls(alphabet, matrix, matrix.sum(axis=1, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def subset(self, positions: Sequence[int]) -> "ReferenceCompositions":
+        """The compositions of the records at ``positions``, in that order."""
+
+        positions = np.asarray(positions, dtype=np.int64)
+        return ReferenceCompositions(self.alphabet, self.counts[positions], self.lengths[positions])
+
+    def composition(self, position: int) -> tuple[np.ndarray, int]:
+        """The :func:`base_composition` of the record at ``position``."""
+
+        counts = np.zeros(256, dtype=np.int64)
+        counts[self.alphabet] = self.counts[position]
+        return counts, int(self.lengths[position])
+
+    def bounds(self, composition: tuple[np.ndarray, int], positions: Sequence[int] | None = None) -> list[float]:
+        """Return :func:`identity_upper_bound` of a query against each record (or those at ``positions``).
+
+        ``composition`` is the query's :func:`base_composition`.
+        """
+
+        counts, lengths = self.counts, self.lengths
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            counts, lengths = counts[positions], lengths[positions]
+        query_counts, query_length = composition
+        shared = np.minimum(counts, query_counts[self.alphabet]).sum(axis=1)
+        return [_bound(common, query_length, length) for common, length in zip(shared.tolist(), lengths.tolist())]
+
+
+def best_match_index(
+    sequence: str,
+    reference_records: Sequence[tuple[str, str]],
+    *,
+    engine: AlignerEngine | None = None,
+    stats: MatchStats | None = None,
+    positions: Sequence[int] | None = None,
+    compositions: ReferenceCompositions | None = None,
+) -> tuple[int, AlignmentResult]:
+    """Return the position of the best reference (``-1`` if none) and its metrics.
+
+    References are visited in decreasing order of :func:`identity_upper_bound`
+    and the search stops once no remaining bound can reach the current best
+    identity. Equal results resolve to the earliest reference, so the answer
+    matches an exhaustive scan in catalog order. ``positions`` restricts the
+    search to those records (in catalog order); ``compositions`` takes the
+    catalog's :class:`ReferenceCompositions`, otherwise counted for this call.
+    """
+
+    engine = engine or get_engine()
+    if positions is None:
+        positions = range(len(reference_records))
+    positions = [int(position) for position in positions]
+    if compositions is None:
+        bounds = ReferenceCompositions.from_records(reference_records[position] for position in positions).bounds(
+            base_composition(sequence)
+        )
+    else:
+        bounds = compositions.bounds(base_composition(sequence), positions)
+    order = sorted(range(len(bounds)), key=lambda rank: -bounds[rank])
+
+    best_position = -1
     best_alignment = AlignmentResult(score=0.0, identity=0.0, coverage=0.0, alignment_length=0)
-    for label, ref_sequence in reference_records:
-        result = align_sequences(sequence, ref_sequence)
-        if result.identity > best_alignment.identity or (
-            result.identity == best_alignment.identity and result.score > best_alignment.score
+    for rank, candidate in enumerate(order):
+        if bounds[candidate] < best_alignment.identity:
+            if stats is not None:
+                stats.pruned += len(order) - rank
+            break
+        position = positions[candidate]
+        result = align_within_cap(engine, sequence, reference_records[position][1], stats)
+        if result is None:
+            continue
+        if stats is not None:
+            stats.aligned += 1
+        if is_better_match(result, best_alignment) or (
+            best_position > position
+            and result.identity == best_alignment.identity
+            and result.score == best_alignment.score
         ):
-            best_label = label
+            best_position = position
             best_alignment = result
-    return best_label, best_alignment
+    return best_position, best_alignment
+
+
+def best_match(
+    sequence: str,
+    reference_records: Iterable[tuple[str, str]],
+    *,
+    engine: AlignerEngine | None = None,
+    stats: MatchStats | None = None,
+    positions: Sequence[int] | None = None,
+    compositions: ReferenceCompositions | None = None,
+) -> tuple[str, AlignmentResult]:
+    records = reference_records if isinstance(reference_records, Sequence) else list(reference_records)
+    position, metrics = best_match_index(
+        sequence, records, engine=engine, stats=stats, positions=positions, compositions=compositions
+    )
+    return (records[position][0] if position >= 0 else ""), metrics
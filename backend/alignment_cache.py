@@ -0,0 +1,248 @@
+"""Two-tier cache of pairwise alignment results keyed by sequence digests."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterable, Optional
+
+from backend.alignment import AlignerEngine, AlignmentResult
+
+DEFAULT_CACHE_SIZE = 10_000
+# Disk-tier writes are committed together once this many are pending or this long after the last commit.
+COMMIT_EVERY = 256
+COMMIT_INTERVAL_SECONDS = 1.0
+COUNTERS = ("hits", "disk_hits", "misses")
+
+
+def sequence_digest(sequence: str) -> str:
+    return hashlib.blake2b(sequence.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def engine_digest(engine: AlignerEngine) -> str:
+    """Digest of the scoring profile and band policy an engine aligns with."""
+
+    return hashlib.blake2b(repr((engine.profile, engine.band)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def catalog_fingerprint(engine: AlignerEngine, catalogs: Iterable[Iterable[tuple[str, str]]]) -> str:
+    """Digest of the reference catalogs and scoring parameters results were computed against."""
+
+    digest = hashlib.blake2b(engine_digest(engine).encode("utf-8"), digest_size=16)
+    for records in catalogs:
+        for label, sequence in records:
+            digest.update(f"{label}\t{sequence_digest(str(sequence))}\n".encode("utf-8"))
+        digest.update(b"--\n")
+    return digest.hexdigest()
+
+
+class AlignmentCache:
+    """In-memory LRU of alignment results with an optional SQLite tier.
+
+    Keys combine the digests of both sequences with the engine digest, so a
+    changed reference sequence or scoring profile never hits a stale entry.
+    The on-disk tier additionally records the fingerprint of the catalogs it
+    was filled against and is purged when opened with a different one. Its
+    writes are committed in batches (see :meth:`flush`), so entries reach
+    other processes sharing the file within ``COMMIT_INTERVAL_SECONDS`` of
+    the next write or flush.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_CACHE_SIZE,
+        path: Optional[str | Path] = None,
+        fingerprint: str = "",
+    ) -> None:
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, AlignmentResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        if self.path is not None:
+            self._open_disk_tier()
+
+    def _open_disk_tier(self) -> None:
+        assert self.path is not None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS alignments ("
+            "key TEXT PRIMARY KEY, score REAL, identity REAL, coverage REAL, alignment_length INTEGER)"
+        )
+        row = connection.execute("SELECT value FROM cache_meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != self.fingerprint:
+            connection.execute("DELETE FROM alignments")
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('fingerprint', ?)", (self.fingerprint,)
+            )
+        connection.commit()
+        self._connection = connection
+        # Pending writes are committed when the cache is closed or collected, or at exit.
+        self._finalizer = weakref.finalize(self, _commit_and_close, connection)
+
+    def close(self) -> None:
+        """Commit pending disk-tier writes and close the SQLite connection."""
+
+        with self._lock:
+            if self._connection is not None:
+                self._finalizer()
+                self._connection = None
+
+    def config(self) -> dict[str, object]:
+        """Arguments that rebuild an equivalent cache, e.g. inside a worker process."""
+
+        return {"max_entries": self.max_entries, "path": self.path, "fingerprint": self.fingerprint}
+
+    @staticmethod
+    def key(seq_a: str, seq_b: str, engine_key: str, *, digest_a: Optional[str] = None) -> str:
+        return f"{digest_a or sequence_digest(seq_a)}:{sequence_digest(seq_b)}:{engine_key}"
+
+    def get(self, key: str) -> Optional[AlignmentResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return replace(result)
+            if self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT score, identity, coverage, alignment_length FROM alignments WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    result = AlignmentResult(score=row[0], identity=row[1], coverage=row[2], alignment_length=row[3])
+                    self._remember(key, result)
+                    self.disk_hits += 1
+                    return replace(result)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: AlignmentResult) -> None:
+        with self._lock:
+            self._remember(key, replace(result))
+            if self._connection is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO alignments VALUES (?, ?, ?, ?, ?)",
+                    (key, result.score, result.identity, result.coverage, result.alignment_length),
+                )
+                self._pending += 1
+                if self._pending >= COMMIT_EVERY or time.monotonic() - self._last_commit >= COMMIT_INTERVAL_SECONDS:
+                    self._commit()
+
+    def flush(self) -> None:
+        """Commit pending disk-tier writes."""
+
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def _commit(self) -> None:
+        assert self._connection is not None
+        self._connection.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def _remember(self, key: str, result: AlignmentResult) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM alignments")
+                self._commit()
+
+    def drain_counters(self) -> dict[str, int]:
+        """Return the hit/miss counters and reset them, e.g. to report a worker's lookups to its parent."""
+
+        with self._lock:
+            counters = {name: getattr(self, name) for name in COUNTERS}
+            self.hits = self.disk_hits = self.misses = 0
+            return counters
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                **counter_stats({name: getattr(self, name) for name in COUNTERS}),
+                "persistent": self._connection is not None,
+            }
+
+
+def _commit_and_close(connection: sqlite3.Connection) -> None:
+    connection.commit()
+    connection.close()
+
+
+def counter_stats(counters: dict[str, int]) -> dict[str, object]:
+    """Return hit/miss ``counters`` with their hit rate."""
+
+    lookups = sum(counters.get(name, 0) for name in COUNTERS)
+    hits = counters.get("hits", 0) + counters.get("disk_hits", 0)
+    return {
+        **{name: counters.get(name, 0) for name in COUNTERS},
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+class CachedAlignerEngine(AlignerEngine):
+    """An :class:`AlignerEngine` that consults an :class:`AlignmentCache` before aligning.
+
+    A query is aligned against many references in a row, so each thread
+    remembers the digest of the last query it saw (by identity) instead of
+    rehashing it per reference; no query string is kept beyond that.
+    """
+
+    def __init__(self, engine: AlignerEngine, cache: AlignmentCache) -> None:
+        super().__init__(engine.profile, engine.band)
+        self.cache = cache
+        self._engine_key = engine_digest(engine)
+        self._last_query = threading.local()
+
+    def _query_digest(self, sequence: str) -> str:
+        last = getattr(self._last_query, "entry", None)
+        if last is not None and last[0] is sequence:
+            return last[1]
+        digest = sequence_digest(sequence)
+        self._last_query.entry = (sequence, digest)
+        return digest
+
+    def align(self, seq_a: str, seq_b: str) -> AlignmentResult:
+        key = self.cache.key(seq_a, seq_b, self._engine_key, digest_a=self._query_digest(seq_a))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = super().align(seq_a, seq_b)
+        self.cache.put(key, result)
+        return result
+
+
+def create_alignment_cache(fingerprint: str) -> Optional[AlignmentCache]:
+    """Build a cache from ``VETPATHOGEN_ALIGNMENT_CACHE_SIZE``/``_PATH``; None when disabled."""
+
+    max_entries = int(os.getenv("VETPATHOGEN_ALIGNMENT_CACHE_SIZE", str(DEFAULT_CACHE_SIZE)))
+    if max_entries <= 0:
+        return None
+    path = os.getenv("VETPATHOGEN_ALIGNMENT_CACHE_PATH") or None
+    return AlignmentCache(max_entries=max_entries, path=path, fingerprint=fingerprint)
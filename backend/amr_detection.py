@@ -3,11 +3,17 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Sequence
 
 import pandas as pd
 
-from backend.alignment import best_match
+from backend.alignment import AlignerEngine, AlignmentResult, MatchStats, ReferenceCompositions, best_match
+from backend.kmer_index import KmerIndex
+from backend.parallel import CatalogMatcher
+from backend.reference_bundle import read_reference, reference_bundle, reference_records
+from backend.reference_clusters import ReferenceClusters
+from backend.seed_search import GeneHit, SeedIndex, best_hit, distinct_hits
+from backend.sequence_batch import SequenceBatch, ensure_batch
 
 
 def load_reference(reference_csv: str | Path) -> pd.DataFrame:
@@ -16,35 +22,124 @@ def load_reference(reference_csv: str | Path) -> pd.DataFrame:
     path = Path(reference_csv)
     if not path.exists():
         raise FileNotFoundError(f"Reference CSV not found: {path}")
-    df = pd.read_csv(path)
+    df = read_reference(path, "gene_name")
     required = {"gene_name", "sequence"}
-    if not required.issubset(df.columns):
+    columns = set(df.columns) | ({"sequence"} if reference_bundle(df) is not None else set())
+    if not required.issubset(columns):
         raise ValueError(f"Reference CSV must contain {required}, got {df.columns.tolist()}")
-    df["sequence"] = df["sequence"].str.upper()
     return df
 
 
 def detect_amr_genes(
-    records: Iterable[dict[str, object]],
+    records: SequenceBatch | Iterable[dict[str, object]],
     reference_df: pd.DataFrame,
+    *,
+    index: KmerIndex | None = None,
+    engine: AlignerEngine | None = None,
+    seed_index: SeedIndex | None = None,
+    matcher: CatalogMatcher | None = None,
+    stats: MatchStats | None = None,
+    clusters: ReferenceClusters | None = None,
 ) -> list[dict[str, object]]:
-    """Return the closest AMR gene match with alignment metrics for each record."""
+    """Return the closest AMR gene match with alignment metrics for each record.
+
+    When ``index`` is provided, each record is only aligned against the genes
+    it shortlists instead of the whole catalog; ``clusters`` instead aligns
+    against cluster representatives first and then only against members of
+    the best-scoring clusters. When ``seed_index`` is
+    provided, records much longer than the catalog genes (assembled contigs)
+    are searched by seed-and-extend: every distinct gene hit is listed in
+    ``amr_hits`` and the best one fills the single-gene fields with its 1-based
+    ``amr_start``/``amr_end`` coordinates; whole-sequence matches span the
+    full record. A ``matcher`` runs the whole-sequence matches on its process
+    pool instead of in this thread. ``stats`` accumulates how many references
+    were aligned or pruned. Records may be a :class:`SequenceBatch`, whose
+    sequences are decoded one at a time.
+    """
 
     results = []
-    reference_iterable = reference_df[["gene_name", "sequence"]].itertuples(index=False, name=None)
-    reference_cache = list(reference_iterable)
-
-    for record in records:
-        sequence = str(record["sequence"]).upper()
-        gene_name, metrics = best_match(sequence, reference_cache)
-        result = {
-            "id": record["id"],
-            "amr_gene": gene_name or "N/A",
-            "amr_identity": metrics.identity,
-            "amr_coverage": metrics.coverage,
-            "amr_score": metrics.score,
-        }
-        # Backwards-compatible field for existing UI
-        result["similarity"] = metrics.identity
-        results.append(result)
+    reference_cache = reference_records(reference_df, "gene_name")
+
+    batch = ensure_batch(records)
+    lengths = batch.lengths
+    whole_sequence = [
+        position
+        for position in range(len(batch))
+        if seed_index is None or not seed_index.applies_to_length(int(lengths[position]))
+    ]
+    if matcher is not None:
+        whole_matches = matcher.best_matches([batch.sequence(position) for position in whole_sequence], stats)
+    elif clusters is not None:
+        whole_matches = [
+            clusters.best_match(sequence, engine=engine, stats=stats)
+            for sequence in map(batch.sequence, whole_sequence)
+        ]
+    elif index is not None:
+        whole_matches = [
+            best_match(
+                sequence,
+                index.records,
+                engine=engine,
+                stats=stats,
+                positions=index.shortlist_positions(sequence),
+                compositions=index.compositions,
+            )
+            for sequence in map(batch.sequence, whole_sequence)
+        ]
+    else:
+        compositions = ReferenceCompositions.from_records(reference_cache)
+        whole_matches = [
+            best_match(sequence, reference_cache, engine=engine, stats=stats, compositions=compositions)
+            for sequence in map(batch.sequence, whole_sequence)
+        ]
+    matches = dict(zip(whole_sequence, whole_matches))
+
+    for position, record_id in enumerate(batch.ids):
+        if position in matches:
+            results.append(amr_result(record_id, int(lengths[position]), matches[position]))
+        else:
+            hits = distinct_hits(seed_index.locate(batch.sequence(position), engine=engine))
+            results.append(amr_hits_result(record_id, hits))
     return results
+
+
+def amr_result(record_id: object, sequence_length: int, match: tuple[str, AlignmentResult]) -> dict[str, object]:
+    """Return the AMR result row of a whole-sequence ``(gene_name, metrics)`` match."""
+
+    gene_name, metrics = match
+    if not gene_name:
+        return amr_hits_result(record_id, [])
+    return amr_hits_result(record_id, [GeneHit(gene=gene_name, start=1, end=sequence_length, metrics=metrics)])
+
+
+def amr_hits_result(record_id: object, hits: Sequence[GeneHit]) -> dict[str, object]:
+    """Return the AMR result row of a record's gene hits.
+
+    The single-gene fields describe the best hit; ``amr_hits`` lists every hit
+    as ``gene:start-end:strand:identity:coverage``, separated by ``;``, with
+    forward-strand coordinates.
+    """
+
+    hit = best_hit(hits)
+    metrics = hit.metrics if hit else AlignmentResult(0.0, 0.0, 0.0, 0)
+    result = {
+        "id": record_id,
+        "amr_gene": hit.gene if hit else "N/A",
+        "amr_identity": metrics.identity,
+        "amr_coverage": metrics.coverage,
+        "amr_score": metrics.score,
+        "amr_start": hit.start if hit else None,
+        "amr_end": hit.end if hit else None,
+        "amr_strand": hit.strand if hit else None,
+        "amr_hit_count": len(hits),
+        "amr_hits": format_hits(hits),
+    }
+    # Backwards-compatible field for existing UI
+    result["similarity"] = metrics.identity
+    return result
+
+
+def format_hits(hits: Iterable[GeneHit]) -> str:
+    return ";".join(
+        f"{hit.gene}:{hit.start}-{hit.end}:{hit.strand}:{hit.metrics.identity}:{hit.metrics.coverage}" for hit in hits
+    )
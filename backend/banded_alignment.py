@@ -0,0 +1,265 @@
+"""Banded global alignment with bounded memory for long sequences."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+_GAP = ord("-")
+_NEG_INF = -np.inf
+
+# Approximate bytes held per band cell by the row-wise kernel (three DP states
+# carrying score, match count and edge flag for the previous and current row,
+# plus temporaries).
+BANDED_CELL_BYTES = 96
+# Approximate bytes per cell of the full-matrix aligner (score and traceback
+# matrices for three affine states).
+FULL_MATRIX_CELL_BYTES = 16
+
+
+class AlignmentTooLargeError(ValueError):
+    """Raised when an alignment would exceed the configured DP memory cap."""
+
+
+@dataclass(frozen=True)
+class BandPolicy:
+    """Settings for the opt-in banded alignment mode.
+
+    ``min_cells`` is the DP size (``len_a * len_b``) from which the banded kernel
+    replaces the full-matrix aligner. The initial band half-width is
+    ``expected_divergence`` of the shorter sequence (at least ``min_width``) on
+    top of the length difference, and doubles until no path leaving the band
+    can outscore the best one inside it (see :func:`banded_global_align`).
+    ``max_dp_bytes`` caps the DP allocation of either aligner.
+    """
+
+    min_cells: int = 1_000_000
+    expected_divergence: float = 0.1
+    min_width: int = 32
+    max_dp_bytes: int = 512 * 1024 * 1024
+
+    def applies(self, len_a: int, len_b: int) -> bool:
+        full_bytes = (len_a + 1) * (len_b + 1) * FULL_MATRIX_CELL_BYTES
+        return len_a * len_b >= self.min_cells or full_bytes > self.max_dp_bytes
+
+    def initial_width(self, len_a: int, len_b: int) -> int:
+        return max(self.min_width, math.ceil(self.expected_divergence * min(len_a, len_b)))
+
+
+@dataclass
+class BandedAlignment:
+    score: float
+    matches: int
+    half_width: int
+    touched_edge: bool
+    optimal: bool = False
+
+
+def _band_limits(len_a: int, len_b: int, half_width: int) -> tuple[int, int]:
+    low = max(-len_a, min(0, len_b - len_a) - half_width)
+    high = min(len_b, max(0, len_b - len_a) + half_width)
+    return low, high
+
+
+def _banded_pass(
+    seq_a: np.ndarray,
+    seq_b: np.ndarray,
+    half_width: int,
+    *,
+    match_score: float,
+    mismatch_score: float,
+    open_gap_score: float,
+    extend_gap_score: float,
+) -> BandedAlignment:
+    """Run one global affine-gap DP restricted to a diagonal band.
+
+    Cells are addressed by diagonal ``j - i`` so each row is a fixed-width
+    vector. Instead of a traceback matrix, every cell carries the match count
+    and an edge flag of its best path, so memory stays linear in the band width.
+    """
+
+    len_a = len(seq_a)
+    len_b = len(seq_b)
+    low, high = _band_limits(len_a, len_b, half_width)
+    width = high - low + 1
+    offsets = np.arange(width)
+    diagonals = low + offsets
+
+    edge = np.zeros(width, dtype=bool)
+    edge[0] = low > -len_a
+    edge[-1] |= high < len_b
+
+    padded_b = np.zeros(len_b + 1, dtype=np.uint8)
+    padded_b[1:] = seq_b
+    gap_ramp = offsets * extend_gap_score
+
+    def close_row(
+        m_score: np.ndarray,
+        m_matches: np.ndarray,
+        m_edge: np.ndarray,
+        x_score: np.ndarray,
+        x_matches: np.ndarray,
+        x_edge: np.ndarray,
+        valid: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        take_x = x_score > m_score
+        d_score = np.where(take_x, x_score, m_score)
+        d_matches = np.where(take_x, x_matches, m_matches)
+        d_edge = np.where(take_x, x_edge, m_edge)
+
+        # Horizontal gaps: y[k] = max_{k' < k} d[k'] + open + (k - 1 - k') * extend.
+        # Re-opening from a horizontal gap never beats extending it when
+        # open <= extend, so scanning over d alone is exact.
+        opened = d_score + open_gap_score - gap_ramp
+        running = np.maximum.accumulate(opened)
+        source = np.maximum.accumulate(np.where(opened == running, offsets, 0))
+        y_score = np.full(width, _NEG_INF)
+        y_score[1:] = running[:-1] + gap_ramp[:-1]
+        y_score[~valid] = _NEG_INF
+        y_source = np.zeros(width, dtype=np.int64)
+        y_source[1:] = source[:-1]
+
+        take_y = y_score > d_score
+        h_score = np.where(take_y, y_score, d_score)
+        h_matches = np.where(take_y, d_matches[y_source], d_matches)
+        h_edge = np.where(take_y, d_edge[y_source], d_edge) | (edge & valid)
+        return h_score, h_matches, h_edge
+
+    columns = diagonals
+    valid = (columns >= 0) & (columns <= len_b)
+    m_score = np.where(columns == 0, 0.0, _NEG_INF)
+    zeros = np.zeros(width, dtype=np.int64)
+    no_edge = np.zeros(width, dtype=bool)
+    x_score = np.full(width, _NEG_INF)
+    h_score, h_matches, h_edge = close_row(m_score, zeros, no_edge, x_score, zeros, no_edge, valid)
+    x_matches = zeros
+    x_edge = no_edge
+
+    for row in range(1, len_a + 1):
+        columns = row + diagonals
+        valid = (columns >= 0) & (columns <= len_b)
+        base = seq_a[row - 1]
+        same = (padded_b[np.clip(columns, 0, len_b)] == base) & (base != _GAP)
+
+        m_valid = valid & (columns >= 1)
+        m_score = np.where(m_valid, h_score + np.where(same, match_score, mismatch_score), _NEG_INF)
+        m_matches = h_matches + same
+        m_edge = h_edge
+
+        # Vertical gaps come from the previous row, one diagonal up (k + 1).
+        open_score = np.full(width, _NEG_INF)
+        extend_score = np.full(width, _NEG_INF)
+        open_score[:-1] = h_score[1:] + open_gap_score
+        extend_score[:-1] = x_score[1:] + extend_gap_score
+        take_extend = extend_score >= open_score
+        new_x_score = np.where(valid, np.where(take_extend, extend_score, open_score), _NEG_INF)
+        shifted_h_matches = np.zeros(width, dtype=np.int64)
+        shifted_h_matches[:-1] = h_matches[1:]
+        shifted_x_matches = np.zeros(width, dtype=np.int64)
+        shifted_x_matches[:-1] = x_matches[1:]
+        shifted_h_edge = np.zeros(width, dtype=bool)
+        shifted_h_edge[:-1] = h_edge[1:]
+        shifted_x_edge = np.zeros(width, dtype=bool)
+        shifted_x_edge[:-1] = x_edge[1:]
+        x_score = new_x_score
+        x_matches = np.where(take_extend, shifted_x_matches, shifted_h_matches)
+        x_edge = np.where(take_extend, shifted_x_edge, shifted_h_edge) | (edge & valid)
+
+        h_score, h_matches, h_edge = close_row(m_score, m_matches, m_edge, x_score, x_matches, x_edge, valid)
+
+    end = len_b - len_a - low
+    return BandedAlignment(
+        score=float(h_score[end]),
+        matches=int(h_matches[end]),
+        half_width=half_width,
+        touched_edge=bool(h_edge[end]),
+    )
+
+
+def banded_global_align(
+    seq_a: np.ndarray,
+    seq_b: np.ndarray,
+    policy: BandPolicy,
+    *,
+    match_score: float,
+    mismatch_score: float,
+    open_gap_score: float,
+    extend_gap_score: float,
+) -> BandedAlignment:
+    """Globally align two byte sequences inside an adaptive diagonal band.
+
+    The band is doubled and the DP re-run until its score reaches
+    :func:`_outside_band_bound`, the most any path leaving the band could
+    score, or the band covers the whole matrix; the score is then the optimal
+    global score (``optimal``). When the next width would exceed
+    ``policy.max_dp_bytes`` the last result is returned instead, and its score
+    is only a lower bound of the optimum.
+    """
+
+    if open_gap_score > extend_gap_score:
+        raise ValueError("Banded alignment requires open_gap_score <= extend_gap_score.")
+    # The kernel loops over rows, so iterate over the shorter sequence.
+    if len(seq_a) > len(seq_b):
+        seq_a, seq_b = seq_b, seq_a
+
+    scores = dict(
+        match_score=match_score,
+        mismatch_score=mismatch_score,
+        open_gap_score=open_gap_score,
+        extend_gap_score=extend_gap_score,
+    )
+    half_width = policy.initial_width(len(seq_a), len(seq_b))
+    if _band_bytes(len(seq_a), len(seq_b), half_width) > policy.max_dp_bytes:
+        raise AlignmentTooLargeError(
+            f"Banded alignment of {len(seq_a)} x {len(seq_b)} exceeds the {policy.max_dp_bytes} byte DP cap."
+        )
+
+    while True:
+        result = _banded_pass(seq_a, seq_b, half_width, **scores)
+        bound = _outside_band_bound(len(seq_a), len(seq_b), half_width, **scores)
+        if result.score >= bound:
+            return replace(result, optimal=True)
+        half_width *= 2
+        if _band_bytes(len(seq_a), len(seq_b), half_width) > policy.max_dp_bytes:
+            return result
+
+
+def _outside_band_bound(
+    len_a: int,
+    len_b: int,
+    half_width: int,
+    *,
+    match_score: float,
+    mismatch_score: float,
+    open_gap_score: float,
+    extend_gap_score: float,
+) -> float:
+    """Return the highest score a global path leaving the band could reach (``-inf`` if none can leave it).
+
+    With ``len_a <= len_b``, leaving the band on either side and returning to
+    the end diagonal puts at least ``half_width + 1`` residues of each
+    sequence in gaps beyond the ``len_b - len_a`` the path needs anyway, in at
+    least two gaps. Every residue in a gap costs at least
+    ``extend_gap_score`` (``open_gap_score`` for the first of each gap), and
+    every aligned pair gains at most the better of the match and mismatch
+    scores, so the bound is reached with the fewest gapped residues. Score
+    settings for which gapping more residues could pay off get no finite
+    bound (``inf``), and the band then grows to the whole matrix.
+    """
+
+    low, high = _band_limits(len_a, len_b, half_width)
+    if low == -len_a and high == len_b:
+        return _NEG_INF
+    best_pair = max(match_score, mismatch_score)
+    if extend_gap_score > 0 or best_pair < 2 * extend_gap_score:
+        return np.inf
+    gapped_a = half_width + 1
+    gapped = 2 * gapped_a + len_b - len_a
+    return (len_a - gapped_a) * best_pair + 2 * open_gap_score + (gapped - 2) * extend_gap_score
+
+
+def _band_bytes(len_a: int, len_b: int, half_width: int) -> int:
+    low, high = _band_limits(len_a, len_b, half_width)
+    return (high - low + 1) * BANDED_CELL_BYTES
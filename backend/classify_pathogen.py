@@ -7,10 +7,20 @@ from typing import Iterable
 
 import pandas as pd
 
-from backend.alignment import AlignmentResult, best_match
+from backend.alignment import AlignerEngine, AlignmentResult, MatchStats, ReferenceCompositions, best_match
+from backend.kmer_index import KmerIndex
+from backend.parallel import CatalogMatcher
+from backend.reference_bundle import read_reference, reference_bundle, reference_records
+from backend.reference_clusters import ReferenceClusters
+from backend.sketch import SketchIndex
+from backend.sequence_batch import SequenceBatch
 
 PATHOGEN_REFERENCE_CSV = Path("data/pathogen_reference.csv")
 
+# Values of the ``species_method`` column.
+ALIGNMENT_METHOD = "alignment"
+SKETCH_METHOD = "sketch"
+
 
 def load_reference(csv_path: str | Path | None = None) -> pd.DataFrame:
     """Load pathogen reference sequences."""
@@ -18,49 +28,172 @@ def load_reference(csv_path: str | Path | None = None) -> pd.DataFrame:
     path = Path(csv_path or PATHOGEN_REFERENCE_CSV)
     if not path.exists():
         raise FileNotFoundError(f"Pathogen reference CSV not found: {path}")
-    df = pd.read_csv(path)
+    df = read_reference(path, "species")
     required = {"species", "sequence"}
-    if not required.issubset(df.columns):
+    columns = set(df.columns) | ({"sequence"} if reference_bundle(df) is not None else set())
+    if not required.issubset(columns):
         raise ValueError(f"Reference CSV must contain columns {required}, found {df.columns.tolist()}")
-    df["sequence"] = df["sequence"].str.upper()
     return df
 
 
-def classify_sequence(sequence: str, reference_df: pd.DataFrame) -> tuple[str, AlignmentResult]:
-    """Return the best-matching species and alignment metrics."""
+def classify_sequence(
+    sequence: str,
+    reference_df: pd.DataFrame,
+    *,
+    index: KmerIndex | None = None,
+    engine: AlignerEngine | None = None,
+    stats: MatchStats | None = None,
+    clusters: ReferenceClusters | None = None,
+    sketches: SketchIndex | None = None,
+    compositions: ReferenceCompositions | None = None,
+) -> tuple[str, AlignmentResult]:
+    """Return the best-matching species and alignment metrics.
+
+    ``clusters`` searches cluster representatives first and takes precedence
+    over ``index``. ``sketches`` skips alignment altogether and reports the
+    sketch estimates instead (see :meth:`SketchIndex.best_match`).
+    ``compositions`` takes the catalog's precomputed base compositions when
+    searching it without an index.
+    """
 
     sequence = sequence.upper()
-    reference_records = reference_df[["species", "sequence"]].itertuples(index=False, name=None)
-    species, metrics = best_match(sequence, reference_records)
+    if sketches is not None:
+        return sketches.best_match(sequence, stats=stats)
+    if clusters is not None:
+        return clusters.best_match(sequence, engine=engine, stats=stats)
+    if index is not None:
+        return best_match(
+            sequence,
+            index.records,
+            engine=engine,
+            stats=stats,
+            positions=index.shortlist_positions(sequence),
+            compositions=index.compositions,
+        )
+    candidates = reference_records(reference_df, "species")
+    species, metrics = best_match(sequence, candidates, engine=engine, stats=stats, compositions=compositions)
     return species, metrics
 
 
-def classify_dataframe(df: pd.DataFrame, reference_df: pd.DataFrame | None = None) -> pd.DataFrame:
-    """Attach predicted species and alignment metrics to the dataframe."""
-
-    if "sequence" not in df.columns:
-        raise KeyError("DataFrame must contain a 'sequence' column.")
-
+def _classify_sequences(
+    sequences: Iterable[str],
+    reference_df: pd.DataFrame | None,
+    *,
+    index: KmerIndex | None,
+    engine: AlignerEngine | None,
+    matcher: CatalogMatcher | None,
+    stats: MatchStats | None,
+    clusters: ReferenceClusters | None = None,
+    sketches: SketchIndex | None = None,
+) -> dict[str, list[object]]:
     reference_df = reference_df if reference_df is not None else load_reference()
-    classified = df.copy()
+
+    if matcher is not None and sketches is None:
+        matches = matcher.best_matches(list(sequences), stats)
+    else:
+        compositions = None
+        if index is None and clusters is None and sketches is None:
+            compositions = ReferenceCompositions.from_records(reference_records(reference_df, "species"))
+        matches = (
+            classify_sequence(
+                sequence,
+                reference_df,
+                index=index,
+                engine=engine,
+                stats=stats,
+                clusters=clusters,
+                sketches=sketches,
+                compositions=compositions,
+            )
+            for sequence in sequences
+        )
+    return species_columns(matches, method=SKETCH_METHOD if sketches is not None else ALIGNMENT_METHOD)
+
+
+def species_columns(
+    matches: Iterable[tuple[str, AlignmentResult]], *, method: str = ALIGNMENT_METHOD
+) -> dict[str, list[object]]:
+    """Return the predicted species and metric columns of ``(species, metrics)`` matches.
+
+    ``species_method`` records whether the metrics come from an alignment or
+    from sketch estimates.
+    """
 
     species: list[str] = []
     identities: list[float] = []
     coverages: list[float] = []
     scores: list[float] = []
-
-    for sequence in classified["sequence"]:
-        label, metrics = classify_sequence(str(sequence), reference_df)
+    for label, metrics in matches:
         species.append(label or "Unknown")
         identities.append(metrics.identity)
         coverages.append(metrics.coverage)
         scores.append(metrics.score)
 
-    classified["predicted_species"] = species
-    classified["species_identity"] = identities
-    classified["species_coverage"] = coverages
-    classified["species_score"] = scores
-    return classified
+    return {
+        "predicted_species": species,
+        "species_identity": identities,
+        "species_coverage": coverages,
+        "species_score": scores,
+        "species_method": [method] * len(species),
+    }
+
+
+def classify_batch(
+    batch: SequenceBatch,
+    reference_df: pd.DataFrame | None = None,
+    *,
+    index: KmerIndex | None = None,
+    engine: AlignerEngine | None = None,
+    matcher: CatalogMatcher | None = None,
+    stats: MatchStats | None = None,
+    clusters: ReferenceClusters | None = None,
+    sketches: SketchIndex | None = None,
+) -> dict[str, list[object]]:
+    """Return predicted species and alignment metric columns for a :class:`SequenceBatch`."""
+
+    return _classify_sequences(
+        batch.iter_sequences(),
+        reference_df,
+        index=index,
+        engine=engine,
+        matcher=matcher,
+        stats=stats,
+        clusters=clusters,
+        sketches=sketches,
+    )
+
+
+def classify_dataframe(
+    df: pd.DataFrame,
+    reference_df: pd.DataFrame | None = None,
+    *,
+    index: KmerIndex | None = None,
+    engine: AlignerEngine | None = None,
+    matcher: CatalogMatcher | None = None,
+    stats: MatchStats | None = None,
+    clusters: ReferenceClusters | None = None,
+    sketches: SketchIndex | None = None,
+) -> pd.DataFrame:
+    """Attach predicted species and alignment metrics to the dataframe.
+
+    A ``matcher`` runs the searches on its process pool instead of in this
+    thread; ``sketches`` classifies without alignment and takes precedence.
+    """
+
+    if "sequence" not in df.columns:
+        raise KeyError("DataFrame must contain a 'sequence' column.")
+
+    columns = _classify_sequences(
+        [str(sequence) for sequence in df["sequence"]],
+        reference_df,
+        index=index,
+        engine=engine,
+        matcher=matcher,
+        stats=stats,
+        clusters=clusters,
+        sketches=sketches,
+    )
+    return df.assign(**columns)
 
 
 def classify_records(
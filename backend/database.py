@@ -53,6 +53,16 @@ class AnalysisJob(Base):
         }
 
 
+class JobResultKey(Base):
+    """Content-addressed index of completed jobs: a digest of everything a job's results depend on."""
+
+    __tablename__ = "job_result_keys"
+
+    key = Column(String(64), primary_key=True)
+    job_id = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 def init_db() -> None:
     os.makedirs("data", exist_ok=True)
     Base.metadata.create_all(bind=engine)
@@ -86,11 +96,13 @@ def create_job(session: Session, seed: int | None, *, metadata: Mapping[str, obj
     return job
 
 
-def mark_job_running(session: Session, job_id: str) -> AnalysisJob | None:
+def mark_job_running(session: Session, job_id: str, *, report_path: str | None = None) -> AnalysisJob | None:
     job = session.get(AnalysisJob, job_id)
     if job is None:
         return None
     job.status = "running"
+    if report_path is not None:
+        job.report_path = report_path
     job.updated_at = datetime.utcnow()
     session.commit()
     session.refresh(job)
@@ -141,6 +153,18 @@ def get_job(session: Session, job_id: str) -> AnalysisJob | None:
     return session.get(AnalysisJob, job_id)
 
 
+def record_job_key(session: Session, key: str, job_id: str) -> None:
+    """Point ``key`` at ``job_id``, replacing an older job with the same key."""
+
+    session.merge(JobResultKey(key=key, job_id=job_id, created_at=datetime.utcnow()))
+    session.commit()
+
+
+def find_job_by_key(session: Session, key: str) -> AnalysisJob | None:
+    entry = session.get(JobResultKey, key)
+    return session.get(AnalysisJob, entry.job_id) if entry is not None else None
+
+
 def list_jobs(session: Session, *, limit: int = 20) -> list[AnalysisJob]:
     stmt = select(AnalysisJob).order_by(AnalysisJob.created_at.desc()).limit(limit)
     return list(session.execute(stmt).scalars())
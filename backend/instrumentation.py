@@ -0,0 +1,221 @@
+"""Per-stage job timings and their Prometheus exposition."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Mapping, Optional
+
+# Bucket upper bounds of the stage histograms.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+RSS_BUCKETS = tuple(float(2**power) for power in range(24, 36))  # 16 MiB .. 32 GiB
+
+
+_PAGE_BYTES = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_bytes() -> Optional[int]:
+    """This process's resident set size right now, or None where ``/proc`` is not available."""
+
+    try:
+        with open("/proc/self/statm", "rb") as handle:
+            return int(handle.read().split()[1]) * _PAGE_BYTES
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class StageMetrics:
+    """Totals for one stage of one job; stages entered several times (per batch) add up."""
+
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rss_bytes: Optional[int] = None
+    rss_delta_bytes: Optional[int] = None
+    records: int = 0
+    bases: int = 0
+
+    def as_dict(self) -> dict[str, object]:
+        wall = self.wall_seconds
+        return {
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "rss_bytes": self.rss_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "records": self.records,
+            "bases": self.bases,
+            "records_per_second": round(self.records / wall, 2) if wall > 0 else None,
+            "bases_per_second": round(self.bases / wall, 2) if wall > 0 else None,
+        }
+
+
+class StageRecorder:
+    """Record wall time, CPU time, RSS and throughput per named stage of a job.
+
+    Stages nest: time spent in an inner stage is not counted again in the
+    enclosing one. Stages of the same job may overlap in time, so their
+    totals can exceed the job's wall time; the stage graph's critical path
+    is what bounds it. CPU
+    time is that of the recording thread; work done in alignment worker
+    processes shows up as wall time only. The process RSS is sampled when a
+    stage starts and ends: ``rss_bytes`` is the highest sample and
+    ``rss_delta_bytes`` the growth from start to end, both process-wide, so
+    they include concurrent stages and jobs. A stage block
+    must not span a ``yield``. Stages may run on several threads at once;
+    nesting is tracked per thread.
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        with self._lock:
+            metrics = self.stages.setdefault(name, StageMetrics())
+        stack: list[list[float]] = self._local.__dict__.setdefault("stack", [])
+        # [child wall, child cpu] accumulated by nested stages.
+        frame = [0.0, 0.0]
+        stack.append(frame)
+        rss_start = current_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield metrics
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            rss_end = current_rss_bytes()
+            with self._lock:
+                metrics.wall_seconds += wall - frame[0]
+                metrics.cpu_seconds += cpu - frame[1]
+                if rss_start is not None and rss_end is not None:
+                    metrics.rss_bytes = max(metrics.rss_bytes or 0, rss_start, rss_end)
+                    metrics.rss_delta_bytes = (metrics.rss_delta_bytes or 0) + rss_end - rss_start
+
+    def as_dict(self) -> dict[str, dict[str, object]]:
+        with self._lock:
+            return {name: metrics.as_dict() for name, metrics in self.stages.items()}
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def lines(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total!r}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+_HISTOGRAMS = {
+    "wall_seconds": ("vetpathogen_stage_wall_seconds", "Wall time per job stage.", SECONDS_BUCKETS),
+    "cpu_seconds": ("vetpathogen_stage_cpu_seconds", "CPU time of the job thread per stage.", SECONDS_BUCKETS),
+    "rss_bytes": ("vetpathogen_stage_rss_bytes", "Highest process RSS sampled at stage start and end.", RSS_BUCKETS),
+}
+_COUNTERS = {
+    "records": ("vetpathogen_stage_records_total", "Records processed per stage."),
+    "bases": ("vetpathogen_stage_bases_total", "Bases processed per stage."),
+}
+
+
+class MetricsRegistry:
+    """Process-wide job metrics rendered in the Prometheus text format.
+
+    Each job's stage totals are observed once into per-stage histograms,
+    alongside record/base counters (their rate over the wall-time sum is the
+    throughput), job outcome counters and queued/active job gauges.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], _Histogram] = {}
+        self._counters: dict[tuple[str, str], float] = {}
+        self._jobs: dict[str, int] = {}
+        self.queued = 0
+        self.active = 0
+
+    def observe(self, stages: Mapping[str, StageMetrics]) -> None:
+        with self._lock:
+            for stage, metrics in stages.items():
+                for field, (_, _, buckets) in _HISTOGRAMS.items():
+                    value = getattr(metrics, field)
+                    if value is None:
+                        continue
+                    histogram = self._histograms.get((field, stage))
+                    if histogram is None:
+                        histogram = self._histograms[(field, stage)] = _Histogram(buckets)
+                    histogram.observe(float(value))
+                for field in _COUNTERS:
+                    self._counters[(field, stage)] = self._counters.get((field, stage), 0) + getattr(metrics, field)
+
+    def job_queued(self) -> None:
+        with self._lock:
+            self.queued += 1
+
+    def job_started(self, *, queued: bool) -> None:
+        with self._lock:
+            if queued:
+                self.queued -= 1
+            self.active += 1
+
+    def job_finished(self, status: str) -> None:
+        with self._lock:
+            self.active -= 1
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+
+    def job_reused(self) -> None:
+        """Count a duplicate submission answered by an existing job."""
+
+        with self._lock:
+            self._jobs["reused"] = self._jobs.get("reused", 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP vetpathogen_jobs_queued Jobs waiting to start.",
+                "# TYPE vetpathogen_jobs_queued gauge",
+                f"vetpathogen_jobs_queued {self.queued}",
+                "# HELP vetpathogen_jobs_active Jobs currently running.",
+                "# TYPE vetpathogen_jobs_active gauge",
+                f"vetpathogen_jobs_active {self.active}",
+                "# HELP vetpathogen_jobs_total Finished jobs by status (reused: duplicates served by an existing job).",
+                "# TYPE vetpathogen_jobs_total counter",
+            ]
+            lines += [
+                f'vetpathogen_jobs_total{{status="{status}"}} {count}' for status, count in sorted(self._jobs.items())
+            ]
+            for field, (name, help_text, _) in _HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (kind, stage), histogram in sorted(self._histograms.items()):
+                    if kind == field:
+                        lines += histogram.lines(name, f'stage="{stage}"')
+            for field, (name, help_text) in _COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [
+                    f'{name}{{stage="{stage}"}} {value}'
+                    for (kind, stage), value in sorted(self._counters.items())
+                    if kind == field
+                ]
+        return "\n".join(lines) + "\n"
@@ -4,38 +4,108 @@ from __future__ import annotations
 
 import asyncio
 import os
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 
 from backend.database import (
     SessionLocal,
     create_job,
+    find_job_by_key,
     get_job,
     list_jobs as list_jobs_db,
     mark_job_completed,
     mark_job_failed,
     mark_job_running,
+    record_job_key,
 )
+from backend.alignment_cache import AlignmentCache
+from backend.instrumentation import MetricsRegistry, StageRecorder
+from backend.pdf_renderer import PdfRenderer, create_pdf_renderer, pdf_mode_from_env, pdf_path_for
 from backend.pipeline import run_pipeline
+from backend.reference_catalog import CatalogLoader, CatalogManager, build_catalog_snapshot
+from backend.result_store import input_digest, job_key
+from backend.sequence_batch import SequenceBatch
+from backend.stage_graph import DEFAULT_STAGE_WORKERS
 from backend.report_builder import PIPELINE_VERSION
+from backend.report_writer import report_formats_from_env, report_path as report_file_path
+
+
+def result_fields(
+    results: Optional[list[dict[str, object]]], metadata: Optional[dict[str, object]]
+) -> dict[str, object]:
+    """Return a completed job's inline ``results``, record ``count`` and ``results_omitted`` flag.
+
+    Streamed jobs store no per-record results; their records are only in the
+    report files and the count comes from the job summary.
+    """
+
+    metadata = metadata or {}
+    summary = metadata.get("summary")
+    count = summary.get("sequence_count") if isinstance(summary, dict) else None
+    results = results or []
+    return {
+        "results": results,
+        "count": int(count) if count is not None else len(results),
+        "results_omitted": bool(metadata.get("streaming")),
+    }
+
+
+def _discard(source: Optional[Path]) -> None:
+    if source is not None:
+        Path(source).unlink(missing_ok=True)
 
 
 class JobRunner:
-    """Manage analysis jobs with optional async execution."""
+    """Manage analysis jobs with optional async execution.
+
+    Reference catalogs come from a :class:`CatalogManager`; each job pins the
+    catalog version current when it starts running. Outside ``eager`` PDF
+    mode, a job's PDF is rendered by ``pdf_renderer`` after the job: on the
+    first download (``lazy``) or queued when the job completes (``background``).
+    With ``stream_batch_size``, jobs run the pipeline in streaming mode and
+    record their report path when they start, so the CSV written so far can be
+    downloaded while the job runs (and after it fails). Stage timings of every
+    job, queued/active job counts and deferred PDF renders are collected in
+    ``metrics``, which ``/metrics`` exposes.
+
+    With ``dedup``, every job is keyed by a digest of its input, seed,
+    submission metadata, catalog version and search settings, pipeline
+    version and output options. A submission whose key matches a job still
+    in flight attaches to that job, and one matching a completed job whose
+    report is still on disk gets that job's results back without running
+    the pipeline. Seedless duplicates therefore share their risk labels too.
+    """
 
     def __init__(
         self,
         *,
-        amr_reference_df,
-        pathogen_reference_df,
+        catalogs: CatalogManager,
         output_dir: Path,
         async_enabled: bool = False,
+        report_formats: Sequence[str] = ("csv",),
+        pdf_mode: str = "eager",
+        pdf_renderer: Optional[PdfRenderer] = None,
+        stream_batch_size: int = 0,
+        metrics: Optional[MetricsRegistry] = None,
+        dedup: bool = False,
+        stage_workers: int = DEFAULT_STAGE_WORKERS,
     ) -> None:
-        self.amr_reference_df = amr_reference_df
-        self.pathogen_reference_df = pathogen_reference_df
+        self.catalogs = catalogs
         self.output_dir = output_dir
         self.async_enabled = async_enabled
+        self.report_formats = tuple(report_formats)
+        self.pdf_mode = pdf_mode
+        self.pdf_renderer = pdf_renderer or PdfRenderer()
+        self.stream_batch_size = stream_batch_size
+        self.metrics = metrics or MetricsRegistry()
+        if self.pdf_renderer.metrics is None:
+            self.pdf_renderer.metrics = self.metrics
+        self.dedup = dedup
+        self.stage_workers = stage_workers
         self.tasks: dict[str, asyncio.Task] = {}
+        self._inflight: dict[str, tuple[str, threading.Event]] = {}
+        self._inflight_lock = threading.Lock()
 
     @staticmethod
     def _clean_metadata(metadata: Optional[dict[str, object]]) -> dict[str, object]:
@@ -56,31 +126,167 @@ class JobRunner:
 
     def enqueue(
         self,
-        fasta_text: str,
+        fasta_text: Optional[str],
         seed: Optional[int],
         *,
         metadata: Optional[dict[str, object]] = None,
+        sequences: Optional[SequenceBatch] = None,
+        source: Optional[Path] = None,
+        recorder: Optional[StageRecorder] = None,
     ) -> tuple[str, Optional[dict[str, object]]]:
-        """Create a job record and either enqueue or run immediately."""
+        """Create a job record and either enqueue or run immediately.
+
+        Pass ``sequences`` when the upload has already been parsed so the job
+        does not parse it again, or ``source`` for an upload spooled to a file,
+        which the job reads in place (batch by batch when streaming). The
+        runner owns a ``source`` file and deletes it once the job is done.
+        ``recorder`` carries stages timed before the job existed, such as the
+        upload, into the job's stage metrics.
+        """
 
         cleaned_metadata = self._clean_metadata(metadata)
-        with SessionLocal() as session:
-            job = create_job(session, seed, metadata=cleaned_metadata)
-            job_id = job.id
+        # Seedless jobs draw fresh risk labels on every run, so they are never reused.
+        digest = input_digest(sequences, fasta_text, source) if self.dedup and seed is not None else None
+        key = None
+        if digest is not None:
+            key = self._job_key(digest, seed, cleaned_metadata, self.catalogs.current.fingerprint)
+            claimed = self._claim(key, seed, cleaned_metadata)
+            if isinstance(claimed, tuple):
+                self.metrics.job_reused()
+                _discard(source)
+                return claimed
+            job_id = claimed
+        else:
+            job_id = self._create_job(seed, cleaned_metadata)
 
         if self.async_enabled:
             loop = asyncio.get_running_loop()
-            task = loop.create_task(self._run_job_async(job_id, fasta_text, seed, cleaned_metadata))
+            self.metrics.job_queued()
+            task = loop.create_task(
+                self._run_job_async(
+                    job_id,
+                    fasta_text,
+                    seed,
+                    cleaned_metadata,
+                    sequences,
+                    source=source,
+                    recorder=recorder,
+                    digest=digest,
+                    key=key,
+                )
+            )
             self.tasks[job_id] = task
             return job_id, None
 
-        result = self._run_job_sync(job_id, fasta_text, seed, cleaned_metadata)
+        result = self._run_job_sync(
+            job_id,
+            fasta_text,
+            seed,
+            cleaned_metadata,
+            sequences,
+            source=source,
+            recorder=recorder,
+            digest=digest,
+            key=key,
+        )
         return job_id, result
 
+    def _job_key(self, digest: str, seed: Optional[int], metadata: dict[str, object], fingerprint: str) -> str:
+        return job_key(
+            input_digest=digest,
+            seed=seed,
+            catalog_fingerprint=fingerprint,
+            pipeline_version=PIPELINE_VERSION,
+            options={
+                "metadata": metadata,
+                "report_formats": self.report_formats,
+                "stream_batch_size": self.stream_batch_size,
+            },
+        )
+
+    @staticmethod
+    def _create_job(seed: Optional[int], metadata: dict[str, object]) -> str:
+        with SessionLocal() as session:
+            return create_job(session, seed, metadata=metadata).id
+
+    def _claim(
+        self, key: str, seed: Optional[int], metadata: dict[str, object]
+    ) -> str | tuple[str, Optional[dict[str, object]]]:
+        """Return the job and payload a duplicate submission gets, or the id of a new job registered to run.
+
+        The lookup and the registration of the new job happen under one lock,
+        so concurrent identical submissions start a single job; in sync mode a
+        duplicate of a running job waits for it and looks again.
+        """
+
+        while True:
+            with self._inflight_lock:
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    reused = self._completed(key)
+                    if reused is not None:
+                        return reused
+                    job_id = self._create_job(seed, metadata)
+                    self._inflight[key] = (job_id, threading.Event())
+                    return job_id
+            job_id, done = inflight
+            if self.async_enabled:
+                return job_id, {"status": "running", "deduplicated": True}
+            done.wait()
+
+    @staticmethod
+    def _completed(key: str) -> Optional[tuple[str, Optional[dict[str, object]]]]:
+        with SessionLocal() as session:
+            job = find_job_by_key(session, key)
+            job_info = job.as_dict() if job is not None else None
+        if job_info is None or job_info["status"] != "completed":
+            return None
+        report_path = job_info.get("report_path")
+        if not report_path or not Path(str(report_path)).exists():
+            return None
+        return str(job_info["id"]), {
+            "status": "completed",
+            **result_fields(job_info.get("results"), job_info.get("reference_metadata")),
+            "report_path": report_path,
+            "summary_path": job_info.get("summary_path"),
+            "pdf_path": job_info.get("pdf_path"),
+            "metadata": job_info.get("reference_metadata"),
+            "deduplicated": True,
+        }
+
+    def cache_stats(self) -> Optional[dict[str, object]]:
+        """This process's alignment cache counters, with the worker processes' summed under ``pool``."""
+
+        snapshot = self.catalogs.current
+        cache: Optional[AlignmentCache] = getattr(snapshot.engine, "cache", None)
+        if cache is None:
+            return None
+        stats = cache.stats()
+        if snapshot.executor is not None:
+            stats["pool"] = snapshot.executor.cache_stats()
+        return stats
+
+    def render_pdf(self, job_id: str) -> Optional[Path]:
+        """Return a completed job's PDF, rendering and caching it on first request."""
+
+        job = self.get_job(job_id)
+        if job is None or job.get("status") != "completed" or not job.get("report_path"):
+            return None
+        return self.pdf_renderer.render(str(job["report_path"]), job.get("reference_metadata") or {})
+
+    def shutdown(self) -> None:
+        """Stop the catalog watcher and release the alignment worker pools and PDF queue."""
+
+        self.catalogs.shutdown()
+        self.pdf_renderer.shutdown()
+
     def get_job(self, job_id: str) -> Optional[dict[str, object]]:
         with SessionLocal() as session:
             job = get_job(session, job_id)
-            return job.as_dict() if job else None
+            job_info = job.as_dict() if job else None
+        if job_info is not None and job_info["status"] == "completed":
+            job_info.update(result_fields(job_info.get("results"), job_info.get("reference_metadata")))
+        return job_info
 
     def list_jobs(self, *, limit: int = 20) -> list[dict[str, object]]:
         with SessionLocal() as session:
@@ -89,56 +295,126 @@ class JobRunner:
     async def _run_job_async(
         self,
         job_id: str,
-        fasta_text: str,
+        fasta_text: Optional[str],
         seed: Optional[int],
         metadata: Optional[dict[str, object]] = None,
+        sequences: Optional[SequenceBatch] = None,
+        *,
+        source: Optional[Path] = None,
+        recorder: Optional[StageRecorder] = None,
+        digest: Optional[str] = None,
+        key: Optional[str] = None,
     ) -> None:
-        await asyncio.to_thread(self._run_job_sync, job_id, fasta_text, seed, metadata)
+        await asyncio.to_thread(
+            self._run_job_sync,
+            job_id,
+            fasta_text,
+            seed,
+            metadata,
+            sequences,
+            source=source,
+            recorder=recorder,
+            queued=True,
+            digest=digest,
+            key=key,
+        )
 
     def _run_job_sync(
         self,
         job_id: str,
-        fasta_text: str,
+        fasta_text: Optional[str],
         seed: Optional[int],
         metadata: Optional[dict[str, object]] = None,
+        sequences: Optional[SequenceBatch] = None,
+        *,
+        source: Optional[Path] = None,
+        recorder: Optional[StageRecorder] = None,
+        queued: bool = False,
+        digest: Optional[str] = None,
+        key: Optional[str] = None,
     ) -> dict[str, object]:
         extra_metadata = metadata or {}
         with SessionLocal() as session:
-            mark_job_running(session, job_id)
+            running_report = report_file_path(self.output_dir, job_id) if self.stream_batch_size > 0 else None
+            mark_job_running(session, job_id, report_path=str(running_report) if running_report else None)
+        recorder = recorder or StageRecorder()
+        self.metrics.job_started(queued=queued)
+        status = "failed"
 
         try:
-            (
-                report_df,
-                report_path,
-                summary_path,
-                pdf_path,
-                pipeline_metadata,
-            ) = run_pipeline(
-                fasta_text,
-                seed=seed,
-                amr_reference_df=self.amr_reference_df,
-                pathogen_reference_df=self.pathogen_reference_df,
-                output_dir=self.output_dir,
-                job_id=job_id,
-                submission_metadata=extra_metadata,
-            )
+            with self.catalogs.acquire() as catalogs:
+                executor = catalogs.executor
+                (
+                    report_df,
+                    report_path,
+                    summary_path,
+                    pdf_path,
+                    pipeline_metadata,
+                ) = run_pipeline(
+                    fasta_text,
+                    seed=seed,
+                    amr_reference_df=catalogs.amr_reference_df,
+                    pathogen_reference_df=catalogs.pathogen_reference_df,
+                    output_dir=self.output_dir,
+                    job_id=job_id,
+                    submission_metadata=extra_metadata,
+                    amr_index=catalogs.amr_index,
+                    pathogen_index=catalogs.pathogen_index,
+                    engine=catalogs.engine,
+                    amr_seed_index=catalogs.amr_seed_index,
+                    amr_matcher=executor.matcher("amr") if executor else None,
+                    pathogen_matcher=executor.matcher("pathogen") if executor else None,
+                    amr_clusters=catalogs.amr_clusters,
+                    pathogen_clusters=catalogs.pathogen_clusters,
+                    pathogen_sketches=catalogs.pathogen_sketches,
+                    sequences=sequences,
+                    source=source,
+                    report_formats=self.report_formats,
+                    render_pdf=self.pdf_mode == "eager",
+                    pdf_max_rows=self.pdf_renderer.max_rows,
+                    batch_size=self.stream_batch_size,
+                    recorder=recorder,
+                    stage_workers=self.stage_workers,
+                )
+                cache: Optional[AlignmentCache] = getattr(catalogs.engine, "cache", None)
+                if cache is not None:
+                    cache.flush()
+                catalog_version = catalogs.version
+                # Key the result by the catalogs the job actually ran against.
+                result_key = (
+                    self._job_key(digest, seed, extra_metadata, catalogs.fingerprint) if digest is not None else None
+                )
             combined_metadata = dict(pipeline_metadata or {})
+            combined_metadata["catalog_version"] = catalog_version
             combined_metadata.update(extra_metadata)
-            results = report_df.to_dict(orient="records")
-            with SessionLocal() as session:
-                mark_job_completed(
-                    session,
-                    job_id,
-                    pipeline_version=PIPELINE_VERSION,
-                    reference_metadata=combined_metadata,
-                    report_path=str(report_path),
-                    summary_path=str(summary_path) if summary_path else None,
-                    pdf_path=str(pdf_path) if pdf_path else None,
-                    results=results,
-                )
+            if self.pdf_mode != "eager":
+                pdf_path = pdf_path_for(report_path)
+            # The stored metadata cannot include its own commit; db_commit is in the payload and /metrics.
+            with recorder.stage("db_commit") as stage:
+                # Streamed jobs keep no report in memory: their rows are only in the report files.
+                results = report_df.to_dict(orient="records") if report_df is not None else []
+                with SessionLocal() as session:
+                    mark_job_completed(
+                        session,
+                        job_id,
+                        pipeline_version=PIPELINE_VERSION,
+                        reference_metadata=combined_metadata,
+                        report_path=str(report_path),
+                        summary_path=str(summary_path) if summary_path else None,
+                        pdf_path=str(pdf_path) if pdf_path else None,
+                        results=results,
+                    )
+                    if result_key is not None:
+                        record_job_key(session, result_key, job_id)
+                stage.records += len(results)
+            combined_metadata["stage_metrics"] = recorder.as_dict()
+            job_results = result_fields(results, combined_metadata)
+            status = "completed"
+            if self.pdf_mode == "background":
+                self.pdf_renderer.submit(report_path, combined_metadata)
             return {
                 "status": "completed",
-                "results": results,
+                **job_results,
                 "report_path": str(report_path),
                 "summary_path": str(summary_path) if summary_path else None,
                 "pdf_path": str(pdf_path) if pdf_path else None,
@@ -155,13 +431,41 @@ class JobRunner:
             if extra_metadata:
                 failure_payload["metadata"] = extra_metadata
             return failure_payload
+        finally:
+            _discard(source)
+            self.metrics.observe(recorder.stages)
+            self.metrics.job_finished(status)
+            if key is not None:
+                with self._inflight_lock:
+                    inflight = self._inflight.pop(key, None)
+                if inflight is not None:
+                    inflight[1].set()
 
 
-def create_job_runner(amr_reference_df, pathogen_reference_df, output_dir: Path) -> JobRunner:
+def create_job_runner(
+    amr_reference_df,
+    pathogen_reference_df,
+    output_dir: Path,
+    *,
+    catalog_loader: Optional[CatalogLoader] = None,
+    watch_paths: Sequence[Path] = (),
+) -> JobRunner:
     async_enabled = os.getenv("VETPATHOGEN_ASYNC", "false").lower() == "true"
+    catalogs = CatalogManager(
+        build_catalog_snapshot(amr_reference_df, pathogen_reference_df),
+        loader=catalog_loader,
+    )
+    watch_interval = float(os.getenv("VETPATHOGEN_CATALOG_WATCH_INTERVAL", "0"))
+    if catalog_loader is not None and watch_paths and watch_interval > 0:
+        catalogs.watch(list(watch_paths), watch_interval)
     return JobRunner(
-        amr_reference_df=amr_reference_df,
-        pathogen_reference_df=pathogen_reference_df,
+        catalogs=catalogs,
         output_dir=output_dir,
         async_enabled=async_enabled,
+        report_formats=report_formats_from_env(),
+        pdf_mode=pdf_mode_from_env(),
+        pdf_renderer=create_pdf_renderer(),
+        stream_batch_size=int(os.getenv("VETPATHOGEN_STREAM_BATCH_SIZE", "0")),
+        dedup=os.getenv("VETPATHOGEN_JOB_DEDUP", "true").lower() == "true",
+        stage_workers=int(os.getenv("VETPATHOGEN_STAGE_WORKERS", str(DEFAULT_STAGE_WORKERS))),
     )
@@ -0,0 +1,134 @@
+"""k-mer index used to shortlist reference records before full alignment."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.alignment import ReferenceCompositions
+from backend.reference_bundle import reference_records, upper_case_records
+
+DEFAULT_K = 11
+DEFAULT_TOP_N = 20
+
+
+_BASE_CODES = np.full(256, -1, dtype=np.int64)
+for _code, _base in enumerate(b"ACGT"):
+    _BASE_CODES[_base] = _code
+    _BASE_CODES[ord(chr(_base).lower())] = _code
+
+
+def encode_kmers(sequence: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return 2-bit packed codes and start positions of the ACGT-only k-mers of ``sequence``.
+
+    Codes fit in an ``int64`` for ``k <= 31``; k-mers spanning ambiguous bases
+    are skipped.
+    """
+
+    if not 1 <= k <= 31:
+        raise ValueError("k must be between 1 and 31 for packed k-mer codes.")
+    raw = np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)
+    if len(raw) < k:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    codes = _BASE_CODES[raw]
+    count = len(raw) - k + 1
+    packed = np.zeros(count, dtype=np.int64)
+    for offset in range(k):
+        packed = (packed << 2) | np.maximum(codes[offset : offset + count], 0)
+    ambiguous = np.concatenate(([0], np.cumsum(codes < 0)))
+    valid = ambiguous[k:] == ambiguous[:count]
+    return packed[valid], np.flatnonzero(valid)
+
+
+def kmer_set(sequence: str, k: int) -> set[str]:
+    """Return the distinct k-mers of ``sequence`` (empty when shorter than ``k``)."""
+
+    return {sequence[i : i + k] for i in range(len(sequence) - k + 1)}
+
+
+class KmerIndex:
+    """Inverted index from k-mers to the reference records that contain them.
+
+    The index is built once per reference catalog. :meth:`shortlist` ranks the
+    catalog by the number of distinct k-mers shared with a query and returns
+    the top candidates in catalog order, so ties in ``best_match`` resolve the
+    same way as an exhaustive scan.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[tuple[str, str]],
+        *,
+        k: int = DEFAULT_K,
+        top_n: int = DEFAULT_TOP_N,
+        min_shared: int = 1,
+    ) -> None:
+        if k < 1:
+            raise ValueError("k must be a positive integer.")
+        self.k = k
+        self.top_n = top_n
+        self.min_shared = min_shared
+        self.records: Sequence[tuple[str, str]] = upper_case_records(records)
+        self.compositions = ReferenceCompositions.from_records(self.records)
+
+        postings: dict[str, list[int]] = defaultdict(list)
+        for position, (_, sequence) in enumerate(self.records):
+            for kmer in kmer_set(sequence, k):
+                postings[kmer].append(position)
+        self._postings = {kmer: np.asarray(ids, dtype=np.int32) for kmer, ids in postings.items()}
+
+    @classmethod
+    def from_dataframe(cls, reference_df: pd.DataFrame, label_column: str, **kwargs) -> "KmerIndex":
+        return cls(reference_records(reference_df, label_column), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def shared_counts(self, sequence: str, kmers: set[str] | None = None) -> np.ndarray:
+        """Return the number of distinct k-mers each reference shares with ``sequence``.
+
+        ``kmers`` takes the query's k-mer set when the caller already computed it.
+        """
+
+        if kmers is None:
+            kmers = kmer_set(sequence.upper(), self.k)
+        hits = [self._postings[kmer] for kmer in kmers if kmer in self._postings]
+        if not hits:
+            return np.zeros(len(self.records), dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=len(self.records))
+
+    def shortlist_positions(
+        self, sequence: str, top_n: int | None = None, kmers: set[str] | None = None
+    ) -> np.ndarray:
+        """Return the catalog positions worth aligning against ``sequence``, in catalog order.
+
+        Falls back to the full catalog when no reference shares at least
+        ``min_shared`` k-mers (short or highly divergent queries), and keeps
+        every reference tied with the last shortlisted one.
+        """
+
+        top_n = self.top_n if top_n is None else top_n
+        everything = np.arange(len(self.records))
+        if top_n <= 0 or len(self.records) <= top_n:
+            return everything
+
+        counts = self.shared_counts(sequence, kmers)
+        if counts.max() < self.min_shared:
+            return everything
+
+        cutoff = np.partition(counts, -top_n)[-top_n]
+        return np.flatnonzero(counts >= max(cutoff, self.min_shared))
+
+    def shortlist(
+        self, sequence: str, top_n: int | None = None, kmers: set[str] | None = None
+    ) -> Sequence[tuple[str, str]]:
+        """Return the reference records worth aligning against ``sequence``."""
+
+        positions = self.shortlist_positions(sequence, top_n, kmers)
+        if len(positions) == len(self.records):
+            return self.records
+        return [self.records[position] for position in positions]
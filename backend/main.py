@@ -2,22 +2,36 @@
 
 from __future__ import annotations
 
+import gzip
+import hmac
+import os
+import shutil
+import uuid
+import zlib
 from pathlib import Path
 from typing import Annotated
 
-from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
+import pandas as pd
+from fastapi import FastAPI, File, Form, Header, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from backend.amr_detection import load_reference as load_amr_reference
 from backend.classify_pathogen import load_reference as load_pathogen_reference
 from backend.database import init_db
+from backend.instrumentation import StageRecorder
 from backend.job_runner import create_job_runner
-from backend.sequence_handler import load_sequences_from_string
+from backend.reference_bundle import bundle_path_for, preferred_reference_path
+from backend.report_writer import MEDIA_TYPES, REPORT_FORMATS, latest_report_path
+from backend.sequence_batch import SequenceBatch
+from backend.sequence_handler import FastaFormatError
 
 DATA_DIR = Path("data")
 AMR_REFERENCE_CSV = DATA_DIR / "resistance_genes_reference.csv"
 PATHOGEN_REFERENCE_CSV = DATA_DIR / "pathogen_reference.csv"
+UPLOAD_DIR = DATA_DIR / "uploads"
+UPLOAD_COPY_BYTES = 1024 * 1024
 
 app = FastAPI(
     title="VetPathogen Backend",
@@ -33,32 +47,134 @@ app.add_middleware(
 )
 
 
-@app.on_event("startup")
-def startup() -> None:
-    init_db()
+def load_catalogs() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Load both reference catalogs, preferring up-to-date compiled bundles."""
 
-    if not AMR_REFERENCE_CSV.exists():
+    amr_reference_path = preferred_reference_path(AMR_REFERENCE_CSV)
+    pathogen_reference_path = preferred_reference_path(PATHOGEN_REFERENCE_CSV)
+    if not amr_reference_path.exists():
         raise RuntimeError(f"AMR reference file missing: {AMR_REFERENCE_CSV}")
-    if not PATHOGEN_REFERENCE_CSV.exists():
+    if not pathogen_reference_path.exists():
         raise RuntimeError(f"Pathogen reference file missing: {PATHOGEN_REFERENCE_CSV}")
+    return load_amr_reference(amr_reference_path), load_pathogen_reference(pathogen_reference_path)
 
-    amr_reference_df = load_amr_reference(AMR_REFERENCE_CSV)
-    pathogen_reference_df = load_pathogen_reference(PATHOGEN_REFERENCE_CSV)
 
-    app.state.amr_reference_df = amr_reference_df
-    app.state.pathogen_reference_df = pathogen_reference_df
+@app.on_event("startup")
+def startup() -> None:
+    init_db()
+
+    amr_reference_df, pathogen_reference_df = load_catalogs()
     app.state.job_runner = create_job_runner(
         amr_reference_df=amr_reference_df,
         pathogen_reference_df=pathogen_reference_df,
         output_dir=DATA_DIR,
+        catalog_loader=load_catalogs,
+        watch_paths=[
+            AMR_REFERENCE_CSV,
+            bundle_path_for(AMR_REFERENCE_CSV),
+            PATHOGEN_REFERENCE_CSV,
+            bundle_path_for(PATHOGEN_REFERENCE_CSV),
+        ],
     )
 
 
+@app.on_event("shutdown")
+def shutdown() -> None:
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is not None:
+        job_runner.shutdown()
+
+
 @app.get("/health")
 def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/cache")
+def cache_stats() -> dict[str, object]:
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is None:
+        raise HTTPException(status_code=500, detail="Job runner not initialised.")
+    return {"alignment_cache": job_runner.cache_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Per-stage job histograms and job gauges in the Prometheus text format."""
+
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is None:
+        raise HTTPException(status_code=500, detail="Job runner not initialised.")
+    return PlainTextResponse(job_runner.metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _spool_upload(upload: UploadFile) -> Path:
+    """Copy an upload, as received, to a file under ``UPLOAD_DIR`` for the job to read in place."""
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = UPLOAD_DIR / f"{uuid.uuid4().hex}.upload"
+    upload.file.seek(0)
+    try:
+        with open(path, "wb") as handle:
+            shutil.copyfileobj(upload.file, handle, UPLOAD_COPY_BYTES)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def _receive_upload(
+    upload: UploadFile, recorder: StageRecorder, *, parse: bool
+) -> tuple[Path | None, SequenceBatch | None]:
+    """Spool an upload and, with ``parse``, read it into a batch and delete the spooled copy.
+
+    Returns ``(spooled_path, None)`` or ``(None, batch)``. The spooled file is
+    removed when parsing fails, since no job will own it.
+    """
+
+    with recorder.stage("upload") as stage:
+        source = _spool_upload(upload)
+        if not parse:
+            return source, None
+        try:
+            sequences = SequenceBatch.from_source(source)
+        finally:
+            source.unlink(missing_ok=True)
+        stage.records += len(sequences)
+        stage.bases += int(sequences.lengths.sum())
+    return None, sequences
+
+
+def _require_admin(token: str | None) -> None:
+    expected = os.getenv("VETPATHOGEN_ADMIN_TOKEN")
+    if not expected:
+        # Fail closed: without a configured token the admin endpoints are disabled.
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: VETPATHOGEN_ADMIN_TOKEN is not set.")
+    if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@app.get("/admin/catalogs")
+def catalog_status(x_admin_token: Annotated[str | None, Header()] = None) -> dict[str, object]:
+    _require_admin(x_admin_token)
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is None:
+        raise HTTPException(status_code=500, detail="Job runner not initialised.")
+    return job_runner.catalogs.status()
+
+
+@app.post("/admin/catalogs/reload", status_code=202)
+def reload_catalogs(x_admin_token: Annotated[str | None, Header()] = None) -> dict[str, object]:
+    """Load and index the reference catalogs in the background, then swap them in."""
+
+    _require_admin(x_admin_token)
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is None:
+        raise HTTPException(status_code=500, detail="Job runner not initialised.")
+    started = job_runner.catalogs.reload_in_background()
+    return {"reload_started": started, **job_runner.catalogs.status()}
+
+
 @app.post("/analyze/")
 async def analyze_sequences(
     fasta: UploadFile = File(...),
@@ -66,23 +182,32 @@ async def analyze_sequences(
     sample_id: Annotated[str | None, Form(description="Optional sample identifier")] = None,
     notes: Annotated[str | None, Form(description="Optional submission notes")] = None,
 ) -> dict[str, object]:
-    contents = await fasta.read()
-    if not contents:
+    if not await fasta.read(1):
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    await fasta.seek(0)
 
+    job_runner = getattr(app.state, "job_runner", None)
+    if job_runner is None:
+        raise HTTPException(status_code=500, detail="Job runner not initialised.")
+
+    # The upload is spooled to a file (FASTA or FASTQ; gzip-compressed uploads
+    # are inflated in chunks) off the event loop, and parsed exactly once: here
+    # into the batch handed to the job, or, when streaming, by the job itself
+    # batch by batch, where malformed input fails the job. The time this takes
+    # is the job's "upload" stage.
+    recorder = StageRecorder()
+    streaming = job_runner.stream_batch_size > 0
     try:
-        fasta_text = contents.decode("utf-8")
+        source, sequences = await run_in_threadpool(_receive_upload, fasta, recorder, parse=not streaming)
     except UnicodeDecodeError as exc:
         raise HTTPException(status_code=400, detail="Unable to decode uploaded FASTA file.") from exc
-
-    # Quick validation to surface issues early
-    if not load_sequences_from_string(fasta_text):
+    except (gzip.BadGzipFile, EOFError, zlib.error) as exc:
+        raise HTTPException(status_code=400, detail="Unable to decompress uploaded file.") from exc
+    except FastaFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if sequences is not None and not len(sequences):
         raise HTTPException(status_code=400, detail="No sequences found in FASTA.")
 
-    job_runner = getattr(app.state, "job_runner", None)
-    if job_runner is None:
-        raise HTTPException(status_code=500, detail="Job runner not initialised.")
-
     submission_metadata = {
         key: value.strip()
         for key, value in {
@@ -92,7 +217,9 @@ async def analyze_sequences(
         if isinstance(value, str) and value.strip()
     }
 
-    job_id, payload = job_runner.enqueue(fasta_text, seed, metadata=submission_metadata)
+    job_id, payload = job_runner.enqueue(
+        None, seed, metadata=submission_metadata, sequences=sequences, source=source, recorder=recorder
+    )
     job_info = job_runner.get_job(job_id) or {"status": "unknown"}
 
     response: dict[str, object] = {
@@ -104,13 +231,15 @@ async def analyze_sequences(
         "pdf_path": job_info.get("pdf_path"),
         "metadata": job_info.get("reference_metadata"),
         "results": job_info.get("results") or [],
-        "count": len(job_info.get("results") or []),
+        "count": job_info.get("count", len(job_info.get("results") or [])),
+        "results_omitted": bool(job_info.get("results_omitted")),
     }
 
     if payload:
         if payload.get("results") is not None:
             response["results"] = payload["results"]
-            response["count"] = len(payload["results"])  # type: ignore[arg-type]
+            response["count"] = payload.get("count", len(payload["results"]))  # type: ignore[arg-type]
+            response["results_omitted"] = bool(payload.get("results_omitted"))
         if payload.get("report_path"):
             response["report_path"] = payload["report_path"]
         if payload.get("summary_path"):
@@ -120,6 +249,8 @@ async def analyze_sequences(
         if payload.get("metadata"):
             response["metadata"] = payload["metadata"]
             response["pipeline_version"] = payload["metadata"].get("pipeline_version")
+        if payload.get("deduplicated"):
+            response["deduplicated"] = True
         if payload.get("error"):
             response["error"] = payload["error"]
             response["status"] = payload.get("status", response["status"])
@@ -158,20 +289,36 @@ def job_detail(job_id: str) -> dict[str, object]:
     return job
 
 
+def _report_format(format: str) -> str:
+    if format not in REPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported report format; expected one of {sorted(REPORT_FORMATS)}."
+        )
+    return format
+
+
 @app.get("/jobs/{job_id}/report")
-def download_job_report(job_id: str) -> FileResponse:
+def download_job_report(
+    job_id: str,
+    format: Annotated[str, Query(description="Report format: csv, parquet or arrow")] = "csv",
+) -> FileResponse:
+    format = _report_format(format)
     job_runner = getattr(app.state, "job_runner", None)
     if job_runner is None:
         raise HTTPException(status_code=500, detail="Job runner not initialised.")
     job = job_runner.get_job(job_id)
     if job is None or not job.get("report_path"):
         raise HTTPException(status_code=404, detail="Report not found for this job.")
+    if job.get("status") == "running" and format != "csv":
+        # Streaming jobs append to the CSV as they go; columnar files are only valid once closed.
+        raise HTTPException(status_code=409, detail="Only the CSV report can be read while the job is running.")
 
-    report_path = Path(str(job["report_path"]))
+    # Every format of a job's report sits next to its CSV with its own suffix.
+    report_path = Path(str(job["report_path"])).with_suffix(REPORT_FORMATS[format])
     if not report_path.exists():
-        raise HTTPException(status_code=404, detail="Report file missing on disk.")
+        raise HTTPException(status_code=404, detail=f"Report not available in {format} format.")
 
-    return FileResponse(report_path, media_type="text/csv", filename=report_path.name)
+    return FileResponse(report_path, media_type=MEDIA_TYPES[format], filename=report_path.name)
 
 
 @app.get("/jobs/{job_id}/summary")
@@ -200,13 +347,25 @@ def download_job_pdf(job_id: str) -> FileResponse:
         raise HTTPException(status_code=404, detail="PDF report not available for this job.")
     path = Path(str(pdf_path))
     if not path.exists():
-        raise HTTPException(status_code=404, detail="PDF file missing on disk.")
+        # Deferred PDFs are rendered on first download and cached on disk.
+        try:
+            rendered = job_runner.render_pdf(job_id)
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail="PDF rendering failed.") from exc
+        if rendered is None or not rendered.exists():
+            raise HTTPException(status_code=404, detail="PDF file missing on disk.")
+        path = rendered
     return FileResponse(path, media_type="application/pdf", filename=path.name)
 
 
 @app.get("/report")
-def download_latest_report() -> FileResponse:
-    latest_report = DATA_DIR / "report.csv"
-    if not latest_report.exists():
+def download_latest_report(
+    format: Annotated[str, Query(description="Report format: csv, parquet or arrow")] = "csv",
+) -> FileResponse:
+    format = _report_format(format)
+    latest_report = latest_report_path(DATA_DIR, format)
+    if latest_report is None and format == "csv":
+        latest_report = DATA_DIR / "report.csv"  # written by releases before the pointer
+    if latest_report is None or not latest_report.exists():
         raise HTTPException(status_code=404, detail="No report generated yet.")
-    return FileResponse(latest_report, media_type="text/csv", filename=latest_report.name)
+    return FileResponse(latest_report, media_type=MEDIA_TYPES[format], filename=latest_report.name)
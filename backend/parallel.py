@@ -0,0 +1,253 @@
+"""Process-pool execution of best-match searches against reference catalogs."""
+
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Mapping, Optional, Sequence
+
+from backend.alignment import (
+    AlignerEngine,
+    AlignmentResult,
+    MatchStats,
+    ReferenceCompositions,
+    best_match_index,
+    get_engine,
+    is_better_match,
+)
+from backend.alignment_cache import AlignmentCache, CachedAlignerEngine, counter_stats
+from backend.kmer_index import KmerIndex
+from backend.reference_bundle import upper_case_records
+from backend.reference_clusters import ReferenceClusters
+
+DEFAULT_WORKERS = 1
+DEFAULT_CHUNK_SIZE = 32
+# Pools start lazily from job threads while the server runs other threads, where
+# forking is unsafe; workers come from a fork server (or spawn where there is none).
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Populated once per worker process by ``_init_worker``.
+_WORKER_STATE: dict[str, object] = {}
+
+
+def _empty_result() -> AlignmentResult:
+    return AlignmentResult(score=0.0, identity=0.0, coverage=0.0, alignment_length=0)
+
+
+def _init_worker(catalogs, indexes, clusters, compositions, profile, band, cache_config) -> None:
+    _WORKER_STATE["catalogs"] = catalogs
+    _WORKER_STATE["indexes"] = indexes
+    _WORKER_STATE["clusters"] = clusters
+    _WORKER_STATE["compositions"] = compositions
+    engine = get_engine(profile, band)
+    if cache_config is not None:
+        engine = CachedAlignerEngine(engine, AlignmentCache(**cache_config))
+    _WORKER_STATE["engine"] = engine
+
+
+def _best_in_range(
+    catalog: str,
+    queries: Sequence[tuple[int, str]],
+    ref_start: int,
+    ref_end: int,
+) -> tuple[list[tuple[int, int, AlignmentResult]], MatchStats, dict[str, int]]:
+    """Return ``(query_id, ref_position, result)`` for the best hit of each query in a reference slice.
+
+    A clustered catalog is always searched whole, representatives first, and
+    the slice is ignored. Also returns the worker's alignment cache counters since its last chunk,
+    after committing the chunk's cache writes.
+    """
+
+    records = _WORKER_STATE["catalogs"][catalog]  # type: ignore[index]
+    index: Optional[KmerIndex] = _WORKER_STATE["indexes"].get(catalog)  # type: ignore[union-attr]
+    clusters: Optional[ReferenceClusters] = _WORKER_STATE["clusters"].get(catalog)  # type: ignore[union-attr]
+    compositions: Optional[ReferenceCompositions] = _WORKER_STATE["compositions"].get(  # type: ignore[union-attr]
+        catalog
+    )
+    engine: AlignerEngine = _WORKER_STATE["engine"]  # type: ignore[assignment]
+
+    hits = []
+    stats = MatchStats()
+    for query_id, sequence in queries:
+        if clusters is not None:
+            position, best = clusters.best_match_index(sequence, engine=engine, stats=stats)
+            hits.append((query_id, position, best))
+            continue
+        if index is not None:
+            positions = [int(p) for p in index.shortlist_positions(sequence) if ref_start <= p < ref_end]
+        else:
+            positions = list(range(ref_start, ref_end))
+        position, best = best_match_index(
+            sequence, records, engine=engine, stats=stats, positions=positions, compositions=compositions
+        )
+        hits.append((query_id, position, best))
+    cache_counters: dict[str, int] = {}
+    if isinstance(engine, CachedAlignerEngine):
+        engine.cache.flush()
+        cache_counters = engine.cache.drain_counters()
+    return hits, stats, cache_counters
+
+
+class AlignmentExecutor:
+    """Run ``best_match`` for many queries on a process pool.
+
+    Reference catalogs (and their prefilter indexes and clusters) are shipped
+    to each worker once, when the pool starts; catalogs read from a bundle
+    travel as its path and each worker memory-maps the file. Work is split into chunks of
+    ``chunk_size`` queries, and catalogs without clusters are additionally
+    split into reference ranges when there are fewer query chunks than
+    workers; clustered catalogs are searched representatives first, as in
+    :meth:`~backend.reference_clusters.ReferenceClusters.best_match`. Partial best hits
+    are merged in reference order with the same rule as ``best_match``, so
+    results are identical to the serial path. A caching engine is rebuilt in
+    each worker from its cache configuration, sharing the on-disk tier; the
+    workers' hit/miss counters are summed in :meth:`cache_stats`.
+    """
+
+    def __init__(
+        self,
+        catalogs: Mapping[str, Sequence[tuple[str, str]]],
+        *,
+        indexes: Optional[Mapping[str, Optional[KmerIndex]]] = None,
+        clusters: Optional[Mapping[str, Optional[ReferenceClusters]]] = None,
+        engine: Optional[AlignerEngine] = None,
+        workers: int = DEFAULT_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        engine = engine or get_engine()
+        self.catalogs = {name: upper_case_records(records) for name, records in catalogs.items()}
+        self.indexes = dict(indexes or {})
+        self.clusters = {name: value for name, value in (clusters or {}).items() if value is not None}
+        for name, value in self.clusters.items():
+            if len(value) != len(self.catalogs[name]):
+                raise ValueError(f"Clusters for catalog {name!r} do not match its records.")
+        # Base compositions of the unclustered catalogs, counted once here rather than in every worker.
+        self.compositions: dict[str, ReferenceCompositions] = {}
+        for name, records in self.catalogs.items():
+            if name in self.clusters:
+                continue
+            index = self.indexes.get(name)
+            self.compositions[name] = (
+                index.compositions if index is not None else ReferenceCompositions.from_records(records)
+            )
+        self.profile = engine.profile
+        self.band = engine.band
+        self.cache_config = engine.cache.config() if isinstance(engine, CachedAlignerEngine) else None
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._worker_cache_counters: Counter[str] = Counter()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                    initializer=_init_worker,
+                    initargs=(
+                        self.catalogs,
+                        self.indexes,
+                        self.clusters,
+                        self.compositions,
+                        self.profile,
+                        self.band,
+                        self.cache_config,
+                    ),
+                )
+            return self._pool
+
+    def best_matches(
+        self, catalog: str, sequences: Sequence[str], stats: Optional[MatchStats] = None
+    ) -> list[tuple[str, AlignmentResult]]:
+        """Return ``(label, metrics)`` for each sequence, in input order."""
+
+        records = self.catalogs[catalog]
+        if not sequences:
+            return []
+        queries = [(query_id, sequence.upper()) for query_id, sequence in enumerate(sequences)]
+        query_chunks = [queries[i : i + self.chunk_size] for i in range(0, len(queries), self.chunk_size)]
+        ref_splits = max(1, min(len(records), math.ceil(self.workers / len(query_chunks))))
+        if catalog in self.clusters:
+            ref_splits = 1
+        ref_step = max(1, math.ceil(len(records) / ref_splits))
+        ref_ranges = [(start, min(start + ref_step, len(records))) for start in range(0, len(records), ref_step)]
+
+        pool = self._get_pool()
+        futures = [
+            pool.submit(_best_in_range, catalog, chunk, ref_start, ref_end)
+            for chunk in query_chunks
+            for ref_start, ref_end in ref_ranges
+        ]
+
+        best_positions = [-1] * len(queries)
+        best_results = [_empty_result() for _ in queries]
+        # Futures are ordered by query chunk, then reference range, so each
+        # query sees its partial hits in catalog order.
+        for future in futures:
+            hits, chunk_stats, cache_counters = future.result()
+            if stats is not None:
+                stats.merge(chunk_stats)
+            with self._lock:
+                self._worker_cache_counters.update(cache_counters)
+            for query_id, position, result in hits:
+                if position >= 0 and is_better_match(result, best_results[query_id]):
+                    best_positions[query_id] = position
+                    best_results[query_id] = result
+        return [
+            (records[position][0] if position >= 0 else "", result)
+            for position, result in zip(best_positions, best_results)
+        ]
+
+    def cache_stats(self) -> Optional[dict[str, object]]:
+        """Alignment cache hit/miss counters summed over the worker processes; None without a cache."""
+
+        if self.cache_config is None:
+            return None
+        with self._lock:
+            return {"workers": self.workers, **counter_stats(dict(self._worker_cache_counters))}
+
+    def matcher(self, catalog: str) -> "CatalogMatcher":
+        return CatalogMatcher(self, catalog)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+class CatalogMatcher:
+    """An :class:`AlignmentExecutor` bound to one of its catalogs."""
+
+    def __init__(self, executor: AlignmentExecutor, catalog: str) -> None:
+        self.executor = executor
+        self.catalog = catalog
+
+    def best_matches(
+        self, sequences: Sequence[str], stats: Optional[MatchStats] = None
+    ) -> list[tuple[str, AlignmentResult]]:
+        return self.executor.best_matches(self.catalog, sequences, stats)
+
+
+def create_alignment_executor(
+    catalogs: Mapping[str, Sequence[tuple[str, str]]],
+    *,
+    indexes: Optional[Mapping[str, Optional[KmerIndex]]] = None,
+    clusters: Optional[Mapping[str, Optional[ReferenceClusters]]] = None,
+    engine: Optional[AlignerEngine] = None,
+) -> Optional[AlignmentExecutor]:
+    """Build an executor from ``VETPATHOGEN_WORKERS``/``VETPATHOGEN_CHUNK_SIZE``; None when serial."""
+
+    workers = int(os.getenv("VETPATHOGEN_WORKERS", str(DEFAULT_WORKERS)))
+    if workers <= 1:
+        return None
+    chunk_size = int(os.getenv("VETPATHOGEN_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+    return AlignmentExecutor(
+        catalogs, indexes=indexes, clusters=clusters, engine=engine, workers=workers, chunk_size=chunk_size
+    )
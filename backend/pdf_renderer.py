@@ -0,0 +1,129 @@
+"""Deferred PDF rendering with an on-disk cache and an optional background queue."""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from backend.instrumentation import MetricsRegistry, StageRecorder
+from backend.report_builder import SummaryAccumulator, build_pdf_report
+
+PDF_MODES = ("eager", "lazy", "background")
+DEFAULT_PDF_MODE = "lazy"
+
+# Report columns the PDF reads back from the CSV.
+PDF_COLUMNS = ("id", "predicted_species", "species_identity", "amr_gene", "amr_identity", "resistance_risk")
+
+
+def pdf_path_for(report_path: str | Path) -> Path:
+    """The PDF of a job sits next to its CSV report."""
+
+    return Path(report_path).with_suffix(".pdf")
+
+
+class PdfRenderer:
+    """Render job PDFs from their CSV reports, at most once per job.
+
+    The rendered file is the cache: :meth:`render` returns it when it exists
+    and otherwise renders it, waiting for a render already queued or running
+    for the same job instead of starting a second one. :meth:`submit` queues a
+    render on a single background thread. Files are written under a temporary
+    name and renamed, so a half-written PDF is never served.
+    """
+
+    def __init__(self, *, max_rows: int = 0, metrics: Optional[MetricsRegistry] = None) -> None:
+        self.max_rows = max_rows
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._pending: dict[Path, Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def render(self, report_path: str | Path, metadata: Optional[dict[str, object]] = None) -> Path:
+        """Return the job's PDF, rendering it now if it is not on disk yet."""
+
+        output_path = pdf_path_for(report_path)
+        if output_path.exists():
+            return output_path
+        with self._lock:
+            future = self._pending.get(output_path)
+            if future is None:
+                future = Future()
+                self._pending[output_path] = future
+                owner = True
+            else:
+                owner = False
+        if owner:
+            self._run(future, Path(report_path), output_path, metadata)
+        return future.result()
+
+    def submit(self, report_path: str | Path, metadata: Optional[dict[str, object]] = None) -> Future:
+        """Queue a render on the background thread."""
+
+        output_path = pdf_path_for(report_path)
+        with self._lock:
+            future = self._pending.get(output_path)
+            if future is not None:
+                return future
+            future = Future()
+            self._pending[output_path] = future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render")
+            self._executor.submit(self._run, future, Path(report_path), output_path, metadata)
+        return future
+
+    def _run(
+        self, future: Future, report_path: Path, output_path: Path, metadata: Optional[dict[str, object]]
+    ) -> None:
+        try:
+            if not output_path.exists():
+                self._render(report_path, output_path, metadata or {})
+            future.set_result(output_path)
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._pending.pop(output_path, None)
+
+    def _render(self, report_path: Path, output_path: Path, metadata: dict[str, object]) -> None:
+        recorder = StageRecorder()
+        with recorder.stage("pdf") as stage:
+            report_df = pd.read_csv(
+                report_path,
+                usecols=lambda column: column in PDF_COLUMNS,
+                dtype={"id": str, "predicted_species": str, "amr_gene": str, "resistance_risk": str},
+                keep_default_na=False,
+            )
+            # Jobs record their summary in the metadata; only older jobs are re-counted.
+            summary = metadata.get("summary")
+            if not isinstance(summary, dict):
+                summary = SummaryAccumulator().update(report_df).summary(submission_metadata=metadata)
+            temporary = output_path.with_name(f".{output_path.name}.tmp")
+            build_pdf_report(report_df, summary, metadata, temporary, max_rows=self.max_rows)
+            temporary.replace(output_path)
+            stage.records += len(report_df)
+        if self.metrics is not None:
+            self.metrics.observe(recorder.stages)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def pdf_mode_from_env() -> str:
+    mode = os.getenv("VETPATHOGEN_PDF_MODE", DEFAULT_PDF_MODE).lower()
+    if mode not in PDF_MODES:
+        raise ValueError(f"Unknown PDF mode {mode!r}; expected one of {PDF_MODES}.")
+    return mode
+
+
+def create_pdf_renderer() -> PdfRenderer:
+    """Build a renderer from ``VETPATHOGEN_PDF_MAX_ROWS`` (``0`` lists every sequence)."""
+
+    return PdfRenderer(max_rows=int(os.getenv("VETPATHOGEN_PDF_MAX_ROWS", "0")))
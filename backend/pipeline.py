@@ -2,29 +2,59 @@
 
 from __future__ import annotations
 
+import gzip
+import random
+import zlib
+from contextlib import contextmanager
+from io import StringIO
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Mapping, Optional, Sequence, Union
 
 import pandas as pd
 
-from backend.amr_detection import detect_amr_genes
-from backend.report import build_report, save_report
+from backend.alignment import AlignerEngine, MatchStats
+from backend.instrumentation import StageRecorder
+from backend.kmer_index import KmerIndex
+from backend.parallel import CatalogMatcher
+from backend.pdf_renderer import PdfRenderer
+from backend.query_scan import CatalogSearch, scan_batch
+from backend.reference_clusters import ReferenceClusters
+from backend.report import build_report
 from backend.report_builder import (
     PIPELINE_VERSION,
+    SummaryAccumulator,
     build_reference_metadata,
-    build_summary,
     build_pdf_report,
     save_summary_csv,
 )
-from backend.sequence_handler import load_sequences_from_string
+from backend.report_writer import iter_chunks, update_latest_report, write_report
+from backend.seed_search import SeedIndex
+from backend.sequence_handler import FastaFormatError
+from backend.sketch import SketchIndex
+from backend.stage_graph import DEFAULT_STAGE_WORKERS, StageGraph
+from backend.sequence_batch import SequenceBatch, ensure_batch, iter_batches
 
 
 class PipelineError(RuntimeError):
     """Raised when the analysis pipeline fails."""
 
 
+@contextmanager
+def _parsing() -> Iterator[None]:
+    """Report unreadable input as a :class:`PipelineError`, worded like the upload endpoint's errors."""
+
+    try:
+        yield
+    except UnicodeDecodeError as exc:
+        raise PipelineError("Unable to decode uploaded FASTA file.") from exc
+    except (gzip.BadGzipFile, EOFError, zlib.error) as exc:
+        raise PipelineError("Unable to decompress uploaded file.") from exc
+    except FastaFormatError as exc:
+        raise PipelineError(str(exc)) from exc
+
+
 def run_pipeline(
-    fasta_text: str,
+    fasta_text: Optional[str],
     *,
     seed: Optional[int],
     amr_reference_df: pd.DataFrame,
@@ -32,48 +62,254 @@ def run_pipeline(
     output_dir: Path,
     job_id: str,
     submission_metadata: Optional[dict[str, object]] = None,
-) -> tuple[pd.DataFrame, Path, Optional[Path], Optional[Path], dict[str, object]]:
-    """Execute the VetPathogen pipeline and persist job-specific artefacts."""
-
-    sequences = load_sequences_from_string(fasta_text)
-    if not sequences:
-        raise PipelineError("No sequences found in FASTA input.")
-
-    amr_matches = detect_amr_genes(sequences, amr_reference_df)
-    report_df = build_report(
-        sequences,
-        amr_results=amr_matches,
-        seed=seed,
-        pathogen_reference=pathogen_reference_df,
-        submission_metadata=submission_metadata,
-    )
+    amr_index: Optional[KmerIndex] = None,
+    pathogen_index: Optional[KmerIndex] = None,
+    engine: Optional[AlignerEngine] = None,
+    amr_seed_index: Optional[SeedIndex] = None,
+    amr_matcher: Optional[CatalogMatcher] = None,
+    pathogen_matcher: Optional[CatalogMatcher] = None,
+    amr_clusters: Optional[ReferenceClusters] = None,
+    pathogen_clusters: Optional[ReferenceClusters] = None,
+    pathogen_sketches: Optional[SketchIndex] = None,
+    sequences: Optional[Union[SequenceBatch, Iterable[dict[str, object]]]] = None,
+    source: Optional[Union[str, Path]] = None,
+    report_formats: Sequence[str] = ("csv",),
+    render_pdf: bool = True,
+    pdf_max_rows: int = 0,
+    batch_size: int = 0,
+    recorder: Optional[StageRecorder] = None,
+    stage_workers: int = DEFAULT_STAGE_WORKERS,
+) -> tuple[Optional[pd.DataFrame], Path, Optional[Path], Optional[Path], dict[str, object]]:
+    """Execute the VetPathogen pipeline and persist job-specific artefacts.
 
-    output_dir.mkdir(parents=True, exist_ok=True)
-    job_report_path = output_dir / f"report_{job_id}.csv"
-    save_report(report_df, job_report_path)
-    latest_report_path = output_dir / "report.csv"
-    save_report(report_df, latest_report_path)
+    ``sequences`` takes records already parsed by the caller, preferably as a
+    :class:`SequenceBatch`; otherwise the FASTA/FASTQ file at ``source``
+    (plain or gzip-compressed, such as a spooled upload) or ``fasta_text`` is
+    parsed here. The batch
+    is shared by every stage and only becomes a DataFrame in the report.
+    Species classification and AMR detection run as one fused scan, so each
+    query is prepared once for both catalogs. The report is streamed to
+    ``report_<job_id>`` in each of ``report_formats`` (CSV is the path
+    returned) and the latest-report pointer is moved to it. With
+    ``render_pdf=False`` no PDF is built here and ``None`` is returned for it;
+    :class:`~backend.pdf_renderer.PdfRenderer` renders it later from the CSV.
+    The job summary is accumulated from the report columns, never by
+    re-reading the report, and kept in ``metadata["summary"]``, where the
+    summary CSV and PDF read it.
+
+    The stages form a :class:`~backend.stage_graph.StageGraph`: scan, then
+    report assembly, then one writer per report format and the summary side
+    by side, with the summary CSV, the PDF and the latest-report pointer each
+    starting once their own inputs are done. Up to ``stage_workers`` stages
+    run at once, so the job takes as long as its critical path, which is
+    recorded with the stage start and end times in ``metadata["stage_graph"]``.
 
-    summary = build_summary(report_df, submission_metadata=submission_metadata)
-    summary_path: Optional[Path] = None
-    if summary["sequence_count"]:
-        summary_path = output_dir / f"summary_{job_id}.csv"
-        save_summary_csv(summary, summary_path)
+    With ``batch_size`` > 0 the input is streamed: records are parsed, scanned
+    and reported ``batch_size`` at a time, and each batch is appended to the
+    report (and flushed, so the CSV can be read while the job runs) before the
+    next is parsed. Memory then depends on the batch size rather than the
+    input, and a failure keeps the batches already written. No report
+    DataFrame is kept, so ``None`` is returned for it: the report files hold
+    the records and ``metadata["summary"]`` their count, and the PDF is
+    rendered from the CSV. Batches are parsed, scanned and written in turn
+    and only the stages after the last write run as a graph. Risk labels are
+    drawn from one seeded generator across batches, so the report matches a
+    run without ``batch_size``.
 
+    Wall time, CPU time, RSS and throughput of the parse, scan (species
+    classification and AMR detection), report, write, summary and PDF stages
+    are recorded in ``recorder`` and returned in ``metadata["stage_metrics"]``.
+    """
+
+    pathogen = CatalogSearch.from_dataframe(
+        pathogen_reference_df,
+        "species",
+        index=pathogen_index,
+        clusters=pathogen_clusters,
+        matcher=pathogen_matcher,
+        sketches=pathogen_sketches,
+    )
+    amr = CatalogSearch.from_dataframe(
+        amr_reference_df,
+        "gene_name",
+        index=amr_index,
+        clusters=amr_clusters,
+        matcher=amr_matcher,
+    )
+
+    recorder = recorder or StageRecorder()
+    text_source = source if source is not None else StringIO(fasta_text or "")
+    batches: Iterable[SequenceBatch] = ()
+    if batch_size > 0:
+        if sequences is not None:
+            batches = iter_batches(sequences, batch_size)
+        else:
+            batches = SequenceBatch.iter_source(text_source, batch_size)
+    else:
+        with recorder.stage("parse") as stage, _parsing():
+            if sequences is None:
+                sequences = SequenceBatch.from_source(text_source)
+            sequences = ensure_batch(sequences)
+            stage.records += len(sequences)
+            stage.bases += int(sequences.lengths.sum())
+        if not len(sequences):
+            raise PipelineError("No sequences found in FASTA input.")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pathogen_stats = MatchStats()
+    amr_stats = MatchStats()
     metadata = build_reference_metadata()
     metadata["references"] = {
         "amr_reference": str(amr_reference_df.shape[0]) + " genes",
         "pathogen_reference": str(pathogen_reference_df.shape[0]) + " species",
     }
+    metadata["catalog_versions"] = {
+        "amr_reference": amr_reference_df.attrs.get("catalog_version"),
+        "pathogen_reference": pathogen_reference_df.attrs.get("catalog_version"),
+    }
     metadata["pipeline_version"] = PIPELINE_VERSION
     if submission_metadata:
         metadata.update(submission_metadata)
 
-    pdf_path: Optional[Path] = None
-    try:
-        pdf_path = output_dir / f"report_{job_id}.pdf"
-        build_pdf_report(report_df, summary, metadata, pdf_path)
-    except Exception:
-        pdf_path = None
+    graph = StageGraph(recorder, max_workers=stage_workers)
+    report_paths: dict[str, Path] = {}
+    report_df: Optional[pd.DataFrame] = None
+    batch_count = 0
+    if batch_size > 0:
+        accumulator = SummaryAccumulator()
+        risk_rng = random.Random(seed)
+
+        def report_chunks() -> Iterator[pd.DataFrame]:
+            nonlocal batch_count
+            batch_iter = iter(batches)
+            while True:
+                # Stage blocks must not span a yield, so each one closes before the chunks are handed out.
+                with recorder.stage("parse") as stage, _parsing():
+                    batch = next(batch_iter, None)
+                    if batch is not None:
+                        stage.records += len(batch)
+                        stage.bases += int(batch.lengths.sum())
+                if batch is None:
+                    return
+                with recorder.stage("scan") as stage:
+                    scan = scan_batch(batch, pathogen=pathogen, amr=amr, engine=engine, amr_seed_index=amr_seed_index)
+                    stage.records += len(batch)
+                    stage.bases += int(batch.lengths.sum())
+                pathogen_stats.merge(scan.pathogen_stats)
+                amr_stats.merge(scan.amr_stats)
+                with recorder.stage("report") as stage:
+                    batch_df = build_report(
+                        batch,
+                        amr_results=scan.amr,
+                        species_columns=scan.species,
+                        submission_metadata=submission_metadata,
+                        risk_rng=risk_rng,
+                    )
+                    stage.records += len(batch_df)
+                batch_count += 1
+                for chunk in iter_chunks(batch_df):
+                    with recorder.stage("summary"):
+                        accumulator.update(chunk)
+                    yield chunk
+
+        # Batches are produced and written in turn; the stages after the last write form the graph.
+        with recorder.stage("write") as write_stage:
+            report_paths = write_report(report_chunks(), output_dir, job_id, report_formats)
+            write_stage.records += accumulator.sequence_count
+        if not accumulator.sequence_count:
+            raise PipelineError("No sequences found in FASTA input.")
+        record_count = accumulator.sequence_count
+        graph.add("summary", lambda done: accumulator.summary(submission_metadata=submission_metadata))
+        write_stages: list[str] = []
+    else:
+        batch = sequences
+        batch_count = 1
+        record_count = len(batch)
+        base_count = int(batch.lengths.sum())
+        graph.add(
+            "scan",
+            lambda done: scan_batch(batch, pathogen=pathogen, amr=amr, engine=engine, amr_seed_index=amr_seed_index),
+            records=record_count,
+            bases=base_count,
+        )
+        graph.add(
+            "report",
+            lambda done: build_report(
+                batch,
+                amr_results=done["scan"].amr,
+                seed=seed,
+                species_columns=done["scan"].species,
+                submission_metadata=submission_metadata,
+            ),
+            after=("scan",),
+            records=record_count,
+        )
+        # Each format has its own writer, so the files are written side by side.
+        write_stages = [f"write_{fmt}" for fmt in report_formats]
+        for fmt in report_formats:
+            graph.add(
+                f"write_{fmt}",
+                lambda done, fmt=fmt: write_report(iter_chunks(done["report"]), output_dir, job_id, (fmt,))[fmt],
+                after=("report",),
+                records=record_count,
+            )
+        graph.add(
+            "summary",
+            lambda done: SummaryAccumulator().update(done["report"]).summary(submission_metadata=submission_metadata),
+            after=("report",),
+            records=record_count,
+        )
+
+    def write_summary_csv(done: Mapping[str, object]) -> Optional[Path]:
+        summary = done["summary"]
+        if not summary["sequence_count"]:  # type: ignore[index]
+            return None
+        return save_summary_csv(summary, output_dir / f"summary_{job_id}.csv")  # type: ignore[arg-type]
+
+    def render_pdf_stage(done: Mapping[str, object]) -> Optional[Path]:
+        try:
+            if "report" not in done:
+                # Streamed reports are not kept in memory; render from the CSV.
+                renderer = PdfRenderer(max_rows=pdf_max_rows)
+                return renderer.render(report_paths["csv"], {**metadata, "summary": done["summary"]})
+            return build_pdf_report(
+                done["report"], done["summary"], metadata, output_dir / f"report_{job_id}.pdf", max_rows=pdf_max_rows
+            )
+        except Exception:
+            return None
+
+    def point_latest_report(done: Mapping[str, object]) -> Path:
+        paths = report_paths or {fmt: done[f"write_{fmt}"] for fmt in report_formats}
+        return update_latest_report(output_dir, job_id, paths)  # type: ignore[arg-type]
+
+    graph.add("summary_csv", write_summary_csv, after=("summary",))
+    if render_pdf:
+        pdf_inputs = ("summary",) if batch_size > 0 else ("report", "summary")
+        graph.add("pdf", render_pdf_stage, after=pdf_inputs, records=record_count)
+    graph.add("latest_report", point_latest_report, after=write_stages)
+    done = graph.run()
+
+    if batch_size <= 0:
+        report_df = done["report"]  # type: ignore[assignment]
+        report_paths = {fmt: done[f"write_{fmt}"] for fmt in report_formats}  # type: ignore[misc]
+        scan = done["scan"]
+        pathogen_stats.merge(scan.pathogen_stats)  # type: ignore[attr-defined]
+        amr_stats.merge(scan.amr_stats)  # type: ignore[attr-defined]
+    summary = done["summary"]
+    summary_path: Optional[Path] = done["summary_csv"]  # type: ignore[assignment]
+    pdf_path: Optional[Path] = done.get("pdf")  # type: ignore[assignment]
+
+    metadata["report_formats"] = list(report_paths)
+    metadata["summary"] = summary
+    metadata["alignment_stats"] = {
+        "amr_reference": amr_stats.as_dict(),
+        "pathogen_reference": pathogen_stats.as_dict(),
+    }
+    if batch_size > 0:
+        metadata["streaming"] = {"batch_size": batch_size, "batches": batch_count}
+    if submission_metadata:
+        metadata.update(submission_metadata)
+    metadata["stage_metrics"] = recorder.as_dict()
+    metadata["stage_graph"] = graph.describe()
 
-    return report_df, job_report_path, summary_path, pdf_path, metadata
+    return report_df, report_paths["csv"], summary_path, pdf_path, metadata  # type: ignore[return-value]
@@ -0,0 +1,183 @@
+"""Single-pass scan of each query against the pathogen and AMR catalogs."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import pandas as pd
+
+from backend.alignment import (
+    AlignerEngine,
+    AlignmentResult,
+    MatchStats,
+    ReferenceCompositions,
+    best_match,
+    get_engine,
+)
+from backend.amr_detection import amr_hits_result, amr_result
+from backend.classify_pathogen import ALIGNMENT_METHOD, SKETCH_METHOD, species_columns
+from backend.kmer_index import KmerIndex, kmer_set
+from backend.parallel import CatalogMatcher
+from backend.reference_bundle import reference_records
+from backend.reference_clusters import ReferenceClusters
+from backend.seed_search import SeedIndex, distinct_hits
+from backend.sequence_batch import SequenceBatch
+from backend.sketch import SketchIndex
+
+
+class PreparedQuery:
+    """A query decoded and upper-cased once, with its k-mer sets computed on first use."""
+
+    def __init__(self, sequence: str) -> None:
+        self.sequence = sequence.upper()
+        self._kmers: dict[int, set[str]] = {}
+
+    def kmers(self, k: int) -> set[str]:
+        kmers = self._kmers.get(k)
+        if kmers is None:
+            kmers = self._kmers[k] = kmer_set(self.sequence, k)
+        return kmers
+
+
+class CatalogSearch:
+    """How one reference catalog is searched.
+
+    ``sketches`` replaces alignment with sketch estimates; otherwise clusters
+    come first, then a k-mer index, else every record is aligned. Base
+    compositions for the alignment bound come with the index or clusters, or
+    are counted here once.
+    """
+
+    def __init__(
+        self,
+        records: Sequence[tuple[str, str]],
+        *,
+        index: Optional[KmerIndex] = None,
+        clusters: Optional[ReferenceClusters] = None,
+        matcher: Optional[CatalogMatcher] = None,
+        sketches: Optional[SketchIndex] = None,
+    ) -> None:
+        self.records = records
+        self.index = index
+        self.clusters = clusters
+        self.matcher = matcher if sketches is None else None
+        self.sketches = sketches
+        self.compositions: Optional[ReferenceCompositions] = None
+        if sketches is None and clusters is None and index is None:
+            self.compositions = ReferenceCompositions.from_records(records)
+
+    @property
+    def method(self) -> str:
+        return SKETCH_METHOD if self.sketches is not None else ALIGNMENT_METHOD
+
+    @classmethod
+    def from_dataframe(cls, reference_df: pd.DataFrame, label_column: str, **kwargs) -> "CatalogSearch":
+        return cls(reference_records(reference_df, label_column), **kwargs)
+
+    def best_match(
+        self, query: PreparedQuery, *, engine: AlignerEngine, stats: Optional[MatchStats] = None
+    ) -> tuple[str, AlignmentResult]:
+        if self.sketches is not None:
+            return self.sketches.best_match(query.sequence, stats=stats)
+        if self.clusters is not None:
+            index = self.clusters.index
+            kmers = query.kmers(index.k) if index is not None else None
+            return self.clusters.best_match(query.sequence, engine=engine, stats=stats, kmers=kmers)
+        if self.index is not None:
+            return best_match(
+                query.sequence,
+                self.index.records,
+                engine=engine,
+                stats=stats,
+                positions=self.index.shortlist_positions(query.sequence, kmers=query.kmers(self.index.k)),
+                compositions=self.index.compositions,
+            )
+        return best_match(query.sequence, self.records, engine=engine, stats=stats, compositions=self.compositions)
+
+
+@dataclass
+class ScanResult:
+    """Species columns (as from ``classify_batch``) and AMR columns (the fields of ``detect_amr_genes`` rows)."""
+
+    species: dict[str, list[object]]
+    amr: dict[str, list[object]]
+    pathogen_stats: MatchStats = field(default_factory=MatchStats)
+    amr_stats: MatchStats = field(default_factory=MatchStats)
+
+
+def scan_batch(
+    batch: SequenceBatch,
+    *,
+    pathogen: CatalogSearch,
+    amr: CatalogSearch,
+    engine: Optional[AlignerEngine] = None,
+    amr_seed_index: Optional[SeedIndex] = None,
+) -> ScanResult:
+    """Classify every query and detect its AMR gene in one pass over the batch.
+
+    Each query is decoded, upper-cased and k-merised once and then matched
+    against both catalogs back to back, with the same rules and results as
+    running ``classify_batch`` and ``detect_amr_genes`` separately. Catalogs
+    with a process-pool ``matcher`` are searched on the pool for the whole
+    batch up front, the two catalogs concurrently; the fused pass covers the
+    rest.
+    """
+
+    engine = engine or get_engine()
+    pathogen_stats = MatchStats()
+    amr_stats = MatchStats()
+    lengths = batch.lengths
+    contigs = {
+        position
+        for position in range(len(batch))
+        if amr_seed_index is not None and amr_seed_index.applies_to_length(int(lengths[position]))
+    }
+
+    pooled_species: Optional[list[tuple[str, AlignmentResult]]] = None
+    pooled_amr: dict[int, tuple[str, AlignmentResult]] = {}
+    amr_future: Optional[Future] = None
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="amr-pool") as pool:
+        if amr.matcher is not None:
+            # Both searches only wait on the worker processes, so the AMR one runs alongside.
+            whole_sequence = [position for position in range(len(batch)) if position not in contigs]
+            amr_future = pool.submit(
+                amr.matcher.best_matches, [batch.sequence(position) for position in whole_sequence], amr_stats
+            )
+        if pathogen.matcher is not None:
+            pooled_species = pathogen.matcher.best_matches(list(batch.iter_sequences()), pathogen_stats)
+        if amr_future is not None:
+            pooled_amr = dict(zip(whole_sequence, amr_future.result()))
+
+    species_matches: list[tuple[str, AlignmentResult]] = []
+    amr_columns: dict[str, list[object]] = defaultdict(list)
+
+    def add_amr_row(row: dict[str, object]) -> None:
+        for name, value in row.items():
+            amr_columns[name].append(value)
+
+    for position, record_id in enumerate(batch.ids):
+        query = PreparedQuery(batch.sequence(position))
+        if pooled_species is not None:
+            species_matches.append(pooled_species[position])
+        else:
+            species_matches.append(pathogen.best_match(query, engine=engine, stats=pathogen_stats))
+
+        if position in contigs:
+            hits = distinct_hits(amr_seed_index.locate(query.sequence, engine=engine))  # type: ignore[union-attr]
+            add_amr_row(amr_hits_result(record_id, hits))
+            continue
+        if amr.matcher is not None:
+            match = pooled_amr[position]
+        else:
+            match = amr.best_match(query, engine=engine, stats=amr_stats)
+        add_amr_row(amr_result(record_id, int(lengths[position]), match))
+
+    return ScanResult(
+        species=species_columns(species_matches, method=pathogen.method),
+        amr=dict(amr_columns),
+        pathogen_stats=pathogen_stats,
+        amr_stats=amr_stats,
+    )
@@ -0,0 +1,366 @@
+"""Precompiled, memory-mapped reference catalogs.
+
+A bundle stores a catalog as 2-bit packed bases with an offsets table, the
+non-ACGT bases as exceptions, and a JSON header with the labels, any extra
+CSV columns, a catalog version hash and optionally precomputed redundancy
+clusters. A loaded bundle stays the catalog: its records are decoded one at
+a time when read, and worker processes map the file themselves. Build one
+with::
+
+    python -m backend.reference_bundle data/resistance_genes_reference.csv --label-column gene_name
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from collections.abc import Sequence as SequenceABC
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+BUNDLE_SUFFIX = ".vpref"
+BUNDLE_MAGIC = b"VPREF001"
+_ALIGNMENT = 64
+# ``(byte >> 1) & 3`` maps A, C, T, G to 0..3; decoding reverses it.
+_DECODE = np.frombuffer(b"ACTG", dtype=np.uint8)
+_ACGT = np.zeros(256, dtype=bool)
+_ACGT[list(b"ACGT")] = True
+# Records decoded together when a bundle catalog is iterated.
+DECODE_BLOCK_RECORDS = 64
+
+
+def catalog_version(labels: Iterable[object], sequences: Iterable[str]) -> str:
+    """Digest of a catalog's labels and (upper-cased) sequences; missing sequences count as empty."""
+
+    digest = hashlib.blake2b(digest_size=16)
+    for label, sequence in zip(labels, sequences):
+        digest.update(f"{label}\t{sequence if isinstance(sequence, str) else ''}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_bundle(path: str | Path) -> bool:
+    path = Path(path)
+    if path.suffix != BUNDLE_SUFFIX or not path.is_file():
+        return False
+    with open(path, "rb") as handle:
+        return handle.read(len(BUNDLE_MAGIC)) == BUNDLE_MAGIC
+
+
+def bundle_path_for(csv_path: str | Path) -> Path:
+    return Path(csv_path).with_suffix(BUNDLE_SUFFIX)
+
+
+def preferred_reference_path(csv_path: str | Path) -> Path:
+    """Return the compiled bundle next to ``csv_path`` when it is at least as new as the CSV."""
+
+    csv_path = Path(csv_path)
+    bundle = bundle_path_for(csv_path)
+    if is_bundle(bundle) and (not csv_path.exists() or bundle.stat().st_mtime >= csv_path.stat().st_mtime):
+        return bundle
+    return csv_path
+
+
+def read_reference(path: str | Path, label_column: str) -> pd.DataFrame:
+    """Load a reference catalog from a bundle or a CSV, with upper-cased sequences.
+
+    The catalog version is stored in ``df.attrs["catalog_version"]`` and any
+    clusters compiled into a bundle in ``df.attrs["clusters"]``. A bundle is
+    not decoded: the DataFrame holds its labels and extra columns and the
+    bundle itself in ``df.attrs["bundle"]`` instead of a ``sequence`` column.
+    Read the records of either kind with :func:`reference_records`.
+    """
+
+    if is_bundle(path):
+        return load_bundle(path).catalog_frame()
+    df = pd.read_csv(path)
+    if "sequence" in df.columns:
+        df["sequence"] = df["sequence"].str.upper()
+        if label_column in df.columns:
+            df.attrs["catalog_version"] = catalog_version(df[label_column], df["sequence"])
+    return df
+
+
+def reference_bundle(reference_df: pd.DataFrame) -> Optional["ReferenceBundle"]:
+    """The bundle a catalog DataFrame was loaded from, or None for one with a ``sequence`` column."""
+
+    return reference_df.attrs.get("bundle")
+
+
+def reference_records(reference_df: pd.DataFrame, label_column: str) -> Sequence[tuple[str, str]]:
+    """``(label, sequence)`` pairs of a catalog: decoded on demand from its bundle, else read from its columns."""
+
+    bundle = reference_bundle(reference_df)
+    if bundle is not None:
+        return bundle.records()
+    return list(reference_df[[label_column, "sequence"]].itertuples(index=False, name=None))
+
+
+def upper_case_records(records: Iterable[tuple[str, str]]) -> Sequence[tuple[str, str]]:
+    """``records`` with upper-cased sequences; bundle records already are and stay undecoded."""
+
+    if isinstance(records, BundleRecords):
+        return records
+    return [(label, str(sequence).upper()) for label, sequence in records]
+
+
+def _pack(sequences: Sequence[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    raw = np.frombuffer("".join(sequences).encode("ascii", "replace"), dtype=np.uint8)
+    exception_positions = np.flatnonzero(~_ACGT[raw])
+    exception_bases = raw[exception_positions]
+    codes = np.zeros(-(-len(raw) // 4) * 4, dtype=np.uint8)
+    codes[: len(raw)] = (raw >> 1) & 3
+    quads = codes.reshape(-1, 4)
+    packed = quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+    return offsets, packed.astype(np.uint8), exception_positions.astype(np.int64), exception_bases
+
+
+def build_bundle(
+    reference_df: pd.DataFrame,
+    output_path: str | Path,
+    *,
+    label_column: str,
+    source: str = "",
+    cluster_identity: Optional[float] = None,
+) -> Path:
+    """Compile a reference catalog DataFrame (label + ``sequence`` columns) into a bundle.
+
+    With ``cluster_identity``, the catalog's redundancy clusters are computed
+    now and stored in the header, so startup does not have to recluster it.
+    """
+
+    if not {label_column, "sequence"}.issubset(reference_df.columns):
+        raise ValueError(f"Reference must contain {label_column!r} and 'sequence' columns.")
+    sequences = [sequence.upper() if isinstance(sequence, str) else "" for sequence in reference_df["sequence"]]
+    labels = reference_df[label_column].tolist()
+    offsets, packed, exception_positions, exception_bases = _pack(sequences)
+    extra = {
+        column: reference_df[column].where(reference_df[column].notna(), None).tolist()
+        for column in reference_df.columns
+        if column not in {label_column, "sequence"}
+    }
+
+    arrays = {
+        "offsets": offsets,
+        "packed": packed,
+        "exception_positions": exception_positions,
+        "exception_bases": exception_bases,
+    }
+    layout: dict[str, list[object]] = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = [position, str(array.dtype), int(array.size)]
+        position += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    header = {
+        "version": catalog_version(labels, sequences),
+        "label_column": label_column,
+        "labels": labels,
+        "columns": extra,
+        "count": len(sequences),
+        "total_bases": int(offsets[-1]),
+        "source": source,
+        "arrays": layout,
+    }
+    if cluster_identity is not None:
+        from backend.reference_clusters import cluster_representatives
+
+        header["clusters"] = {
+            "identity": cluster_identity,
+            "representatives": cluster_representatives(
+                list(zip(labels, sequences)), identity=cluster_identity
+            ).tolist(),
+        }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(BUNDLE_MAGIC) + 8 + len(header_bytes)) // _ALIGNMENT) * _ALIGNMENT
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output_path.with_suffix(output_path.suffix + ".tmp")
+    with open(temporary, "wb") as handle:
+        handle.write(BUNDLE_MAGIC)
+        handle.write(len(header_bytes).to_bytes(8, "little"))
+        handle.write(header_bytes)
+        handle.write(b"\0" * (data_start - handle.tell()))
+        for name, array in arrays.items():
+            start = data_start + layout[name][0]  # type: ignore[operator]
+            handle.write(b"\0" * (start - handle.tell()))
+            handle.write(array.tobytes())
+    temporary.replace(output_path)
+    return output_path
+
+
+@dataclass
+class ReferenceBundle:
+    """A memory-mapped reference catalog; arrays are read-only views of the file."""
+
+    path: Path
+    version: str
+    label_column: str
+    labels: list[object]
+    columns: dict[str, list[object]]
+    offsets: np.ndarray
+    packed: np.ndarray
+    exception_positions: np.ndarray
+    exception_bases: np.ndarray
+    source: str = ""
+    clusters: Optional[dict[str, object]] = None
+    _records: Optional["BundleRecords"] = field(default=None, init=False, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __reduce__(self):
+        return load_bundle, (str(self.path),)
+
+    def __deepcopy__(self, memo) -> "ReferenceBundle":
+        # Read-only views of a file: copies (e.g. of DataFrame attrs) share the mapping.
+        return self
+
+    def records(self) -> "BundleRecords":
+        if self._records is None:
+            self._records = BundleRecords(self)
+        return self._records
+
+    def decode(self, start: int = 0, stop: Optional[int] = None) -> list[str]:
+        """Unpack the sequences of records ``start:stop``."""
+
+        stop = len(self) if stop is None else stop
+        first, last = int(self.offsets[start]), int(self.offsets[stop])
+        if last == first:
+            return [""] * (stop - start)
+        quads = self.packed[first // 4 : -(-last // 4)]
+        codes = np.stack([(quads >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).ravel()
+        bases = _DECODE[codes[first % 4 : first % 4 + last - first]]
+        lo, hi = np.searchsorted(self.exception_positions, [first, last])
+        bases[self.exception_positions[lo:hi] - first] = self.exception_bases[lo:hi]
+        text = bases.tobytes().decode("ascii")
+        bounds = (self.offsets[start : stop + 1] - first).tolist()
+        return [text[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def sequence(self, position: int) -> str:
+        return self.decode(position, position + 1)[0]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """The whole catalog decoded, as read from its CSV."""
+
+        df = pd.DataFrame({self.label_column: self.labels, "sequence": self.decode(), **self.columns})
+        df.attrs["catalog_version"] = self.version
+        if self.clusters is not None:
+            df.attrs["clusters"] = self.clusters
+        return df
+
+    def catalog_frame(self) -> pd.DataFrame:
+        """Labels and extra columns, with this bundle in ``attrs["bundle"]`` in place of the sequences."""
+
+        df = pd.DataFrame({self.label_column: self.labels, **self.columns})
+        df.attrs["catalog_version"] = self.version
+        df.attrs["bundle"] = self
+        if self.clusters is not None:
+            df.attrs["clusters"] = self.clusters
+        return df
+
+
+class BundleRecords(SequenceABC):
+    """The ``(label, sequence)`` records of a bundle, decoded when read.
+
+    Iteration decodes ``DECODE_BLOCK_RECORDS`` records at a time. Pickling
+    sends the bundle's path and version only, so a worker process maps the
+    file itself; a bundle replaced since (a different version) is refused.
+    """
+
+    def __init__(self, bundle: ReferenceBundle) -> None:
+        self.bundle = bundle
+
+    def __len__(self) -> int:
+        return len(self.bundle)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            start, stop, step = position.indices(len(self))
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            return list(zip(self.bundle.labels[start:stop], self.bundle.decode(start, max(start, stop))))
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("bundle record index out of range")
+        return self.bundle.labels[position], self.bundle.sequence(position)
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        for start in range(0, len(self), DECODE_BLOCK_RECORDS):
+            yield from self[start : start + DECODE_BLOCK_RECORDS]
+
+    def __reduce__(self):
+        return _open_records, (str(self.bundle.path), self.bundle.version)
+
+
+def _open_records(path: str, version: str) -> BundleRecords:
+    bundle = load_bundle(path)
+    if bundle.version != version:
+        raise ValueError(f"Reference bundle {path} changed: version {bundle.version}, expected {version}.")
+    return bundle.records()
+
+
+def load_bundle(path: str | Path) -> ReferenceBundle:
+    """Memory-map a bundle written by :func:`build_bundle`."""
+
+    path = Path(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mapped[: len(BUNDLE_MAGIC)]) != BUNDLE_MAGIC:
+        raise ValueError(f"Not a reference bundle: {path}")
+    header_length = int.from_bytes(bytes(mapped[len(BUNDLE_MAGIC) : len(BUNDLE_MAGIC) + 8]), "little")
+    header_start = len(BUNDLE_MAGIC) + 8
+    header = json.loads(bytes(mapped[header_start : header_start + header_length]).decode("utf-8"))
+    data_start = -(-(header_start + header_length) // _ALIGNMENT) * _ALIGNMENT
+
+    arrays = {}
+    for name, (offset, dtype, size) in header["arrays"].items():
+        start = data_start + offset
+        arrays[name] = mapped[start : start + size * np.dtype(dtype).itemsize].view(dtype)
+    return ReferenceBundle(
+        path=path,
+        version=header["version"],
+        label_column=header["label_column"],
+        labels=header["labels"],
+        columns=header["columns"],
+        source=header.get("source", ""),
+        clusters=header.get("clusters"),
+        **arrays,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compile a reference CSV into a memory-mapped bundle.")
+    parser.add_argument("csv", type=Path, help="Reference CSV with a label column and a 'sequence' column.")
+    parser.add_argument("--label-column", required=True, help="Column holding the record labels.")
+    parser.add_argument("--output", type=Path, help=f"Bundle path (default: the CSV path with {BUNDLE_SUFFIX}).")
+    parser.add_argument(
+        "--cluster-identity",
+        type=float,
+        help="Precompute redundancy clusters at this percent identity (see VETPATHOGEN_CLUSTER_IDENTITY).",
+    )
+    args = parser.parse_args(argv)
+
+    output = build_bundle(
+        pd.read_csv(args.csv),
+        args.output or bundle_path_for(args.csv),
+        label_column=args.label_column,
+        source=args.csv.name,
+        cluster_identity=args.cluster_identity,
+    )
+    bundle = load_bundle(output)
+    clusters = ""
+    if bundle.clusters is not None:
+        clusters = f", {len(set(bundle.clusters['representatives']))} clusters"  # type: ignore[arg-type]
+    print(f"Wrote {output} ({len(bundle)} records{clusters}, version {bundle.version})")
+
+
+if __name__ == "__main__":
+    main()
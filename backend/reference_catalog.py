@@ -0,0 +1,316 @@
+"""Versioned reference catalogs with background reloads and atomic swaps."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence
+
+import pandas as pd
+
+from backend.alignment import AlignerEngine, get_engine
+from backend.alignment_cache import CachedAlignerEngine, catalog_fingerprint, create_alignment_cache, engine_digest
+from backend.banded_alignment import BandPolicy
+from backend.classify_pathogen import ALIGNMENT_METHOD, SKETCH_METHOD
+from backend.kmer_index import DEFAULT_K, DEFAULT_TOP_N, KmerIndex
+from backend.parallel import AlignmentExecutor, create_alignment_executor
+from backend.reference_bundle import catalog_version, reference_records
+from backend.reference_clusters import ReferenceClusters
+from backend.seed_search import SeedIndex
+from backend.sketch import DEFAULT_SCALED, DEFAULT_SKETCH_K, SketchIndex
+
+CatalogLoader = Callable[[], tuple[pd.DataFrame, pd.DataFrame]]
+
+
+@dataclass
+class CatalogSnapshot:
+    """One immutable version of the reference catalogs and everything built from them."""
+
+    amr_reference_df: pd.DataFrame
+    pathogen_reference_df: pd.DataFrame
+    engine: AlignerEngine
+    amr_index: Optional[KmerIndex] = None
+    pathogen_index: Optional[KmerIndex] = None
+    amr_seed_index: Optional[SeedIndex] = None
+    executor: Optional[AlignmentExecutor] = None
+    amr_clusters: Optional[ReferenceClusters] = None
+    pathogen_clusters: Optional[ReferenceClusters] = None
+    pathogen_sketches: Optional[SketchIndex] = None
+    versions: dict[str, str] = field(default_factory=dict)
+    # Search parameters that change results (prefilter, clustering, classifier, scoring).
+    settings: dict[str, object] = field(default_factory=dict)
+    loaded_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+    @property
+    def version(self) -> str:
+        """Digest of both catalog versions."""
+
+        combined = "\n".join(f"{name}={value}" for name, value in sorted(self.versions.items()))
+        return hashlib.blake2b(combined.encode("utf-8"), digest_size=8).hexdigest()
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the catalog version and the search settings: what a job's results depend on."""
+
+        combined = self.version + "\n" + json.dumps(self.settings, sort_keys=True, default=str)
+        return hashlib.blake2b(combined.encode("utf-8"), digest_size=16).hexdigest()
+
+    def describe(self) -> dict[str, object]:
+        return {
+            "catalog_version": self.version,
+            "catalog_versions": dict(self.versions),
+            "loaded_at": self.loaded_at,
+            "amr_reference": int(self.amr_reference_df.shape[0]),
+            "pathogen_reference": int(self.pathogen_reference_df.shape[0]),
+            "amr_clusters": self.amr_clusters.cluster_count if self.amr_clusters is not None else None,
+            "pathogen_clusters": (
+                self.pathogen_clusters.cluster_count if self.pathogen_clusters is not None else None
+            ),
+            "species_method": SKETCH_METHOD if self.pathogen_sketches is not None else ALIGNMENT_METHOD,
+            "settings": dict(self.settings),
+        }
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+        cache = getattr(self.engine, "cache", None)
+        if cache is not None:
+            cache.flush()
+
+
+def _version_of(df: pd.DataFrame, label_column: str) -> str:
+    return str(df.attrs.get("catalog_version") or catalog_version(df[label_column], df["sequence"]))
+
+
+def build_catalog_snapshot(amr_reference_df: pd.DataFrame, pathogen_reference_df: pd.DataFrame) -> CatalogSnapshot:
+    """Build indexes, clusters, engine, cache and worker pool for a catalog pair from the environment."""
+
+    prefilter_k = int(os.getenv("VETPATHOGEN_PREFILTER_K", str(DEFAULT_K)))
+    prefilter_top_n = int(os.getenv("VETPATHOGEN_PREFILTER_TOP_N", str(DEFAULT_TOP_N)))
+    amr_index = pathogen_index = None
+    if prefilter_top_n > 0:
+        amr_index = KmerIndex.from_dataframe(
+            amr_reference_df, "gene_name", k=prefilter_k, top_n=prefilter_top_n
+        )
+        pathogen_index = KmerIndex.from_dataframe(
+            pathogen_reference_df, "species", k=prefilter_k, top_n=prefilter_top_n
+        )
+    cluster_identity = float(os.getenv("VETPATHOGEN_CLUSTER_IDENTITY", "0"))
+    amr_clusters = pathogen_clusters = None
+    if cluster_identity > 0:
+        # Representatives get their own prefilter index; the full-catalog
+        # indexes still serve the seed search. Workers get the clusters too.
+        amr_clusters = ReferenceClusters.from_dataframe(
+            amr_reference_df, "gene_name", identity=cluster_identity, k=prefilter_k, top_n=prefilter_top_n
+        )
+        pathogen_clusters = ReferenceClusters.from_dataframe(
+            pathogen_reference_df, "species", identity=cluster_identity, k=prefilter_k, top_n=prefilter_top_n
+        )
+    settings: dict[str, object] = {
+        "prefilter_k": prefilter_k,
+        "prefilter_top_n": prefilter_top_n,
+        "cluster_identity": cluster_identity,
+    }
+    pathogen_sketches = None
+    if os.getenv("VETPATHOGEN_CLASSIFIER", "alignment").lower() == "sketch":
+        pathogen_sketches = SketchIndex.from_dataframe(
+            pathogen_reference_df,
+            "species",
+            k=int(os.getenv("VETPATHOGEN_SKETCH_K", str(DEFAULT_SKETCH_K))),
+            scaled=int(os.getenv("VETPATHOGEN_SKETCH_SCALED", str(DEFAULT_SCALED))),
+        )
+        settings["sketch"] = {
+            "k": pathogen_sketches.k,
+            "scaled": pathogen_sketches.scaled,
+            "min_shared": pathogen_sketches.min_shared,
+            "min_sketch_size": pathogen_sketches.min_sketch_size,
+            "skipped_references": len(pathogen_sketches.skipped),
+        }
+    band: Optional[BandPolicy] = None
+    if os.getenv("VETPATHOGEN_BANDED_ALIGNMENT", "false").lower() == "true":
+        band = BandPolicy(
+            max_dp_bytes=int(os.getenv("VETPATHOGEN_ALIGN_MAX_DP_BYTES", str(BandPolicy.max_dp_bytes)))
+        )
+    engine: AlignerEngine = get_engine(band=band)
+    settings["engine"] = engine_digest(engine)
+    catalogs = {
+        "amr": reference_records(amr_reference_df, "gene_name"),
+        "pathogen": reference_records(pathogen_reference_df, "species"),
+    }
+    cache = create_alignment_cache(catalog_fingerprint(engine, catalogs.values()))
+    if cache is not None:
+        engine = CachedAlignerEngine(engine, cache)
+    executor = create_alignment_executor(
+        catalogs,
+        indexes={"amr": amr_index, "pathogen": pathogen_index},
+        clusters={"amr": amr_clusters, "pathogen": pathogen_clusters},
+        engine=engine,
+    )
+    return CatalogSnapshot(
+        amr_reference_df=amr_reference_df,
+        pathogen_reference_df=pathogen_reference_df,
+        engine=engine,
+        amr_index=amr_index,
+        pathogen_index=pathogen_index,
+        amr_seed_index=SeedIndex.from_dataframe(amr_reference_df, "gene_name"),
+        executor=executor,
+        amr_clusters=amr_clusters,
+        pathogen_clusters=pathogen_clusters,
+        pathogen_sketches=pathogen_sketches,
+        versions={
+            "amr_reference": _version_of(amr_reference_df, "gene_name"),
+            "pathogen_reference": _version_of(pathogen_reference_df, "species"),
+        },
+        settings=settings,
+    )
+
+
+class CatalogManager:
+    """Hold the current :class:`CatalogSnapshot` and swap in reloaded versions.
+
+    Jobs take the current snapshot with :meth:`acquire` and keep it until they
+    finish, so a reload never changes the catalogs under a running job. A
+    reload loads and indexes the new version on a background thread and then
+    replaces the current snapshot under a lock; a replaced snapshot releases
+    its worker pool once its last job finishes. An optional watcher polls the
+    catalog files and reloads when their modification times change.
+    """
+
+    def __init__(
+        self,
+        snapshot: CatalogSnapshot,
+        *,
+        loader: Optional[CatalogLoader] = None,
+        builder: Callable[[pd.DataFrame, pd.DataFrame], CatalogSnapshot] = build_catalog_snapshot,
+    ) -> None:
+        self._current = snapshot
+        self.loader = loader
+        self.builder = builder
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._users: dict[int, int] = {}
+        self._retired: dict[int, CatalogSnapshot] = {}
+        self._reload_thread: Optional[threading.Thread] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        with self._lock:
+            return self._current
+
+    @contextmanager
+    def acquire(self) -> Iterator[CatalogSnapshot]:
+        """Pin the current snapshot for the duration of a job."""
+
+        with self._lock:
+            snapshot = self._current
+            self._users[id(snapshot)] = self._users.get(id(snapshot), 0) + 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                remaining = self._users[id(snapshot)] - 1
+                if remaining:
+                    self._users[id(snapshot)] = remaining
+                else:
+                    del self._users[id(snapshot)]
+                release = not remaining and self._retired.pop(id(snapshot), None) is not None
+            if release:
+                snapshot.shutdown()
+
+    def swap(self, snapshot: CatalogSnapshot) -> CatalogSnapshot:
+        """Make ``snapshot`` current and retire the previous one."""
+
+        with self._lock:
+            previous, self._current = self._current, snapshot
+            in_use = id(previous) in self._users
+            if in_use:
+                self._retired[id(previous)] = previous
+        if not in_use:
+            previous.shutdown()
+        return previous
+
+    def reload(self) -> dict[str, object]:
+        """Load, index and swap in the catalogs returned by the loader (blocking)."""
+
+        if self.loader is None:
+            raise RuntimeError("No catalog loader configured.")
+        with self._reload_lock:
+            try:
+                amr_reference_df, pathogen_reference_df = self.loader()
+                snapshot = self.builder(amr_reference_df, pathogen_reference_df)
+            except Exception as exc:
+                self.last_error = str(exc)
+                raise
+            self.last_error = None
+            if snapshot.version == self.current.version:
+                snapshot.shutdown()
+                return {"reloaded": False, **self.current.describe()}
+            self.swap(snapshot)
+            self.reloads += 1
+            return {"reloaded": True, **snapshot.describe()}
+
+    def reload_in_background(self) -> bool:
+        """Start a reload on a background thread; False when one is already running."""
+
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(target=self._reload_quietly, name="catalog-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _reload_quietly(self) -> None:
+        try:
+            self.reload()
+        except Exception:
+            pass  # recorded in ``last_error``
+
+    def status(self) -> dict[str, object]:
+        with self._lock:
+            reloading = self._reload_thread is not None and self._reload_thread.is_alive()
+            retired = len(self._retired)
+        return {
+            **self.current.describe(),
+            "reloading": reloading,
+            "reloads": self.reloads,
+            "retired_versions_in_use": retired,
+            "last_error": self.last_error,
+            "watching": self._watch_thread is not None,
+        }
+
+    def watch(self, paths: Sequence[Path], interval: float) -> None:
+        """Poll ``paths`` every ``interval`` seconds and reload when any of them changes."""
+
+        def signature() -> tuple[Optional[float], ...]:
+            return tuple(path.stat().st_mtime if path.exists() else None for path in paths)
+
+        def run() -> None:
+            seen = signature()
+            while not self._stop.wait(interval):
+                current = signature()
+                if current != seen:
+                    seen = current
+                    self._reload_quietly()
+
+        self._watch_thread = threading.Thread(target=run, name="catalog-watch", daemon=True)
+        self._watch_thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=5)
+        with self._lock:
+            snapshots = [self._current, *self._retired.values()]
+            self._retired.clear()
+        for snapshot in snapshots:
+            snapshot.shutdown()
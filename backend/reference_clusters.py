@@ -0,0 +1,228 @@
+"""Redundancy clustering of reference catalogs for representative-first search."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.alignment import (
+    AlignerEngine,
+    AlignmentResult,
+    MatchStats,
+    ReferenceCompositions,
+    align_within_cap,
+    base_composition,
+    get_engine,
+    is_better_match,
+)
+from backend.kmer_index import DEFAULT_K, KmerIndex, encode_kmers
+from backend.reference_bundle import reference_records, upper_case_records
+
+DEFAULT_CLUSTER_IDENTITY = 95.0
+
+
+def cluster_representatives(
+    records: Sequence[tuple[str, str]],
+    *,
+    identity: float = DEFAULT_CLUSTER_IDENTITY,
+    engine: AlignerEngine | None = None,
+    k: int = DEFAULT_K,
+    compositions: ReferenceCompositions | None = None,
+) -> np.ndarray:
+    """Greedily cluster ``records`` and return each record's representative position.
+
+    Records are visited longest first (catalog order among equal lengths); a
+    record joins the first representative it aligns to with at least
+    ``identity`` percent identity and otherwise starts a new cluster.
+    Representatives are only aligned against when they share enough k-mers to
+    possibly reach ``identity``, so most pairs are never aligned.
+    ``compositions`` takes the records' precomputed :class:`ReferenceCompositions`.
+    """
+
+    engine = engine or get_engine()
+    sequences = [str(sequence).upper() for _, sequence in records]
+    compositions = compositions or ReferenceCompositions.from_records(records)
+    order = sorted(range(len(sequences)), key=lambda position: -len(sequences[position]))
+    representatives = np.arange(len(sequences), dtype=np.int64)
+    postings: dict[int, list[int]] = defaultdict(list)
+    for position in order:
+        sequence = sequences[position]
+        codes = np.unique(encode_kmers(sequence, k)[0]) if len(sequence) >= k else np.empty(0, dtype=np.int64)
+        shared: dict[int, int] = defaultdict(int)
+        for code in codes.tolist():
+            for representative in postings.get(code, ()):
+                shared[representative] += 1
+        # Each differing base destroys at most k k-mers; a pair wrongly filtered
+        # out here only costs an extra cluster, never a wrong search result.
+        differences = int((100.0 - identity) / 100.0 * len(sequence))
+        needed = len(codes) - k * differences
+        composition = compositions.composition(position)
+        for representative in sorted(shared, key=lambda rep: (-shared[rep], rep)):
+            if shared[representative] < needed:
+                break
+            if compositions.bounds(composition, [representative])[0] < identity:
+                continue
+            result = align_within_cap(engine, sequence, sequences[representative])
+            if result is not None and result.identity >= identity:
+                representatives[position] = representative
+                break
+        else:
+            for code in codes.tolist():
+                postings[code].append(position)
+    return representatives
+
+
+class ReferenceClusters:
+    """A reference catalog grouped into identity clusters, searched representatives first.
+
+    :meth:`best_match_index` aligns the query against cluster representatives
+    (optionally shortlisted by a k-mer index over the representatives) and then
+    only against the members of clusters whose representative scored within
+    ``100 - identity`` points of the best identity found. Since every member is
+    at least ``identity`` percent identical to its representative, a member can
+    only beat its representative by about that margin, so the answer matches an
+    exhaustive :func:`~backend.alignment.best_match_index` scan. The tolerance:
+    alignment identity is not a strict metric, and a member that beats its
+    representative by more than the margin (possible with gapped alignments of
+    sequences of different lengths) can be missed, in which case the best hit
+    of the searched clusters is returned instead.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[tuple[str, str]],
+        *,
+        identity: float = DEFAULT_CLUSTER_IDENTITY,
+        representatives: Sequence[int] | None = None,
+        engine: AlignerEngine | None = None,
+        k: int = DEFAULT_K,
+        top_n: int = 0,
+    ) -> None:
+        self.records: Sequence[tuple[str, str]] = upper_case_records(records)
+        self.identity = identity
+        self.compositions = ReferenceCompositions.from_records(self.records)
+        if representatives is None:
+            representatives = cluster_representatives(
+                self.records, identity=identity, engine=engine, k=k, compositions=self.compositions
+            )
+        self.representatives = np.asarray(representatives, dtype=np.int64)
+        if len(self.representatives) != len(self.records):
+            raise ValueError("representatives must have one entry per record.")
+        members: dict[int, list[int]] = defaultdict(list)
+        for position, representative in enumerate(self.representatives.tolist()):
+            members[representative].append(position)
+        self.cluster_positions = np.asarray(sorted(members), dtype=np.int64)
+        self.members = {representative: np.asarray(positions) for representative, positions in members.items()}
+        self.index: KmerIndex | None = None
+        if top_n > 0:
+            self.index = KmerIndex(
+                [self.records[position] for position in self.cluster_positions.tolist()], k=k, top_n=top_n
+            )
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        reference_df: pd.DataFrame,
+        label_column: str,
+        *,
+        identity: float = DEFAULT_CLUSTER_IDENTITY,
+        **kwargs,
+    ) -> "ReferenceClusters":
+        """Cluster a reference DataFrame, reusing clusters precompiled into its bundle when they match."""
+
+        records = reference_records(reference_df, label_column)
+        precomputed = reference_df.attrs.get("clusters") or {}
+        if (
+            "representatives" not in kwargs
+            and precomputed.get("identity") == identity
+            and len(precomputed.get("representatives", ())) == len(records)
+        ):
+            kwargs["representatives"] = precomputed["representatives"]
+        return cls(records, identity=identity, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self.cluster_positions)
+
+    def _candidate_representatives(self, sequence: str, kmers: set[str] | None) -> list[int]:
+        if self.index is None:
+            return self.cluster_positions.tolist()
+        return self.cluster_positions[self.index.shortlist_positions(sequence, kmers=kmers)].tolist()
+
+    def best_match_index(
+        self,
+        sequence: str,
+        *,
+        engine: AlignerEngine | None = None,
+        stats: MatchStats | None = None,
+        kmers: set[str] | None = None,
+    ) -> tuple[int, AlignmentResult]:
+        """Return the catalog position of the best reference (``-1`` if none) and its metrics.
+
+        ``kmers`` takes the query's precomputed k-mer set for the representative index.
+        """
+
+        engine = engine or get_engine()
+        sequence = sequence.upper()
+        margin = 100.0 - self.identity
+        aligned = 0
+        skipped = MatchStats()
+        best_position = -1
+        best = AlignmentResult(score=0.0, identity=0.0, coverage=0.0, alignment_length=0)
+
+        def consider(position: int, result: AlignmentResult) -> None:
+            nonlocal best_position, best
+            if is_better_match(result, best) or (
+                best_position > position and result.identity == best.identity and result.score == best.score
+            ):
+                best_position, best = position, result
+
+        composition = base_composition(sequence)
+        candidates = self._candidate_representatives(sequence, kmers)
+        bounds = dict(zip(candidates, self.compositions.bounds(composition, candidates)))
+        scored: list[tuple[float, int]] = []
+        for representative in sorted(candidates, key=lambda rep: -bounds[rep]):
+            if bounds[representative] + margin < best.identity:
+                break
+            result = align_within_cap(engine, sequence, self.records[representative][1], skipped)
+            if result is None:
+                continue
+            aligned += 1
+            consider(representative, result)
+            scored.append((result.identity, representative))
+
+        for rep_identity, representative in sorted(scored, key=lambda item: (-item[0], item[1])):
+            if rep_identity + margin < best.identity:
+                break
+            members = self.members[representative]
+            for position, bound in zip(members.tolist(), self.compositions.bounds(composition, members)):
+                if position == representative or bound < best.identity:
+                    continue
+                result = align_within_cap(engine, sequence, self.records[position][1], skipped)
+                if result is None:
+                    continue
+                aligned += 1
+                consider(position, result)
+
+        if stats is not None:
+            stats.aligned += aligned
+            stats.oversized += skipped.oversized
+            stats.pruned += len(self.records) - aligned - skipped.oversized
+        return best_position, best
+
+    def best_match(
+        self,
+        sequence: str,
+        *,
+        engine: AlignerEngine | None = None,
+        stats: MatchStats | None = None,
+        kmers: set[str] | None = None,
+    ) -> tuple[str, AlignmentResult]:
+        position, metrics = self.best_match_index(sequence, engine=engine, stats=stats, kmers=kmers)
+        return (self.records[position][0] if position >= 0 else ""), metrics
@@ -4,31 +4,67 @@ from __future__ import annotations
 
 import random
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Mapping, Sequence
 
 import pandas as pd
 
-from backend.classify_pathogen import classify_dataframe
-from backend.sequence_handler import compute_gc_content
+from backend.alignment import AlignerEngine, MatchStats
+from backend.classify_pathogen import classify_batch
+from backend.kmer_index import KmerIndex
+from backend.parallel import CatalogMatcher
+from backend.reference_clusters import ReferenceClusters
+from backend.report_writer import DEFAULT_CHUNK_ROWS, iter_chunks, open_writer
+from backend.sequence_batch import SequenceBatch, ensure_batch
 
 RISK_LEVELS: tuple[str, ...] = ("Low", "Medium", "High")
 
-
-def _ensure_dataframe(records: Iterable[dict[str, object]]) -> pd.DataFrame:
-    """Create a DataFrame from record dicts and normalise column order."""
-
-    df = pd.DataFrame(records)
-    if "gc_content" not in df.columns and "sequence" in df.columns:
-        df["gc_content"] = df["sequence"].map(lambda seq: compute_gc_content(str(seq)))
-    return df
+# Report columns, in output order.
+REPORT_COLUMNS: tuple[str, ...] = (
+    "id",
+    "sample_id",
+    "notes",
+    "sequence",
+    "length",
+    "ambiguous",
+    "iupac_ambiguous",
+    "longest_homopolymer",
+    "homopolymer_runs",
+    "low_complexity_windows",
+    "mean_quality",
+    "q30_fraction",
+    "qc_flags",
+    "gc_content",
+    "predicted_species",
+    "species_identity",
+    "species_coverage",
+    "species_score",
+    "species_method",
+    "amr_gene",
+    "amr_identity",
+    "amr_coverage",
+    "amr_score",
+    "amr_start",
+    "amr_end",
+    "amr_strand",
+    "amr_hit_count",
+    "amr_hits",
+    "similarity",
+    "resistance_risk",
+)
+
+
+def resistance_risk_labels(count: int, seed: int | None = None, *, rng: random.Random | None = None) -> list[str]:
+    """Return ``count`` seeded random resistance risk labels, drawing from ``rng`` when given."""
+
+    rng = rng or random.Random(seed)
+    return [rng.choice(RISK_LEVELS) for _ in range(count)]
 
 
 def attach_resistance_risk(df: pd.DataFrame, seed: int | None = None) -> pd.DataFrame:
     """Append a random resistance risk label to each row."""
 
-    rng = random.Random(seed)
     enriched = df.copy()
-    enriched["resistance_risk"] = [rng.choice(RISK_LEVELS) for _ in enriched.index]
+    enriched["resistance_risk"] = resistance_risk_labels(len(enriched.index), seed)
     return enriched
 
 
@@ -41,58 +77,82 @@ def merge_amr_results(
     return df.merge(amr_df, on="id", how="left")
 
 
+def amr_columns(
+    ids: Sequence[object], amr_records: Iterable[dict[str, object]] | Mapping[str, Sequence[object]]
+) -> dict[str, Sequence[object]]:
+    """Return AMR result columns aligned with ``ids``.
+
+    Results in the same order as ``ids`` (as produced by ``detect_amr_genes``)
+    are taken positionally; otherwise they are matched by id like
+    :func:`merge_amr_results`, with missing ids left empty. Results already
+    in columns (as produced by the fused scan) are used as they are.
+    """
+
+    if isinstance(amr_records, Mapping):
+        return {name: values for name, values in amr_records.items() if name != "id"}
+    amr_records = list(amr_records)
+    names = [name for name in (amr_records[0] if amr_records else {}) if name != "id"]
+    if len(amr_records) != len(ids) or any(record["id"] != id_ for record, id_ in zip(amr_records, ids)):
+        by_id: dict[object, dict[str, object]] = {}
+        for record in amr_records:
+            by_id.setdefault(record["id"], record)
+        amr_records = [by_id.get(id_, {}) for id_ in ids]
+    return {name: [record.get(name) for record in amr_records] for name in names}
+
+
 def build_report(
-    sequence_records: Iterable[dict[str, object]],
+    sequence_records: SequenceBatch | Iterable[dict[str, object]],
     *,
-    amr_results: Iterable[dict[str, object]],
+    amr_results: Iterable[dict[str, object]] | Mapping[str, Sequence[object]],
     seed: int | None = None,
     pathogen_reference: pd.DataFrame | None = None,
+    pathogen_index: KmerIndex | None = None,
+    engine: AlignerEngine | None = None,
+    pathogen_matcher: CatalogMatcher | None = None,
+    pathogen_stats: MatchStats | None = None,
+    pathogen_clusters: ReferenceClusters | None = None,
+    species_columns: dict[str, list[object]] | None = None,
     submission_metadata: dict[str, object] | None = None,
+    risk_rng: random.Random | None = None,
 ) -> pd.DataFrame:
-    """Return a consolidated DataFrame representing the pipeline output."""
-
-    base_df = _ensure_dataframe(sequence_records)
-    classified_df = classify_dataframe(base_df, reference_df=pathogen_reference)
-    with_amr = merge_amr_results(classified_df, amr_results)
-    final_df = attach_resistance_risk(with_amr, seed=seed)
+    """Return a consolidated DataFrame representing the pipeline output.
+
+    Columns are gathered from the sequence batch, the classifier and the AMR
+    results and the DataFrame is built once from them, taking the numeric
+    batch columns without copying them. ``species_columns``
+    takes classification columns already computed (e.g. by the fused scan)
+    instead of classifying the batch here. Batches of one report share a
+    ``risk_rng`` so their risk labels match a single build over every record.
+    """
+
+    batch = ensure_batch(sequence_records)
+    columns = batch.to_columns()
+    if species_columns is None:
+        species_columns = classify_batch(
+            batch,
+            reference_df=pathogen_reference,
+            index=pathogen_index,
+            engine=engine,
+            matcher=pathogen_matcher,
+            stats=pathogen_stats,
+            clusters=pathogen_clusters,
+        )
+    columns.update(species_columns)
+    columns.update(amr_columns(batch.ids, amr_results))
+    columns["resistance_risk"] = resistance_risk_labels(len(batch), seed, rng=risk_rng)
 
     # Attach submission-level metadata as repeated columns for downstream artefacts.
     metadata = submission_metadata or {}
-    sample_id = str(metadata.get("sample_id") or "")
-    notes = str(metadata.get("notes") or "")
-    final_df = final_df.copy()
-    final_df["sample_id"] = sample_id
-    final_df["notes"] = notes
-
-    # Reorder columns for readability
-    columns = [
-        "id",
-        "sample_id",
-        "notes",
-        "sequence",
-        "length",
-        "ambiguous",
-        "qc_flags",
-        "gc_content",
-        "predicted_species",
-        "species_identity",
-        "species_coverage",
-        "species_score",
-        "amr_gene",
-        "amr_identity",
-        "amr_coverage",
-        "amr_score",
-        "similarity",
-        "resistance_risk",
-    ]
-    existing_columns = [col for col in columns if col in final_df.columns]
-    return final_df[existing_columns]
-
-
-def save_report(df: pd.DataFrame, output_csv: str | Path) -> Path:
-    """Persist the report dataframe to disk."""
-
-    output_path = Path(output_csv)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_path, index=False)
-    return output_path
+    columns["sample_id"] = [str(metadata.get("sample_id") or "")] * len(batch)
+    columns["notes"] = [str(metadata.get("notes") or "")] * len(batch)
+
+    return pd.DataFrame({name: columns[name] for name in REPORT_COLUMNS if name in columns}, copy=False)
+
+
+def save_report(df: pd.DataFrame, output_path: str | Path, *, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Path:
+    """Persist the report dataframe to disk in chunks, in the format matching the file suffix."""
+
+    with open_writer(output_path) as writer:
+        for chunk in iter_chunks(df, chunk_rows):
+            writer.write(chunk)
+    return writer.path
@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import csv
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Mapping, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
@@ -14,6 +16,84 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
 PIPELINE_VERSION = "0.4.0"
+# Sequence rows per PDF table; each table fits on one letter page.
+PDF_ROWS_PER_TABLE = 40
+PDF_SUMMARY_ROWS = 20
+
+
+IDENTITY_BIN_WIDTH = 10
+IDENTITY_BINS = tuple(f"{low}-{low + IDENTITY_BIN_WIDTH}" for low in range(0, 100, IDENTITY_BIN_WIDTH))
+SUMMARY_CSV_COLUMNS = ("category", "name", "count", "sample_id", "notes")
+NO_AMR_HIT = "N/A"
+
+
+class SummaryAccumulator:
+    """Mergeable per-job counts, updated one chunk of report columns at a time.
+
+    Tracks sequence, species, AMR gene and QC flag counts plus histograms of
+    species and AMR identity in 10-point bins (100% falls in the last bin);
+    records without an AMR hit are left out of the AMR identity histogram.
+    Accumulators for disjoint chunks, e.g. from parallel workers, combine with
+    :meth:`merge`; the summary never needs the whole report at once.
+    """
+
+    def __init__(self) -> None:
+        self.sequence_count = 0
+        self.species: Counter[str] = Counter()
+        self.amr_genes: Counter[str] = Counter()
+        self.qc_flags: Counter[str] = Counter()
+        self.identity_histograms: dict[str, np.ndarray] = {
+            column: np.zeros(len(IDENTITY_BINS), dtype=np.int64) for column in ("species_identity", "amr_identity")
+        }
+
+    def update(self, columns: Mapping[str, Sequence[object]] | pd.DataFrame) -> "SummaryAccumulator":
+        """Add a chunk of report columns (a DataFrame or a mapping of column sequences)."""
+
+        count = len(columns["id"]) if "id" in columns else len(columns)
+        self.sequence_count += count
+        if "predicted_species" in columns:
+            self.species.update(columns["predicted_species"])
+        if "amr_gene" in columns:
+            self.amr_genes.update(columns["amr_gene"])
+        if "qc_flags" in columns:
+            for flags in columns["qc_flags"]:
+                if isinstance(flags, (list, tuple)):
+                    self.qc_flags.update(flags)
+        for column, histogram in self.identity_histograms.items():
+            if column in columns:
+                values = np.asarray(columns[column], dtype=float)
+                if column == "amr_identity" and "amr_gene" in columns:
+                    # Records without an AMR hit carry identity 0.0; they are not a low-identity hit.
+                    values = values[np.asarray(columns["amr_gene"], dtype=object) != NO_AMR_HIT]
+                bins = np.clip(values[~np.isnan(values)] // IDENTITY_BIN_WIDTH, 0, len(IDENTITY_BINS) - 1)
+                histogram += np.bincount(bins.astype(np.int64), minlength=len(IDENTITY_BINS))
+        return self
+
+    def merge(self, other: "SummaryAccumulator") -> "SummaryAccumulator":
+        self.sequence_count += other.sequence_count
+        self.species.update(other.species)
+        self.amr_genes.update(other.amr_genes)
+        self.qc_flags.update(other.qc_flags)
+        for column, histogram in self.identity_histograms.items():
+            histogram += other.identity_histograms[column]
+        return self
+
+    def summary(self, *, submission_metadata: Optional[dict[str, object]] = None) -> dict[str, object]:
+        """Return the summary dict used by the summary CSV and the PDF (JSON-serialisable)."""
+
+        submission_metadata = submission_metadata or {}
+        return {
+            "sequence_count": self.sequence_count,
+            "species_counts": self.species.most_common(),
+            "amr_counts": self.amr_genes.most_common(),
+            "qc_flag_counts": self.qc_flags.most_common(),
+            "identity_histograms": {
+                column: dict(zip(IDENTITY_BINS, histogram.tolist()))
+                for column, histogram in self.identity_histograms.items()
+            },
+            "sample_id": submission_metadata.get("sample_id") or "",
+            "notes": submission_metadata.get("notes") or "",
+        }
 
 
 def build_summary(
@@ -21,36 +101,25 @@ def build_summary(
     *,
     submission_metadata: Optional[dict[str, object]] = None,
 ) -> dict[str, object]:
-    species_counts = Counter(report_df.get("predicted_species", [])).most_common()
-    amr_counts = Counter(report_df.get("amr_gene", [])).most_common()
-    summary: dict[str, object] = {
-        "sequence_count": int(len(report_df)),
-        "species_counts": species_counts,
-        "amr_counts": amr_counts,
-    }
-    submission_metadata = submission_metadata or {}
-    summary["sample_id"] = submission_metadata.get("sample_id") or ""
-    summary["notes"] = submission_metadata.get("notes") or ""
-    return summary
+    return SummaryAccumulator().update(report_df).summary(submission_metadata=submission_metadata)
 
 
 def save_summary_csv(summary: dict[str, object], output_path: Path) -> Path:
-    rows = []
     sample_id = summary.get("sample_id") or ""
     notes = summary.get("notes") or ""
-    for label, counts in ("species", summary.get("species_counts", [])), ("amr_gene", summary.get("amr_counts", [])):
-        for name, count in counts:
-            rows.append(
-                {
-                    "category": label,
-                    "name": name,
-                    "count": count,
-                    "sample_id": sample_id,
-                    "notes": notes,
-                }
-            )
-    df = pd.DataFrame(rows, columns=["category", "name", "count", "sample_id", "notes"])
-    df.to_csv(output_path, index=False)
+    histograms: dict[str, dict[str, int]] = summary.get("identity_histograms") or {}  # type: ignore[assignment]
+    sections: list[tuple[str, Iterable[tuple[str, int]]]] = [
+        ("species", summary.get("species_counts", [])),  # type: ignore[list-item]
+        ("amr_gene", summary.get("amr_counts", [])),  # type: ignore[list-item]
+        ("qc_flag", summary.get("qc_flag_counts", [])),  # type: ignore[list-item]
+        *((column, bins.items()) for column, bins in histograms.items()),
+    ]
+    with open(output_path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle, lineterminator="\n")
+        writer.writerow(SUMMARY_CSV_COLUMNS)
+        for label, counts in sections:
+            for name, count in counts:
+                writer.writerow([label, name, count, sample_id, notes])
     return output_path
 
 
@@ -59,7 +128,17 @@ def build_pdf_report(
     summary: dict[str, object],
     reference_metadata: dict[str, object],
     output_path: Path,
+    *,
+    max_rows: int = 0,
+    rows_per_table: int = PDF_ROWS_PER_TABLE,
 ) -> Path:
+    """Render the PDF report.
+
+    Sequence rows are laid out as one page-sized table per ``rows_per_table``
+    rows, so large reports never build one huge table. With ``max_rows``, only
+    that many rows are listed and the summary counts stand in for the rest.
+    """
+
     doc = SimpleDocTemplate(str(output_path), pagesize=letter)
     styles = getSampleStyleSheet()
     elements: list = []
@@ -100,43 +179,89 @@ def build_pdf_report(
 
     if report_df.empty:
         elements.append(Paragraph("No sequences were processed.", styles["Normal"]))
-    else:
-        table_data = [[
-            "Sequence ID",
-            "Predicted Species",
-            "Species Identity %",
-            "AMR Gene",
-            "AMR Identity %",
-            "Resistance Risk",
-        ]]
-        for row in report_df.itertuples():
-            table_data.append(
-                [
-                    row.id,
-                    str(row.predicted_species).replace("_", " "),
-                    f"{getattr(row, 'species_identity', 0):.2f}",
-                    row.amr_gene,
-                    f"{getattr(row, 'amr_identity', 0):.2f}",
-                    row.resistance_risk,
-                ]
-            )
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-                    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("ALIGN", (2, 1), (4, -1), "RIGHT"),
-                ]
+        doc.build(elements)
+        return output_path
+
+    for heading, counts in (
+        ("Predicted species", summary.get("species_counts", [])),
+        ("AMR genes", summary.get("amr_counts", [])),
+        ("QC flags", summary.get("qc_flag_counts", [])),
+    ):
+        counts = list(counts)  # type: ignore[call-overload]
+        if counts:
+            count_rows: list[list[object]] = [[heading, "Sequences"]]
+            count_rows += [[str(name), str(count)] for name, count in counts[:PDF_SUMMARY_ROWS]]
+            if len(counts) > PDF_SUMMARY_ROWS:
+                count_rows.append([f"... {len(counts) - PDF_SUMMARY_ROWS} more", ""])
+            elements.append(_styled_table(count_rows, numeric_columns=(1, 1)))
+            elements.append(Spacer(1, 12))
+
+    histograms: dict[str, dict[str, int]] = summary.get("identity_histograms") or {}  # type: ignore[assignment]
+    if any(sum(bins.values()) for bins in histograms.values()):
+        columns = list(histograms)
+        histogram_rows: list[list[object]] = [["Identity %", *(column.replace("_", " ").title() for column in columns)]]
+        histogram_rows += [
+            [label, *(str(histograms[column].get(label, 0)) for column in columns)] for label in IDENTITY_BINS
+        ]
+        elements.append(_styled_table(histogram_rows, numeric_columns=(1, len(columns))))
+        elements.append(Spacer(1, 12))
+
+    listed = report_df if max_rows <= 0 else report_df.head(max_rows)
+    if len(listed) < len(report_df):
+        elements.append(
+            Paragraph(
+                f"Showing the first {len(listed)} of {len(report_df)} sequences; "
+                "the CSV report lists every sequence.",
+                styles["Italic"],
             )
         )
-        elements.append(table)
+        elements.append(Spacer(1, 6))
+
+    header = [
+        "Sequence ID",
+        "Predicted Species",
+        "Species Identity %",
+        "AMR Gene",
+        "AMR Identity %",
+        "Resistance Risk",
+    ]
+    rows: list[list[object]] = []
+    for row in listed.itertuples():
+        rows.append(
+            [
+                row.id,
+                str(row.predicted_species).replace("_", " "),
+                f"{getattr(row, 'species_identity', 0):.2f}",
+                row.amr_gene,
+                f"{getattr(row, 'amr_identity', 0):.2f}",
+                row.resistance_risk,
+            ]
+        )
+        if len(rows) == rows_per_table:
+            elements.append(_styled_table([header, *rows], numeric_columns=(2, 4)))
+            rows = []
+    if rows:
+        elements.append(_styled_table([header, *rows], numeric_columns=(2, 4)))
 
     doc.build(elements)
     return output_path
 
 
+def _styled_table(data: list[list[object]], *, numeric_columns: tuple[int, int]) -> Table:
+    table = Table(data, repeatRows=1)
+    table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("ALIGN", (numeric_columns[0], 1), (numeric_columns[1], -1), "RIGHT"),
+            ]
+        )
+    )
+    return table
+
+
 def build_reference_metadata() -> dict[str, object]:
     return {
         "pipeline_version": PIPELINE_VERSION,
@@ -0,0 +1,282 @@
+"""Report writers for CSV, Parquet and Arrow IPC, and the latest-report pointer.
+
+Writers take the report in chunks of rows, so a report can be written while
+it is still being produced and a large one is never formatted in one piece.
+Parquet and Arrow IPC need ``pyarrow``, which is only imported when one of
+them is requested.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Mapping, Optional, Sequence
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 10_000
+DEFAULT_COMPRESSION = "zstd"
+REPORT_FORMATS: dict[str, str] = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+MEDIA_TYPES: dict[str, str] = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+LATEST_POINTER = "latest_report.json"
+
+# Arrow types of the report columns, so every chunk of a report shares one
+# schema whatever values its first chunk happens to hold.
+REPORT_COLUMN_TYPES: dict[str, str] = {
+    "id": "string",
+    "sample_id": "string",
+    "notes": "string",
+    "sequence": "string",
+    "length": "int64",
+    "ambiguous": "int64",
+    "iupac_ambiguous": "int64",
+    "longest_homopolymer": "int64",
+    "homopolymer_runs": "int64",
+    "low_complexity_windows": "int64",
+    "mean_quality": "float64",
+    "q30_fraction": "float64",
+    "qc_flags": "list<string>",
+    "gc_content": "float64",
+    "predicted_species": "string",
+    "species_identity": "float64",
+    "species_coverage": "float64",
+    "species_score": "float64",
+    "species_method": "string",
+    "amr_gene": "string",
+    "amr_identity": "float64",
+    "amr_coverage": "float64",
+    "amr_score": "float64",
+    "amr_start": "float64",
+    "amr_end": "float64",
+    "amr_strand": "string",
+    "amr_hit_count": "int64",
+    "amr_hits": "string",
+    "similarity": "float64",
+    "resistance_risk": "string",
+}
+
+
+class ReportWriter:
+    """Append report chunks to one output file; use as a context manager or call :meth:`close`."""
+
+    format = ""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        self._write(chunk)
+        self.rows += len(chunk)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Make the rows written so far readable by other processes, where the format allows it."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CsvReportWriter(ReportWriter):
+    """CSV with the header written before the first chunk; identical to one ``to_csv`` call."""
+
+    format = "csv"
+
+    def __init__(self, path: str | Path) -> None:
+        super().__init__(path)
+        self._handle = open(self.path, "w", newline="", encoding="utf-8")
+        self._columns: Optional[list[str]] = None
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._columns = list(chunk.columns)
+            chunk.to_csv(self._handle, index=False)
+        else:
+            chunk.to_csv(self._handle, index=False, header=False, columns=self._columns)
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+class _ArrowReportWriter(ReportWriter):
+    """Shared schema handling for the pyarrow-backed writers.
+
+    The first chunk fixes the columns. Report columns take their type from
+    :data:`REPORT_COLUMN_TYPES`; other columns are inferred from the first
+    chunk, with entirely empty ones typed as float64 and empty lists as
+    lists of strings.
+    """
+
+    def __init__(self, path: str | Path, *, compression: str = DEFAULT_COMPRESSION) -> None:
+        super().__init__(path)
+        try:
+            import pyarrow
+        except ImportError as exc:
+            raise RuntimeError(f"The {self.format} report format requires pyarrow (pip install pyarrow).") from exc
+        self._pa = pyarrow
+        self.compression = compression
+        self._schema = None
+        self._writer = None
+
+    def _column_type(self, name: str, inferred):
+        pa = self._pa
+        declared = REPORT_COLUMN_TYPES.get(name)
+        if declared is not None:
+            return {
+                "string": pa.string(),
+                "int64": pa.int64(),
+                "float64": pa.float64(),
+                "list<string>": pa.list_(pa.string()),
+            }[declared]
+        if pa.types.is_null(inferred):
+            return pa.float64()
+        if pa.types.is_list(inferred) and pa.types.is_null(inferred.value_type):
+            return pa.list_(pa.string())
+        return inferred
+
+    def _table(self, chunk: pd.DataFrame):
+        if self._schema is None:
+            schema = self._pa.Schema.from_pandas(chunk, preserve_index=False)
+            for position, field in enumerate(schema):
+                schema = schema.set(position, field.with_type(self._column_type(field.name, field.type)))
+            self._schema = schema
+            self._writer = self._open(schema)
+        return self._pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+
+    def _open(self, schema):
+        raise NotImplementedError
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        table = self._table(chunk)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ParquetReportWriter(_ArrowReportWriter):
+    """Compressed Parquet, one row group per chunk."""
+
+    format = "parquet"
+
+    def _open(self, schema):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(str(self.path), schema, compression=self.compression)
+
+
+class ArrowReportWriter(_ArrowReportWriter):
+    """Arrow IPC file format with compressed record batches."""
+
+    format = "arrow"
+
+    def _open(self, schema):
+        options = self._pa.ipc.IpcWriteOptions(compression=self.compression)
+        return self._pa.ipc.new_file(str(self.path), schema, options=options)
+
+
+_WRITERS: dict[str, type[ReportWriter]] = {
+    "csv": CsvReportWriter,
+    "parquet": ParquetReportWriter,
+    "arrow": ArrowReportWriter,
+}
+
+
+def report_formats_from_env() -> list[str]:
+    """Formats listed in ``VETPATHOGEN_REPORT_FORMATS`` (comma-separated); CSV is always written."""
+
+    requested = os.getenv("VETPATHOGEN_REPORT_FORMATS", "csv")
+    formats = ["csv"]
+    for name in requested.split(","):
+        name = name.strip().lower()
+        if not name or name in formats:
+            continue
+        if name not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format {name!r}; expected one of {sorted(REPORT_FORMATS)}.")
+        formats.append(name)
+    return formats
+
+
+def report_path(output_dir: Path, job_id: str, fmt: str = "csv") -> Path:
+    return output_dir / f"report_{job_id}{REPORT_FORMATS[fmt]}"
+
+
+def open_writer(path: str | Path, fmt: Optional[str] = None) -> ReportWriter:
+    """Open a writer for ``fmt``, or for the format matching the suffix of ``path``."""
+
+    if fmt is None:
+        suffixes = {suffix: name for name, suffix in REPORT_FORMATS.items()}
+        fmt = suffixes.get(Path(path).suffix, "csv")
+    return _WRITERS[fmt](path)
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    for start in range(0, max(len(df), 1), max(1, chunk_rows)):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def write_report(
+    chunks: Iterable[pd.DataFrame],
+    output_dir: Path,
+    job_id: str,
+    formats: Sequence[str] = ("csv",),
+) -> dict[str, Path]:
+    """Stream report ``chunks`` into one file per format and return the paths by format.
+
+    Each chunk is flushed once written, so the CSV can be read while later
+    chunks are still being produced. Parquet and Arrow files are only
+    readable once closed.
+    """
+
+    writers = [open_writer(report_path(output_dir, job_id, fmt), fmt) for fmt in formats]
+    try:
+        for chunk in chunks:
+            for writer in writers:
+                writer.write(chunk)
+                writer.flush()
+    finally:
+        for writer in writers:
+            writer.close()
+    return {writer.format: writer.path for writer in writers}
+
+
+def update_latest_report(output_dir: Path, job_id: str, paths: Mapping[str, Path]) -> Path:
+    """Point the latest-report pointer at a job's report files (replaced atomically)."""
+
+    pointer = output_dir / LATEST_POINTER
+    temporary = output_dir / f".{LATEST_POINTER}.{job_id}.tmp"
+    temporary.write_text(
+        json.dumps({"job_id": job_id, "paths": {fmt: path.name for fmt, path in paths.items()}}),
+        encoding="utf-8",
+    )
+    temporary.replace(pointer)
+    return pointer
+
+
+def latest_report_path(output_dir: Path, fmt: str = "csv") -> Optional[Path]:
+    """Resolve the latest report in ``fmt`` through the pointer; None when there is none."""
+
+    pointer = output_dir / LATEST_POINTER
+    if not pointer.exists():
+        return None
+    name = json.loads(pointer.read_text(encoding="utf-8"))["paths"].get(fmt)
+    return output_dir / name if name else None
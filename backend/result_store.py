@@ -0,0 +1,57 @@
+"""Content-addressed keys for job deduplication."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Mapping, Optional
+
+from backend.sequence_batch import SequenceBatch
+
+READ_BLOCK_BYTES = 1024 * 1024
+
+
+def input_digest(
+    sequences: Optional[SequenceBatch], fasta_text: Optional[str], source: Optional[str | Path] = None
+) -> str:
+    """Digest of a job's input: the parsed records when given, else the bytes of a source file, else the raw text."""
+
+    if sequences is not None:
+        return "batch:" + sequences.digest()
+    if source is not None:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(source, "rb") as handle:
+            for block in iter(lambda: handle.read(READ_BLOCK_BYTES), b""):
+                digest.update(block)
+        return "file:" + digest.hexdigest()
+    return "text:" + hashlib.blake2b((fasta_text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def job_key(
+    *,
+    input_digest: str,
+    seed: Optional[int],
+    catalog_fingerprint: str,
+    pipeline_version: str,
+    options: Mapping[str, object],
+) -> str:
+    """Digest of everything a job's results depend on.
+
+    ``options`` holds the remaining inputs that change the artefacts or the
+    response, such as the submission metadata repeated in the report and the
+    report formats. Two jobs with the same key produce the same results.
+    """
+
+    payload = json.dumps(
+        {
+            "input": input_digest,
+            "seed": seed,
+            "catalogs": catalog_fingerprint,
+            "pipeline_version": pipeline_version,
+            "options": options,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
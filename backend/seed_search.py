@@ -0,0 +1,183 @@
+"""Seed-and-extend localisation of reference genes inside long sequences."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.alignment import AlignerEngine, AlignmentResult, align_within_cap, get_engine, is_better_match
+from backend.kmer_index import encode_kmers
+from backend.reference_bundle import reference_records, upper_case_records
+
+DEFAULT_SEED_K = 15
+
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+@dataclass
+class GeneHit:
+    """A gene located inside a query.
+
+    ``start``/``end`` are 1-based and inclusive on the query's forward strand
+    whichever strand the gene lies on; ``strand`` is ``-`` for genes found in
+    the reverse complement.
+    """
+
+    gene: str
+    start: int
+    end: int
+    metrics: AlignmentResult
+    strand: str = "+"
+
+
+class SeedIndex:
+    """Exact k-mer seeds of a gene catalog used to find candidate windows in a query.
+
+    Seed hits are grouped per gene by diagonal (query position minus gene
+    offset). Each group with at least ``min_seeds`` hits whose diagonals stay
+    within the allowed drift becomes one window, and only windows are aligned,
+    so the cost follows the number of hits rather than the query length times
+    the gene length. Windows aligning below ``min_identity`` are dropped as
+    chance seed matches. Both strands of the query are seeded.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[tuple[str, str]],
+        *,
+        k: int = DEFAULT_SEED_K,
+        min_seeds: int = 3,
+        min_identity: float = 80.0,
+        contig_factor: float = 1.5,
+    ) -> None:
+        self.k = k
+        self.min_seeds = min_seeds
+        self.min_identity = min_identity
+        self.genes: Sequence[tuple[str, str]] = upper_case_records(records)
+        self.gene_lengths: list[int] = []
+
+        codes: list[np.ndarray] = []
+        gene_ids: list[np.ndarray] = []
+        offsets: list[np.ndarray] = []
+        for gene_id, (_, sequence) in enumerate(self.genes):
+            self.gene_lengths.append(len(sequence))
+            gene_codes, gene_offsets = encode_kmers(sequence, k)
+            codes.append(gene_codes)
+            offsets.append(gene_offsets)
+            gene_ids.append(np.full(len(gene_codes), gene_id, dtype=np.int64))
+        self.min_query_length = int(contig_factor * max(self.gene_lengths, default=0))
+        all_codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int64)
+        order = np.argsort(all_codes, kind="stable")
+        self._codes = all_codes[order]
+        self._gene_ids = np.concatenate(gene_ids)[order] if gene_ids else np.empty(0, dtype=np.int64)
+        self._offsets = np.concatenate(offsets)[order] if offsets else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_dataframe(cls, reference_df: pd.DataFrame, label_column: str = "gene_name", **kwargs) -> "SeedIndex":
+        return cls(reference_records(reference_df, label_column), **kwargs)
+
+    def applies(self, sequence: str) -> bool:
+        """Return True when ``sequence`` is long enough to be treated as a contig."""
+
+        return self.applies_to_length(len(sequence))
+
+    def applies_to_length(self, length: int) -> bool:
+        return bool(self.genes) and length > self.min_query_length
+
+    def _seed_hits(self, sequence: str) -> tuple[np.ndarray, np.ndarray]:
+        query_codes, query_positions = encode_kmers(sequence, self.k)
+        left = np.searchsorted(self._codes, query_codes, side="left")
+        right = np.searchsorted(self._codes, query_codes, side="right")
+        counts = right - left
+        if not counts.any():
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # Expand every query k-mer into all matching gene seeds.
+        starts = np.repeat(left, counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        seeds = starts + within
+        diagonals = np.repeat(query_positions, counts) - self._offsets[seeds]
+        return self._gene_ids[seeds], diagonals
+
+    def candidate_windows(self, sequence: str) -> list[tuple[int, int, int]]:
+        """Return ``(gene_id, start, end)`` query windows (0-based, end-exclusive)."""
+
+        gene_ids, diagonals = self._seed_hits(sequence)
+        if not len(gene_ids):
+            return []
+        order = np.lexsort((diagonals, gene_ids))
+        gene_ids = gene_ids[order]
+        diagonals = diagonals[order]
+
+        windows: list[tuple[int, int, int]] = []
+        group_start = 0
+        for position in range(1, len(gene_ids) + 1):
+            if position < len(gene_ids) and gene_ids[position] == gene_ids[group_start]:
+                gene_length = self.gene_lengths[int(gene_ids[group_start])]
+                drift = max(16, gene_length // 10)
+                if diagonals[position] - diagonals[position - 1] <= drift:
+                    continue
+            if position - group_start >= self.min_seeds:
+                gene_id = int(gene_ids[group_start])
+                gene_length = self.gene_lengths[gene_id]
+                start = max(0, int(diagonals[group_start]))
+                end = min(len(sequence), int(diagonals[position - 1]) + gene_length)
+                windows.append((gene_id, start, end))
+            group_start = position
+        return windows
+
+    def locate(self, sequence: str, *, engine: AlignerEngine | None = None) -> list[GeneHit]:
+        """Align each candidate window of either strand against its gene and return the hits in query order."""
+
+        engine = engine or get_engine()
+        sequence = sequence.upper()
+        hits: list[GeneHit] = []
+        for strand, strand_sequence in (("+", sequence), ("-", sequence.translate(_COMPLEMENT)[::-1])):
+            for gene_id, start, end in self.candidate_windows(strand_sequence):
+                gene, gene_sequence = self.genes[gene_id]
+                metrics = align_within_cap(engine, strand_sequence[start:end], gene_sequence)
+                if metrics is None or metrics.identity < self.min_identity:
+                    continue
+                metrics = replace(metrics, coverage=round(min(100.0, (end - start) / len(gene_sequence) * 100), 2))
+                if strand == "-":
+                    # Map the reverse-complement window back to forward-strand coordinates.
+                    start, end = len(sequence) - end, len(sequence) - start
+                hits.append(GeneHit(gene=gene, start=start + 1, end=end, metrics=metrics, strand=strand))
+        hits.sort(key=lambda hit: (hit.start, hit.end, hit.gene, hit.strand))
+        return hits
+
+
+def best_hit(hits: Iterable[GeneHit]) -> GeneHit | None:
+    """Pick the hit ``best_match`` would prefer: highest identity, then score, then first seen."""
+
+    best: GeneHit | None = None
+    for hit in hits:
+        if best is None or is_better_match(hit.metrics, best.metrics):
+            best = hit
+    return best
+
+
+def distinct_hits(hits: Iterable[GeneHit], *, max_overlap: float = 0.5) -> list[GeneHit]:
+    """Drop hits that mostly overlap a better one and return the rest in query order.
+
+    Hits are taken in :func:`best_hit` preference order, and a hit is kept
+    unless more than ``max_overlap`` of the shorter of it and a kept hit is
+    shared, so closely related alleles matching the same locus collapse to the
+    best of them while separate genes on one contig are all reported.
+    """
+
+    ranked = sorted(hits, key=lambda hit: (-hit.metrics.identity, -hit.metrics.score))
+    kept: list[GeneHit] = []
+    for hit in ranked:
+        length = hit.end - hit.start + 1
+        if all(
+            min(hit.end, other.end) - max(hit.start, other.start) + 1
+            <= max_overlap * min(length, other.end - other.start + 1)
+            for other in kept
+        ):
+            kept.append(hit)
+    kept.sort(key=lambda hit: (hit.start, hit.end, hit.gene))
+    return kept
@@ -0,0 +1,268 @@
+"""Columnar batch of sequences: one byte buffer of bases with offsets and QC columns."""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Sequence, TextIO
+
+import numpy as np
+import pandas as pd
+
+from backend.sequence_handler import (
+    DEFAULT_MAX_AMBIGUOUS,
+    DEFAULT_MIN_LENGTH,
+    gc_percent,
+    iter_fasta_records,
+    iter_sequence_records,
+    qc_flag_list,
+    qc_metrics_buffer,
+    quality_metrics_buffer,
+    quality_summary,
+)
+
+# QC metric columns exposed per record, in report order.
+RECORD_METRIC_COLUMNS = (
+    "length",
+    "ambiguous",
+    "iupac_ambiguous",
+    "longest_homopolymer",
+    "homopolymer_runs",
+    "low_complexity_windows",
+)
+
+
+@dataclass
+class SequenceBatch:
+    """Sequences stored back to back in one ``uint8`` buffer with an offsets array.
+
+    Record ``i`` spans ``bases[offsets[i]:offsets[i + 1]]``. ``ids`` and the QC
+    ``metrics`` are arrays aligned with the records. FASTQ batches also hold
+    their Phred+33 ``qualities`` in a buffer laid out like ``bases``. Stages read sequences
+    through :meth:`sequence`, which decodes one record at a time, and
+    :meth:`slice` returns views of the same buffer, so a batch moves through
+    the pipeline without copying its bases. Python objects per record are only
+    created by :meth:`to_columns`/:meth:`to_dataframe` at the reporting edge.
+    """
+
+    ids: np.ndarray
+    bases: np.ndarray
+    offsets: np.ndarray
+    metrics: dict[str, np.ndarray] = field(default_factory=dict)
+    qualities: np.ndarray | None = None
+
+    def __post_init__(self) -> None:
+        if len(self.offsets) != len(self.ids) + 1:
+            raise ValueError("offsets must have one more entry than ids.")
+        if not self.metrics:
+            self.metrics = qc_metrics_buffer(self.bases, self.offsets)
+            if self.qualities is not None:
+                self.metrics.update(quality_metrics_buffer(self.qualities, self.offsets))
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[object, str]]) -> "SequenceBatch":
+        """Build a batch from ``(id, sequence)`` pairs, encoding one sequence at a time."""
+
+        return cls.from_triples((record_id, sequence, None) for record_id, sequence in pairs)
+
+    @classmethod
+    def from_triples(cls, records: Iterable[tuple[object, str, str | None]]) -> "SequenceBatch":
+        """Build a batch from ``(id, sequence, quality)`` records; qualities are kept when present."""
+
+        ids: list[object] = []
+        buffer = bytearray()
+        quality_buffer = bytearray()
+        has_quality = False
+        offsets = [0]
+        for record_id, sequence, quality in records:
+            ids.append(record_id)
+            buffer += sequence.encode("ascii", "replace")
+            offsets.append(len(buffer))
+            if quality is not None:
+                quality_buffer += quality.encode("ascii", "replace")
+                has_quality = True
+        if has_quality and len(quality_buffer) != len(buffer):
+            raise ValueError("Either every record or none must carry qualities.")
+        return cls(
+            ids=_object_array(ids),
+            bases=np.frombuffer(buffer, dtype=np.uint8),
+            offsets=np.asarray(offsets, dtype=np.int64),
+            qualities=np.frombuffer(quality_buffer, dtype=np.uint8) if has_quality else None,
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, object]]) -> "SequenceBatch":
+        """Build a batch from record dicts with ``id`` and ``sequence`` keys."""
+
+        return cls.from_pairs((record["id"], str(record["sequence"]).upper()) for record in records)
+
+    @classmethod
+    def from_fasta(cls, source: str | Path | TextIO) -> "SequenceBatch":
+        """Stream FASTA records straight into a batch."""
+
+        return cls.from_pairs(iter_fasta_records(source))
+
+    @classmethod
+    def from_source(cls, source: str | Path | TextIO | BinaryIO) -> "SequenceBatch":
+        """Stream FASTA or FASTQ records, plain or gzip-compressed, straight into a batch."""
+
+        return cls.from_triples(iter_sequence_records(source))
+
+    @classmethod
+    def iter_source(cls, source: str | Path | TextIO | BinaryIO, batch_size: int) -> Iterator["SequenceBatch"]:
+        """Stream FASTA or FASTQ records as consecutive batches of at most ``batch_size`` records."""
+
+        records = iter_sequence_records(source)
+        while True:
+            batch = cls.from_triples(islice(records, max(1, batch_size)))
+            if not len(batch):
+                return
+            yield batch
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def sequence(self, position: int) -> str:
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.bases[start:end].tobytes().decode("ascii")
+
+    def iter_sequences(self) -> Iterator[str]:
+        for position in range(len(self)):
+            yield self.sequence(position)
+
+    def sequence_column(self) -> Sequence[str]:
+        """The sequences as a report column.
+
+        Where pandas keeps strings in Arrow, the column is an Arrow string
+        array over this batch's buffer and offsets, so no Python string is
+        created per record; otherwise it is a list of decoded sequences.
+        """
+
+        dtype = _arrow_string_dtype()
+        if dtype is None or len(self.bases) >= 2**31:
+            return list(self.iter_sequences())
+        import pyarrow
+
+        offsets = np.asarray(self.offsets - self.offsets[0], dtype=np.int32)
+        array = pyarrow.StringArray.from_buffers(
+            len(self), pyarrow.py_buffer(offsets), pyarrow.py_buffer(np.ascontiguousarray(self.bases))
+        )
+        return pd.array(array, dtype=dtype)
+
+    def slice(self, start: int, stop: int) -> "SequenceBatch":
+        """Return records ``start:stop`` as views of this batch's buffer and columns."""
+
+        stop = min(stop, len(self))
+        base = self.offsets[start]
+        return SequenceBatch(
+            ids=self.ids[start:stop],
+            bases=self.bases[base : self.offsets[stop]],
+            offsets=self.offsets[start : stop + 1] - base,
+            metrics={name: values[start:stop] for name, values in self.metrics.items()},
+            qualities=None if self.qualities is None else self.qualities[base : self.offsets[stop]],
+        )
+
+    def digest(self) -> str:
+        """Digest of the records' ids, bases and qualities, independent of how the batch was built."""
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\n".join(str(record_id) for record_id in self.ids).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.offsets - self.offsets[0], dtype=np.int64).tobytes())
+        digest.update(self.bases.tobytes())
+        if self.qualities is not None:
+            digest.update(b"\0quality\0")
+            digest.update(self.qualities.tobytes())
+        return digest.hexdigest()
+
+    def batches(self, batch_size: int) -> Iterator["SequenceBatch"]:
+        """Yield consecutive slices of at most ``batch_size`` records."""
+
+        batch_size = max(1, batch_size)
+        for start in range(0, len(self), batch_size):
+            yield self.slice(start, start + batch_size)
+
+    def gc_content(self) -> list[float]:
+        return [
+            gc_percent(gc_count, length)
+            for gc_count, length in zip(self.metrics["gc_count"].tolist(), self.metrics["length"].tolist())
+        ]
+
+    def qc_flags(
+        self, *, min_length: int = DEFAULT_MIN_LENGTH, max_ambiguous: int = DEFAULT_MAX_AMBIGUOUS
+    ) -> list[list[str]]:
+        return [
+            qc_flag_list(length, ambiguous, min_length=min_length, max_ambiguous=max_ambiguous)
+            for length, ambiguous in zip(self.metrics["length"].tolist(), self.metrics["ambiguous"].tolist())
+        ]
+
+    def to_columns(self, *, include_sequence: bool = True) -> dict[str, Sequence[object]]:
+        """Return report columns (id, sequence, QC and quality metrics, flags, GC%) keyed by name."""
+
+        columns: dict[str, Sequence[object]] = {"id": self.ids}
+        if include_sequence:
+            columns["sequence"] = self.sequence_column()
+        columns["gc_content"] = self.gc_content()
+        for name in RECORD_METRIC_COLUMNS:
+            columns[name] = self.metrics[name]
+        if self.qualities is not None:
+            summaries = [
+                quality_summary(quality_sum, q30_count, length)
+                for quality_sum, q30_count, length in zip(
+                    self.metrics["quality_sum"].tolist(),
+                    self.metrics["q30_count"].tolist(),
+                    self.metrics["length"].tolist(),
+                )
+            ]
+            columns["mean_quality"] = [summary["mean_quality"] for summary in summaries]
+            columns["q30_fraction"] = [summary["q30_fraction"] for summary in summaries]
+        columns["qc_flags"] = self.qc_flags()
+        return columns
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_columns())
+
+    def to_records(self) -> list[dict[str, object]]:
+        return self.to_dataframe().to_dict(orient="records")
+
+
+@lru_cache(maxsize=1)
+def _arrow_string_dtype() -> object:
+    """The dtype pandas gives a column of strings when it is Arrow-backed, else None."""
+
+    dtype = pd.Series(["A"]).dtype
+    return dtype if getattr(dtype, "storage", None) == "pyarrow" else None
+
+
+def _object_array(values: list[object]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def ensure_batch(records: "SequenceBatch | Iterable[dict[str, object]]") -> SequenceBatch:
+    """Return ``records`` as a :class:`SequenceBatch`, converting record dicts if needed."""
+
+    if isinstance(records, SequenceBatch):
+        return records
+    return SequenceBatch.from_records(records)
+
+
+def iter_batches(records: "SequenceBatch | Iterable[dict[str, object]]", batch_size: int) -> Iterator[SequenceBatch]:
+    """Yield ``records`` as batches of at most ``batch_size`` records, converting record dicts lazily."""
+
+    if isinstance(records, SequenceBatch):
+        yield from records.batches(batch_size)
+        return
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, max(1, batch_size)))
+        if not chunk:
+            return
+        yield SequenceBatch.from_records(chunk)
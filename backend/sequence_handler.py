@@ -1,85 +1,523 @@
-"""Utilities for loading FASTA sequences and computing simple metrics."""
+"""Utilities for loading FASTA/FASTQ sequences and computing simple metrics."""
 
 from __future__ import annotations
 
+import gzip
+import io
+import itertools
+import warnings
+from contextlib import contextmanager
 from io import StringIO
 from pathlib import Path
-from typing import Iterable, TextIO
+from typing import BinaryIO, Iterator, Sequence, TextIO
 
-from Bio import SeqIO
+import numpy as np
 
 
-def _open_fasta_source(source: str | Path | TextIO) -> Iterable:
-    """Return an iterable of SeqRecord objects from a path or in-memory handle."""
+class FastaFormatError(ValueError):
+    """Raised when FASTA input is malformed."""
+
+
+class FastqFormatError(FastaFormatError):
+    """Raised when FASTQ input is malformed."""
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+@contextmanager
+def _open_sequence_source(source: str | Path | TextIO | BinaryIO) -> Iterator[TextIO]:
+    """Yield a text handle positioned at the start of a path, text or binary source.
+
+    Gzip (and bgzip, which is multi-member gzip) input is recognised by its
+    magic bytes and inflated in chunks as the handle is read. Handles passed
+    in by the caller are left open.
+    """
 
     if isinstance(source, (str, Path)):
-        return SeqIO.parse(str(source), "fasta")
+        with open(source, "rb") as raw:
+            with _decoded_stream(raw) as handle:
+                yield handle
+        return
     if hasattr(source, "read"):
-        source.seek(0)
-        return SeqIO.parse(source, "fasta")
-    raise TypeError("Unsupported FASTA source type.")
+        if getattr(source, "seekable", lambda: False)():
+            source.seek(0)
+        if isinstance(source.read(0), bytes):
+            with _decoded_stream(source) as handle:  # type: ignore[arg-type]
+                yield handle
+        else:
+            yield source  # type: ignore[misc]
+        return
+    raise TypeError("Unsupported sequence source type.")
 
 
-def compute_gc_content(sequence: str) -> float:
-    """Return GC% for a DNA sequence."""
+@contextmanager
+def _decoded_stream(raw: BinaryIO) -> Iterator[TextIO]:
+    if hasattr(raw, "peek"):
+        magic = raw.peek(len(GZIP_MAGIC))[: len(GZIP_MAGIC)]
+    elif getattr(raw, "seekable", lambda: False)():
+        start = raw.tell()
+        magic = raw.read(len(GZIP_MAGIC))
+        raw.seek(start)
+    else:
+        magic = b""
+    stream: BinaryIO = gzip.GzipFile(fileobj=raw, mode="rb") if magic == GZIP_MAGIC else raw  # type: ignore[assignment]
+    handle = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        yield handle
+    finally:
+        handle.detach()
+        if stream is not raw:
+            stream.close()
+
+
+def _parse_fasta(lines: Iterator[tuple[int, str]]) -> Iterator[tuple[str, str]]:
+    record_id: str | None = None
+    chunks: list[str] = []
+    for line_number, line in lines:
+        if line.startswith(">"):
+            if record_id is not None:
+                yield record_id, "".join(chunks)
+            header = line[1:].strip()
+            record_id = header.split(None, 1)[0] if header else ""
+            chunks = []
+        elif record_id is None:
+            if line.strip():
+                raise FastaFormatError(f"Line {line_number}: expected a '>' header before sequence data.")
+        else:
+            chunks.append("".join(line.split()).upper())
+    if record_id is not None:
+        yield record_id, "".join(chunks)
 
-    seq = sequence.upper()
-    if not seq:
-        return 0.0
-    gc = sum(1 for base in seq if base in {"G", "C"})
-    return round((gc / len(seq)) * 100, 2)
 
+def _parse_fastq(lines: Iterator[tuple[int, str]]) -> Iterator[tuple[str, str, str]]:
+    for line_number, header in lines:
+        if not header.strip():
+            continue
+        if not header.startswith("@"):
+            raise FastqFormatError(f"Line {line_number}: expected an '@' header.")
+        try:
+            (_, sequence_line), (_, separator), (_, quality_line) = next(lines), next(lines), next(lines)
+        except StopIteration:
+            raise FastqFormatError(f"Line {line_number}: truncated FASTQ record.") from None
+        if not separator.startswith("+"):
+            raise FastqFormatError(f"Line {line_number + 2}: expected a '+' separator line.")
+        sequence = "".join(sequence_line.split()).upper()
+        quality = quality_line.strip()
+        if len(quality) != len(sequence):
+            raise FastqFormatError(f"Line {line_number + 3}: quality length does not match the sequence length.")
+        fields = header[1:].split(None, 1)
+        yield (fields[0] if fields else ""), sequence, quality
 
-def qc_check_sequence(sequence: str, *, min_length: int = 50, max_ambiguous: int = 5) -> dict[str, object]:
+
+def iter_fasta_records(source: str | Path | TextIO | BinaryIO) -> Iterator[tuple[str, str]]:
     """
-    Perform basic quality checks on a sequence.
+    Stream ``(id, sequence)`` pairs from FASTA, validating as it reads.
 
-    Returns a dictionary with flags that downstream modules can log or act upon.
+    Lines are consumed one at a time and each record is yielded as soon as
+    the next header is reached, so memory is bounded by the largest record.
+    Sequences are upper-cased with whitespace removed; the id is the first
+    word of the header line.
     """
 
-    seq = sequence.upper()
-    length = len(seq)
-    ambiguous = seq.count("N")
-    flags: list[str] = []
+    with _open_sequence_source(source) as handle:
+        yield from _parse_fasta(enumerate(handle, start=1))
+
+
+def iter_sequence_records(source: str | Path | TextIO | BinaryIO) -> Iterator[tuple[str, str, str | None]]:
+    """Stream ``(id, sequence, quality)`` from FASTA or FASTQ, plain or gzip-compressed.
+
+    The format is chosen from the first non-blank line (``@`` for FASTQ);
+    ``quality`` is the Phred+33 string for FASTQ records and None for FASTA.
+    """
+
+    with _open_sequence_source(source) as handle:
+        lines = enumerate(handle, start=1)
+        for line_number, line in lines:
+            if line.strip():
+                break
+        else:
+            return
+        lines = itertools.chain([(line_number, line)], lines)
+        if line.startswith("@"):
+            yield from _parse_fastq(lines)
+        else:
+            for record_id, sequence in _parse_fasta(lines):
+                yield record_id, sequence, None
+
+
+DEFAULT_MIN_LENGTH = 50
+DEFAULT_MAX_AMBIGUOUS = 5
+DEFAULT_HOMOPOLYMER_LENGTH = 8
+DEFAULT_COMPLEXITY_WINDOW = 64
+DEFAULT_COMPLEXITY_THRESHOLD = 2.0
+QC_BATCH_BASES = 1024 * 1024
+
+PHRED_OFFSET = 33
+Q30 = 30
+
+QUALITY_METRIC_COLUMNS = ("quality_sum", "q30_count")
+
+QC_METRIC_COLUMNS = (
+    "length",
+    "gc_count",
+    "ambiguous",
+    "iupac_ambiguous",
+    "longest_homopolymer",
+    "homopolymer_runs",
+    "low_complexity_windows",
+)
+
+
+# Folding bit 0x20 lower-cases ASCII letters, so each class test is a few
+# vectorised comparisons instead of a per-byte table lookup.
+_CASE_BIT = 0x20
+_GC_BYTES = b"gc"
+_N_BYTES = b"n"
+_IUPAC_BYTES = b"ryswkmbdhv"
+_ACGT_BYTES = b"acgt"
+
+
+def _matches_any(folded: np.ndarray, characters: bytes) -> np.ndarray:
+    mask = folded == characters[0]
+    for character in characters[1:]:
+        mask |= folded == character
+    return mask
+
+
+def _segment_sums(values: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Sum ``uint8`` ``values`` within each ``offsets`` segment (empty segments sum to 0)."""
+
+    sums = np.zeros(len(lengths), dtype=np.int64)
+    if len(lengths) == 1:
+        sums[0] = values.sum(dtype=np.int64)
+        return sums
+    present = lengths > 0
+    if present.any():
+        sums[present] = np.add.reduceat(values, offsets[:-1][present], dtype=np.int64)
+    return sums
+
+
+def _segment_counts(mask: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Count set entries of ``mask`` within each ``offsets`` segment."""
+
+    if len(lengths) == 1:
+        return np.array([np.count_nonzero(mask)], dtype=np.int64)
+    return _segment_sums(mask.view(np.uint8), offsets, lengths)
+
+
+def _low_complexity_counts(
+    raw: np.ndarray,
+    folded: np.ndarray,
+    offsets: np.ndarray,
+    lengths: np.ndarray,
+    window: int,
+    threshold: float,
+) -> np.ndarray:
+    """Count non-overlapping windows per record whose dinucleotide entropy is below ``threshold`` bits.
+
+    Windows with fewer than half of their dinucleotides over ACGT are skipped.
+    """
+
+    counts = np.zeros(len(lengths), dtype=np.int64)
+    windows_per_record = lengths // window if window > 1 else np.zeros_like(lengths)
+    total = int(windows_per_record.sum())
+    if total == 0:
+        return counts
+
+    # Bits 1-2 of the ASCII codes give distinct 2-bit codes for A, C, G and T;
+    # dinucleotides touching any other base get the sentinel code 16.
+    codes = (raw >> 1) & 3
+    dinucleotides = (codes[:-1] << 2) | codes[1:]
+    acgt = _matches_any(folded, _ACGT_BYTES)
+    dinucleotides[~(acgt[:-1] & acgt[1:])] = 16
+    window_record = np.repeat(np.arange(len(lengths)), windows_per_record)
+    first = np.cumsum(windows_per_record) - windows_per_record
+    window_starts = offsets[window_record] + (np.arange(total) - np.repeat(first, windows_per_record)) * window
+    # Each window holds ``window - 1`` dinucleotides; none crosses into the next window.
+    views = np.lib.stride_tricks.sliding_window_view(dinucleotides, window - 1)
+
+    block = max(1, QC_BATCH_BASES // window)
+    for begin in range(0, total, block):
+        cells = views[window_starts[begin : begin + block]]
+        keys = cells + (np.arange(len(cells), dtype=np.int32) * 17)[:, None]
+        histogram = np.bincount(keys.ravel(), minlength=len(cells) * 17).reshape(-1, 17)[:, :16]
+        informative = histogram.sum(axis=1)
+        frequencies = histogram / np.maximum(informative, 1)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            entropy = -np.where(histogram > 0, frequencies * np.log2(frequencies), 0.0).sum(axis=1)
+        low = (entropy < threshold) & (informative * 2 >= window - 1)
+        counts += np.bincount(window_record[begin : begin + block][low], minlength=len(lengths))
+    return counts
+
+
+def qc_metrics_batch(sequences: Sequence[str], **kwargs) -> dict[str, np.ndarray]:
+    """Compute QC metric columns for many sequences; see :func:`qc_metrics_buffer`."""
+
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    raw = np.frombuffer("".join(sequences).encode("ascii", "replace"), dtype=np.uint8)
+    return qc_metrics_buffer(raw, offsets, **kwargs)
+
+
+def qc_metrics_buffer(
+    raw: np.ndarray,
+    offsets: np.ndarray,
+    *,
+    homopolymer_length: int = DEFAULT_HOMOPOLYMER_LENGTH,
+    complexity_window: int = DEFAULT_COMPLEXITY_WINDOW,
+    complexity_threshold: float = DEFAULT_COMPLEXITY_THRESHOLD,
+) -> dict[str, np.ndarray]:
+    """Compute QC metric columns for records stored back to back in one byte buffer.
+
+    Record ``i`` is ``raw[offsets[i]:offsets[i + 1]]``. Returns one array per
+    name in ``QC_METRIC_COLUMNS``. ``ambiguous`` counts ``N``;
+    ``iupac_ambiguous`` counts the other IUPAC ambiguity codes.
+    ``homopolymer_runs`` counts runs of at least ``homopolymer_length``
+    identical bases and ``low_complexity_windows`` the non-overlapping
+    ``complexity_window``-base windows with a dinucleotide entropy below
+    ``complexity_threshold`` bits. Nothing spans a record boundary, and records
+    are processed in groups of about ``QC_BATCH_BASES`` bases to bound the
+    temporaries.
+    """
 
+    params = dict(
+        homopolymer_length=homopolymer_length,
+        complexity_window=complexity_window,
+        complexity_threshold=complexity_threshold,
+    )
+    offsets = np.asarray(offsets, dtype=np.int64)
+    count = len(offsets) - 1
+    if count <= 0 or offsets[-1] - offsets[0] <= QC_BATCH_BASES:
+        return _qc_metrics_group(raw[offsets[0] : offsets[-1]], offsets - offsets[0], **params)
+
+    groups: list[dict[str, np.ndarray]] = []
+    start = 0
+    while start < count:
+        limit = np.searchsorted(offsets, offsets[start] + QC_BATCH_BASES, side="right") - 1
+        stop = max(start + 1, min(int(limit), count))
+        group_offsets = offsets[start : stop + 1] - offsets[start]
+        groups.append(_qc_metrics_group(raw[offsets[start] : offsets[stop]], group_offsets, **params))
+        start = stop
+    return {name: np.concatenate([group[name] for group in groups]) for name in QC_METRIC_COLUMNS}
+
+
+def _qc_metrics_group(
+    raw: np.ndarray,
+    offsets: np.ndarray,
+    *,
+    homopolymer_length: int,
+    complexity_window: int,
+    complexity_threshold: float,
+) -> dict[str, np.ndarray]:
+    lengths = np.diff(offsets)
+    present = lengths > 0
+    folded = raw | _CASE_BIT
+
+    longest = np.zeros(len(lengths), dtype=np.int64)
+    runs = np.zeros(len(lengths), dtype=np.int64)
+    if len(raw):
+        boundary = np.empty(len(raw), dtype=bool)
+        boundary[0] = True
+        np.not_equal(folded[1:], folded[:-1], out=boundary[1:])
+        boundary[offsets[:-1][present]] = True
+        run_starts = np.flatnonzero(boundary)
+        run_lengths = np.diff(run_starts, append=len(raw))
+        # Runs are in record order, so each present record owns a contiguous slice of them.
+        first_runs = np.searchsorted(run_starts, offsets[:-1][present])
+        longest[present] = np.maximum.reduceat(run_lengths, first_runs)
+        runs[present] = np.add.reduceat(run_lengths >= homopolymer_length, first_runs, dtype=np.int64)
+
+    return {
+        "length": lengths,
+        "gc_count": _segment_counts(_matches_any(folded, _GC_BYTES), offsets, lengths),
+        "ambiguous": _segment_counts(_matches_any(folded, _N_BYTES), offsets, lengths),
+        "iupac_ambiguous": _segment_counts(_matches_any(folded, _IUPAC_BYTES), offsets, lengths),
+        "longest_homopolymer": longest,
+        "homopolymer_runs": runs,
+        "low_complexity_windows": _low_complexity_counts(
+            raw, folded, offsets, lengths, complexity_window, complexity_threshold
+        ),
+    }
+
+
+def quality_metrics_buffer(qualities: np.ndarray, offsets: np.ndarray) -> dict[str, np.ndarray]:
+    """Sum Phred+33 scores and count bases at or above Q30 per record of a quality buffer.
+
+    ``qualities`` is laid out like the bases buffer, with the same ``offsets``.
+    """
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    window = qualities[offsets[0] : offsets[-1]] if len(offsets) else qualities[:0]
+    relative = offsets - offsets[0] if len(offsets) else offsets
+    return {
+        "quality_sum": _segment_sums(window, relative, lengths) - PHRED_OFFSET * lengths,
+        "q30_count": _segment_counts(window >= PHRED_OFFSET + Q30, relative, lengths),
+    }
+
+
+def quality_summary(quality_sum: int, q30_count: int, length: int) -> dict[str, float]:
+    """Return ``mean_quality`` and ``q30_fraction`` for a record's quality totals."""
+
+    if not length:
+        return {"mean_quality": 0.0, "q30_fraction": 0.0}
+    return {"mean_quality": round(quality_sum / length, 2), "q30_fraction": round(q30_count / length, 4)}
+
+
+def gc_percent(gc_count: int, length: int) -> float:
+    """Return GC% rounded to two decimals, as reported by :func:`compute_gc_content`."""
+
+    if not length:
+        return 0.0
+    return round((gc_count / length) * 100, 2)
+
+
+def qc_flag_list(
+    length: int, ambiguous: int, *, min_length: int = DEFAULT_MIN_LENGTH, max_ambiguous: int = DEFAULT_MAX_AMBIGUOUS
+) -> list[str]:
+    """Return the ``qc_flags`` raised for a record of ``length`` bases with ``ambiguous`` Ns."""
+
+    flags: list[str] = []
     if length < min_length:
         flags.append("too_short")
     if ambiguous > max_ambiguous:
         flags.append("high_ambiguous_content")
+    return flags
 
-    return {
+
+def qc_records(
+    sequences: Sequence[str],
+    *,
+    qualities: Sequence[str] | None = None,
+    min_length: int = DEFAULT_MIN_LENGTH,
+    max_ambiguous: int = DEFAULT_MAX_AMBIGUOUS,
+) -> list[dict[str, object]]:
+    """Return per-record QC dicts (GC%, metrics and ``qc_flags``) for a batch of sequences.
+
+    When FASTQ ``qualities`` are given, ``mean_quality`` and ``q30_fraction``
+    are added to each record.
+    """
+
+    metrics = qc_metrics_batch(sequences)
+    columns = [metrics[name].tolist() for name in QC_METRIC_COLUMNS]
+    quality_columns: list[list[int]] = []
+    if qualities is not None:
+        lengths = metrics["length"]
+        buffer = np.frombuffer("".join(qualities).encode("ascii", "replace"), dtype=np.uint8)
+        totals = quality_metrics_buffer(buffer, np.concatenate(([0], np.cumsum(lengths))))
+        quality_columns = [totals[name].tolist() for name in QUALITY_METRIC_COLUMNS]
+    results: list[dict[str, object]] = []
+    for position, (length, gc_count, ambiguous, iupac, longest, runs, low_complexity) in enumerate(zip(*columns)):
+        record: dict[str, object] = {
+            "gc_content": gc_percent(gc_count, length),
+            "length": length,
+            "ambiguous": ambiguous,
+            "iupac_ambiguous": iupac,
+            "longest_homopolymer": longest,
+            "homopolymer_runs": runs,
+            "low_complexity_windows": low_complexity,
+            "qc_flags": qc_flag_list(length, ambiguous, min_length=min_length, max_ambiguous=max_ambiguous),
+        }
+        if quality_columns:
+            record.update(quality_summary(quality_columns[0][position], quality_columns[1][position], length))
+        results.append(record)
+    return results
+
+
+def compute_gc_content(sequence: str) -> float:
+    """Return GC% for a DNA sequence."""
+
+    folded = np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8) | _CASE_BIT
+    return gc_percent(int(np.count_nonzero(_matches_any(folded, _GC_BYTES))), len(folded))
+
+
+def qc_check_sequence(
+    sequence: str,
+    *,
+    quality: str | None = None,
+    min_length: int = DEFAULT_MIN_LENGTH,
+    max_ambiguous: int = DEFAULT_MAX_AMBIGUOUS,
+) -> dict[str, object]:
+    """
+    Perform basic quality checks on a sequence.
+
+    Returns a dictionary with flags that downstream modules can log or act upon.
+    A FASTQ ``quality`` string adds ``mean_quality`` and ``q30_fraction``.
+    """
+
+    folded = np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8) | _CASE_BIT
+    length = len(folded)
+    ambiguous = int(np.count_nonzero(_matches_any(folded, _N_BYTES)))
+    result: dict[str, object] = {
         "length": length,
         "ambiguous": ambiguous,
-        "qc_flags": flags,
+        "qc_flags": qc_flag_list(length, ambiguous, min_length=min_length, max_ambiguous=max_ambiguous),
     }
+    if quality is not None:
+        scores = np.frombuffer(quality.encode("ascii", "replace"), dtype=np.uint8)
+        totals = quality_metrics_buffer(scores, np.array([0, len(scores)]))
+        result.update(quality_summary(int(totals["quality_sum"][0]), int(totals["q30_count"][0]), len(scores)))
+    return result
+
+
+def iter_sequences(source: str | Path | TextIO | BinaryIO) -> Iterator[dict[str, object]]:
+    """Lazily yield FASTA or FASTQ records as dicts with QC metrics.
+
+    Records are buffered up to ``QC_BATCH_BASES`` bases so QC runs as one
+    vectorised batch rather than once per record.
+    """
+
+    pending: list[tuple[str, str, str | None]] = []
+    pending_bases = 0
+    for record in iter_sequence_records(source):
+        pending.append(record)
+        pending_bases += len(record[1])
+        if pending_bases >= QC_BATCH_BASES:
+            yield from _qc_batch_records(pending)
+            pending = []
+            pending_bases = 0
+    if pending:
+        yield from _qc_batch_records(pending)
 
 
-def load_sequences(source: str | Path | TextIO) -> list[dict[str, object]]:
+def _qc_batch_records(pending: list[tuple[str, str, str | None]]) -> Iterator[dict[str, object]]:
+    qualities = [quality or "" for _, _, quality in pending] if pending[0][2] is not None else None
+    results = qc_records([sequence for _, sequence, _ in pending], qualities=qualities)
+    for (record_id, sequence, _), qc in zip(pending, results):
+        yield {"id": record_id, "sequence": sequence, **qc}
+
+
+def load_sequences(source: str | Path | TextIO | BinaryIO) -> list[dict[str, object]]:
     """
-    Load sequences from FASTA into a list of dicts with QC metrics.
+    Load sequences from FASTA or FASTQ into a list of dicts with QC metrics.
+
+    Deprecated: the list holds every record at once. Iterate
+    :func:`iter_sequences` instead, or build a
+    :class:`~backend.sequence_batch.SequenceBatch` with ``from_source`` /
+    ``iter_source``.
 
     Parameters
     ----------
     source:
-        Path to a FASTA file or a text IO handle containing FASTA content.
+        Path to a FASTA/FASTQ file (optionally gzip-compressed) or an IO
+        handle containing such content.
     """
 
-    records: list[dict[str, object]] = []
-    for record in _open_fasta_source(source):
-        sequence = str(record.seq).upper()
-        qc = qc_check_sequence(sequence)
-        records.append(
-            {
-                "id": record.id,
-                "sequence": sequence,
-                "gc_content": compute_gc_content(sequence),
-                **qc,
-            }
-        )
-    return records
+    warnings.warn(
+        "load_sequences() materialises every record; iterate iter_sequences() instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    return list(iter_sequences(source))
 
 
 def load_sequences_from_string(data: str) -> list[dict[str, str | float]]:
-    """Convenience helper for FASTA data provided as a raw string."""
+    """Convenience helper for FASTA data provided as a raw string (deprecated like :func:`load_sequences`)."""
 
-    return load_sequences(StringIO(data))
+    warnings.warn(
+        "load_sequences_from_string() materialises every record; iterate iter_sequences() instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    return list(iter_sequences(StringIO(data)))
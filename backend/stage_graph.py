@@ -0,0 +1,130 @@
+"""A small DAG of pipeline stages run concurrently as their dependencies complete."""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional, Sequence
+
+from backend.instrumentation import StageRecorder
+
+DEFAULT_STAGE_WORKERS = 4
+
+StageFunction = Callable[[Mapping[str, object]], object]
+
+
+@dataclass
+class _Stage:
+    name: str
+    func: StageFunction
+    after: tuple[str, ...]
+    records: int = 0
+    bases: int = 0
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+
+class StageGraph:
+    """Stages with declared dependencies, each started as soon as all of its inputs are done.
+
+    A stage is a function of the results of the stages it runs ``after``
+    (passed as a mapping by stage name) and its return value is its result.
+    Ready stages run concurrently on a thread pool of ``max_workers``; with
+    one worker they run in order in the calling thread. Stage timings go to
+    ``recorder`` and :meth:`describe` reports when each stage ran and the
+    critical path, the dependency chain that bounds the graph's wall time.
+    The first stage to fail stops new stages from starting and its exception
+    is raised once the running ones finish.
+    """
+
+    def __init__(self, recorder: Optional[StageRecorder] = None, *, max_workers: int = DEFAULT_STAGE_WORKERS) -> None:
+        self.recorder = recorder
+        self.max_workers = max_workers
+        self.stages: dict[str, _Stage] = {}
+        self.results: dict[str, object] = {}
+        self._origin = 0.0
+
+    def add(
+        self, name: str, func: StageFunction, *, after: Sequence[str] = (), records: int = 0, bases: int = 0
+    ) -> None:
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined.")
+        missing = [dependency for dependency in after if dependency not in self.stages]
+        if missing:
+            # Dependencies must be added first, which also rules out cycles.
+            raise ValueError(f"Stage {name!r} depends on undefined stages {missing}.")
+        self.stages[name] = _Stage(name, func, tuple(after), records, bases)
+
+    def run(self) -> dict[str, object]:
+        self._origin = time.perf_counter()
+        if self.max_workers <= 1:
+            for stage in self.stages.values():
+                self.results[stage.name] = self._execute(stage)
+            return self.results
+
+        started: set[str] = set()
+        futures: dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline-stage") as pool:
+            while True:
+                if error is None:
+                    for stage in self.stages.values():
+                        if stage.name not in started and all(name in self.results for name in stage.after):
+                            started.add(stage.name)
+                            futures[pool.submit(self._execute, stage)] = stage.name
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except BaseException as exc:  # re-raised once running stages have finished
+                        error = error or exc
+        if error is not None:
+            raise error
+        return self.results
+
+    def _execute(self, stage: _Stage) -> object:
+        stage.start = time.perf_counter() - self._origin
+        try:
+            if self.recorder is None:
+                return stage.func(self.results)
+            with self.recorder.stage(stage.name) as metrics:
+                result = stage.func(self.results)
+                metrics.records += stage.records
+                metrics.bases += stage.bases
+            return result
+        finally:
+            stage.end = time.perf_counter() - self._origin
+
+    def critical_path(self) -> tuple[list[str], float]:
+        """Return the chain of stages ending last, following each stage's latest-finishing dependency."""
+
+        finished = [stage for stage in self.stages.values() if stage.end is not None]
+        if not finished:
+            return [], 0.0
+        stage = max(finished, key=lambda candidate: candidate.end or 0.0)
+        elapsed = stage.end or 0.0
+        path = [stage.name]
+        while stage.after:
+            stage = max((self.stages[name] for name in stage.after), key=lambda candidate: candidate.end or 0.0)
+            path.append(stage.name)
+        return path[::-1], elapsed
+
+    def describe(self) -> dict[str, object]:
+        path, elapsed = self.critical_path()
+        return {
+            "stages": {
+                stage.name: {
+                    "after": list(stage.after),
+                    "start_seconds": round(stage.start, 6) if stage.start is not None else None,
+                    "end_seconds": round(stage.end, 6) if stage.end is not None else None,
+                }
+                for stage in self.stages.values()
+            },
+            "critical_path": path,
+            "elapsed_seconds": round(elapsed, 6),
+            "workers": self.max_workers,
+        }
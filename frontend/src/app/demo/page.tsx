@@ -413,7 +413,7 @@ export default function Home() {
                 >
                   <input
                     type="file"
-                    accept=".fasta,.fa,.txt"
+                    accept=".fasta,.fa,.txt,.fastq,.fq,.gz"
                     onChange={onFileInput}
                     disabled={loading}
                     className="w-full rounded-lg border border-blue-200 bg-white px-3 py-2 text-sm text-blue-900 shadow-sm focus:border-blue-400 focus:outline-none focus:ring-2 focus:ring-blue-200 disabled:cursor-not-allowed disabled:bg-blue-50"
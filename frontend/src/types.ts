@@ -4,16 +4,28 @@ export type AnalysisResult = {
   sequence: string;
   length: number;
   ambiguous: number;
+  iupac_ambiguous?: number;
+  longest_homopolymer?: number;
+  homopolymer_runs?: number;
+  low_complexity_windows?: number;
+  mean_quality?: number;
+  q30_fraction?: number;
   qc_flags: string[];
   gc_content: number;
   predicted_species: string;
   species_identity: number;
   species_coverage: number;
   species_score: number;
+  species_method?: "alignment" | "sketch";
   amr_gene: string;
   amr_identity: number;
   amr_coverage: number;
   amr_score: number;
+  amr_start?: number | null;
+  amr_end?: number | null;
+  amr_strand?: "+" | "-" | null;
+  amr_hit_count?: number;
+  amr_hits?: string;
   similarity: number;
   resistance_risk: string;
   notes: string;
@@ -31,8 +43,10 @@ export type AnalysisMetadata = {
 export type AnalysisResponse = {
   job_id?: string;
   status?: string;
+  deduplicated?: boolean;
   error?: string;
   count?: number;
+  results_omitted?: boolean;
   report_path?: string;
   summary_path?: string;
   pdf_path?: string;
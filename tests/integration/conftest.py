@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.job_runner as job_runner_module
+from backend.amr_detection import load_reference as load_amr_reference
+from backend.classify_pathogen import load_reference as load_pathogen_reference
+from backend.database import Base
+from backend.job_runner import JobRunner
+from backend.reference_catalog import CatalogManager, build_catalog_snapshot
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(job_runner_module, "SessionLocal", sessionmaker(bind=engine, future=True))
+    catalogs = CatalogManager(
+        build_catalog_snapshot(
+            load_amr_reference("data/resistance_genes_reference.csv"),
+            load_pathogen_reference("data/pathogen_reference.csv"),
+        )
+    )
+    runner = JobRunner(catalogs=catalogs, output_dir=tmp_path / "out", pdf_mode="lazy", dedup=True)
+    yield runner
+    runner.shutdown()
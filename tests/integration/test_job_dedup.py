@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import backend.job_runner as job_runner_module
+from backend.sequence_batch import SequenceBatch
+
+
+def _batch() -> SequenceBatch:
+    return SequenceBatch.from_fasta(Path("data/sample_sequences.fasta").open())
+
+
+def test_duplicate_submission_reuses_the_completed_job(runner, monkeypatch):
+    runs = []
+    original = job_runner_module.run_pipeline
+    monkeypatch.setattr(
+        job_runner_module, "run_pipeline", lambda *args, **kwargs: runs.append(1) or original(*args, **kwargs)
+    )
+
+    first_id, first = runner.enqueue(None, 42, metadata={"sample_id": "S1"}, sequences=_batch())
+    second_id, second = runner.enqueue(None, 42, metadata={"sample_id": "S1"}, sequences=_batch())
+    other_id, _ = runner.enqueue(None, 43, metadata={"sample_id": "S1"}, sequences=_batch())
+
+    assert second_id == first_id
+    assert second["deduplicated"] and second["results"] == first["results"]
+    assert second["report_path"] == first["report_path"]
+    assert other_id != first_id
+    assert len(runs) == 2
+    assert 'vetpathogen_jobs_total{status="reused"} 1' in runner.metrics.render()
+
+
+def test_missing_artefacts_are_recomputed(runner):
+    first_id, first = runner.enqueue(None, 7, sequences=_batch())
+    Path(first["report_path"]).unlink()
+
+    second_id, second = runner.enqueue(None, 7, sequences=_batch())
+
+    assert second_id != first_id
+    assert "deduplicated" not in second
+
+
+def test_concurrent_duplicates_run_the_pipeline_once(runner, monkeypatch):
+    runs = []
+    original = job_runner_module.run_pipeline
+
+    def slow_pipeline(*args, **kwargs):
+        runs.append(1)
+        time.sleep(0.2)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(job_runner_module, "run_pipeline", slow_pipeline)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        outcomes = list(pool.map(lambda _: runner.enqueue(None, 42, sequences=_batch()), range(4)))
+
+    assert len(runs) == 1
+    assert len({job_id for job_id, _ in outcomes}) == 1
+    assert sum(bool(payload.get("deduplicated")) for _, payload in outcomes) == 3
+
+
+def test_seedless_submissions_are_not_reused(runner):
+    first_id, _ = runner.enqueue(None, None, sequences=_batch())
+    second_id, second = runner.enqueue(None, None, sequences=_batch())
+
+    assert second_id != first_id
+    assert "deduplicated" not in second
+
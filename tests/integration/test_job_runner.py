@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.sequence_batch import SequenceBatch
+
+
+def test_streamed_job_reports_every_record_without_inline_results(runner):
+    sample = Path("data/sample_sequences.fasta").read_text()
+    fasta_text = "".join(sample.replace(">", f">copy{copy}_") for copy in range(3))
+    runner.stream_batch_size = 2
+
+    job_id, payload = runner.enqueue(fasta_text, 5)
+    duplicate_id, duplicate = runner.enqueue(fasta_text, 5)
+
+    assert payload["status"] == "completed"
+    assert payload["count"] == 6 and payload["results"] == [] and payload["results_omitted"]
+    with open(payload["report_path"], encoding="utf-8") as handle:
+        assert sum(1 for _ in handle) == 7
+    assert duplicate_id == job_id and duplicate["count"] == 6 and duplicate["results_omitted"]
+    stored = runner.get_job(job_id)
+    assert stored["count"] == 6 and stored["results"] == []
+
+
+def test_streamed_upload_is_spooled_to_disk_and_never_parsed_whole(runner, tmp_path, monkeypatch):
+    sample = Path("data/sample_sequences.fasta").read_text()
+    fasta_text = "".join(sample.replace(">", f">copy{copy}_") for copy in range(3))
+    runner.stream_batch_size = 2
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(main.app.state, "job_runner", runner, raising=False)
+
+    def whole_upload(*args, **kwargs):
+        raise AssertionError("streaming uploads must not be parsed into one batch")
+
+    monkeypatch.setattr(SequenceBatch, "from_source", whole_upload)
+    client = TestClient(main.app)
+
+    response = client.post("/analyze/", files={"fasta": ("sample.fasta", fasta_text, "text/plain")}, params={"seed": 3})
+    malformed = client.post("/analyze/", files={"fasta": ("bad.fasta", "ACGT\n", "text/plain")})
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 6 and response.json()["results_omitted"]
+    assert malformed.status_code == 200 and malformed.json()["status"] == "failed"
+    assert "header" in malformed.json()["error"].lower()
+    assert not list((tmp_path / "uploads").iterdir())
+
+
+def test_upload_is_parsed_once_and_handed_to_the_job_as_a_batch(runner, tmp_path, monkeypatch):
+    fasta_text = Path("data/sample_sequences.fasta").read_text()
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(main.app.state, "job_runner", runner, raising=False)
+    sources = []
+    original = runner.enqueue
+    monkeypatch.setattr(runner, "enqueue", lambda *args, **kwargs: sources.append(kwargs) or original(*args, **kwargs))
+    parses = []
+    from_source = SequenceBatch.from_source
+    monkeypatch.setattr(SequenceBatch, "from_source", lambda source: parses.append(source) or from_source(source))
+
+    response = TestClient(main.app).post("/analyze/", files={"fasta": ("sample.fasta", fasta_text, "text/plain")})
+
+    assert response.status_code == 200 and response.json()["count"] == 2 == len(response.json()["results"])
+    assert len(parses) == 1 and sources[0]["source"] is None and len(sources[0]["sequences"]) == 2
+    assert not list((tmp_path / "uploads").iterdir())
+    stages = response.json()["metadata"]["stage_metrics"]
+    assert stages["upload"]["records"] == 2 and stages["parse"]["records"] == 2
@@ -1,5 +1,7 @@
 from pathlib import Path
 
+import pandas as pd
+
 from backend.amr_detection import load_reference as load_amr_reference
 from backend.classify_pathogen import load_reference as load_pathogen_reference
 from backend.pipeline import run_pipeline
@@ -26,3 +28,42 @@ def test_run_pipeline_smoke(tmp_path):
         assert summary_path.exists()
     if pdf_path:
         assert pdf_path.exists()
+
+
+def test_streamed_pipeline_matches_single_batch(tmp_path):
+    sample = Path("data/sample_sequences.fasta").read_text()
+    fasta_text = "".join(sample.replace(">", f">copy{copy}_") for copy in range(3))
+    amr_df = load_amr_reference("data/resistance_genes_reference.csv")
+    pathogen_df = load_pathogen_reference("data/pathogen_reference.csv")
+    common = dict(seed=7, amr_reference_df=amr_df, pathogen_reference_df=pathogen_df, render_pdf=False)
+
+    full_df, full_path, _, _, full_metadata = run_pipeline(
+        fasta_text, output_dir=tmp_path / "full", job_id="full", **common
+    )
+    streamed_df, streamed_path, _, _, metadata = run_pipeline(
+        fasta_text,
+        output_dir=tmp_path / "streamed",
+        job_id="streamed",
+        batch_size=2,
+        report_formats=("csv", "parquet") if _has_pyarrow() else ("csv",),
+        **common,
+    )
+
+    assert streamed_path.read_text() == full_path.read_text()
+    assert len(full_df) == 6 and streamed_df is None
+    assert metadata["streaming"] == {"batch_size": 2, "batches": 3}
+    assert metadata["summary"] == full_metadata["summary"]
+    assert metadata["alignment_stats"] == full_metadata["alignment_stats"]
+    if _has_pyarrow():
+        # Every batch goes into one Parquet schema, whichever columns the first batch leaves empty.
+        parquet = pd.read_parquet(tmp_path / "streamed" / "report_streamed.parquet")
+        assert parquet["id"].tolist() == full_df["id"].tolist()
+        assert [list(flags) for flags in parquet["qc_flags"]] == full_df["qc_flags"].tolist()
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,20 @@
+import pytest
+from fastapi import HTTPException
+
+from backend.main import _require_admin
+
+
+def test_admin_endpoints_fail_closed_without_a_configured_token(monkeypatch):
+    monkeypatch.delenv("VETPATHOGEN_ADMIN_TOKEN", raising=False)
+    with pytest.raises(HTTPException) as excinfo:
+        _require_admin("anything")
+    assert excinfo.value.status_code == 503
+
+
+def test_admin_token_must_match(monkeypatch):
+    monkeypatch.setenv("VETPATHOGEN_ADMIN_TOKEN", "s3cret")
+    _require_admin("s3cret")
+    for token in (None, "", "wrong"):
+        with pytest.raises(HTTPException) as excinfo:
+            _require_admin(token)
+        assert excinfo.value.status_code == 403
@@ -0,0 +1,74 @@
+import sys
+
+from backend.alignment import (
+    DEFAULT_PROFILE,
+    MatchStats,
+    ReferenceCompositions,
+    align_sequences,
+    base_composition,
+    best_match,
+    best_match_index,
+    get_engine,
+    identity_upper_bound,
+)
+
+
+def test_align_sequences_matches_reference_metrics():
+    result = align_sequences(
+        "ATGAGTATTCAACATTTCCGTGTCGCCCTTATTCCCTTTTTTG",
+        "ATGCCCGGGTTTAAACCCGGGTTTAAACCCGGGTTT",
+    )
+
+    assert result.score == 15.0
+    assert result.identity == 53.49
+    assert result.coverage == 100.0
+    assert result.alignment_length == 43
+
+
+def test_align_sequences_ignores_case_and_handles_empty_input():
+    assert align_sequences("acgtacgt", "ACGTACGT").identity == 100.0
+    assert align_sequences("", "ACGT").alignment_length == 0
+
+
+def test_best_match_reuses_shared_engine():
+    assert get_engine(DEFAULT_PROFILE) is get_engine()
+
+    label, metrics = best_match("ACGTACGTAA", [("a", "TTTTTTTTTT"), ("b", "ACGTACGTAA")])
+
+    assert label == "b"
+    assert metrics.identity == 100.0
+
+
+def test_best_match_prunes_references_that_cannot_win():
+    query = "ACGTACGTAAACGTACGTAA"
+    references = [
+        ("short", "ACGTA"),
+        ("exact", query),
+        ("exact_copy", query),
+        ("poly_c", "C" * 20),
+    ]
+    stats = MatchStats()
+
+    label, metrics = best_match(query, references, stats=stats)
+
+    assert (label, metrics.identity) == ("exact", 100.0)
+    assert stats.aligned == 2
+    assert stats.pruned == 2
+    assert identity_upper_bound(query, "C" * 20) < 100.0
+
+
+def test_catalog_compositions_bound_like_pairs_and_do_not_retain_queries():
+    references = [("a", "ACGTNNacgt"), ("b", "TTTT-GGGG"), ("empty", ""), ("c", "RYACGT")]
+    compositions = ReferenceCompositions.from_records(references)
+    query = "".join(["ACGTAC", "GTTTGG"])
+
+    bounds = compositions.bounds(base_composition(query))
+    position, metrics = best_match_index(query, references, positions=[0, 1, 3], compositions=compositions)
+    references_before = sys.getrefcount(query)
+    best_match_index(query, references, compositions=compositions)
+    best_match(query, references)
+
+    assert bounds == [identity_upper_bound(query, sequence) for _, sequence in references]
+    assert compositions.subset([3, 1]).bounds(base_composition(query)) == [bounds[3], bounds[1]]
+    assert (position, metrics) == best_match_index(query, references)
+    assert sys.getrefcount(query) == references_before
@@ -0,0 +1,61 @@
+import sqlite3
+
+from backend.alignment import align_sequences, get_engine
+from backend.alignment_cache import AlignmentCache, CachedAlignerEngine
+from backend.parallel import AlignmentExecutor
+
+
+def test_cached_engine_returns_identical_results_and_counts_hits(tmp_path):
+    cache = AlignmentCache(max_entries=1, path=tmp_path / "cache.sqlite", fingerprint="v1")
+    engine = CachedAlignerEngine(get_engine(), cache)
+
+    first = engine.align("ACGTACGTAA", "ACGTTCGTAA")
+    engine.align("TTTT", "TTTA")
+    again = engine.align("ACGTACGTAA", "ACGTTCGTAA")
+
+    assert first == again == align_sequences("ACGTACGTAA", "ACGTTCGTAA")
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_disk_tier_survives_reopen_and_is_purged_on_new_fingerprint(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    CachedAlignerEngine(get_engine(), AlignmentCache(path=path, fingerprint="v1")).align("ACGT", "ACGA")
+
+    reopened = AlignmentCache(path=path, fingerprint="v1")
+    CachedAlignerEngine(get_engine(), reopened).align("ACGT", "ACGA")
+    assert reopened.stats()["disk_hits"] == 1
+
+    invalidated = AlignmentCache(path=path, fingerprint="v2")
+    CachedAlignerEngine(get_engine(), invalidated).align("ACGT", "ACGA")
+    assert invalidated.stats()["misses"] == 1
+
+
+def test_disk_writes_are_committed_in_batches(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = AlignmentCache(path=path, fingerprint="v1")
+    engine = CachedAlignerEngine(get_engine(), cache)
+    engine.align("ACGTACGT", "ACGTACGA")
+    engine.align("ACGTACGT", "ACGTTCGA")
+
+    def committed() -> int:
+        with sqlite3.connect(path) as reader:
+            return reader.execute("SELECT COUNT(*) FROM alignments").fetchone()[0]
+
+    assert committed() == 0
+    cache.flush()
+    assert committed() == 2
+
+
+def test_pool_workers_report_their_cache_lookups(tmp_path):
+    references = [("ref_a", "ACGTACGTACGTAAGG"), ("ref_b", "TTGACCAGTTGACCAA")]
+    engine = CachedAlignerEngine(get_engine(), AlignmentCache(path=tmp_path / "cache.sqlite", fingerprint="v1"))
+    executor = AlignmentExecutor({"refs": references}, engine=engine, workers=2, chunk_size=1)
+    try:
+        executor.best_matches("refs", ["ACGTACGTACGTAAGC", "ACGTACGTACGTAAGC"])
+        pool = executor.cache_stats()
+    finally:
+        executor.shutdown()
+
+    assert pool["hits"] + pool["disk_hits"] + pool["misses"] >= 4
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from backend.alignment import AlignerEngine, MatchStats, align_sequences, best_match
+from backend.banded_alignment import AlignmentTooLargeError, BandPolicy, banded_global_align
+
+SCORES = dict(match_score=1, mismatch_score=0, open_gap_score=-1, extend_gap_score=-0.5)
+
+
+def _bytes(sequence: str) -> np.ndarray:
+    return np.frombuffer(sequence.encode(), dtype=np.uint8)
+
+
+def test_banded_engine_agrees_with_full_matrix_aligner():
+    seq_a = "ATGAGTATTCAACATTTCCGTGTCGCCCTTATTCCCTTTTTTG" * 3
+    seq_b = "ATGAGTATTCAACATTTGTGTCGCCCTTATTCCCTTTTTTGCA" * 3
+
+    banded = AlignerEngine(band=BandPolicy(min_cells=0, min_width=2, expected_divergence=0.0))
+
+    assert banded.align(seq_a, seq_b) == align_sequences(seq_a, seq_b)
+
+
+def test_band_is_kept_when_path_touches_edge_but_cannot_be_beaten_outside_it():
+    seq_a = "ATTTAGTTGTGCCGCAGCGAAGTAGTGCTTGA"
+    seq_b = "TTAGTTGTGCCGCAGCGAAGTAGTGCTTGAAT"
+
+    result = banded_global_align(
+        _bytes(seq_a), _bytes(seq_b), BandPolicy(min_width=2, expected_divergence=0.0), **SCORES
+    )
+
+    assert result.half_width == 2
+    assert result.touched_edge and result.optimal
+    assert result.score == align_sequences(seq_a, seq_b).score
+
+
+def test_band_widens_until_no_path_outside_it_can_score_higher():
+    # The best in-band path never touches the edge of the initial band, yet
+    # the optimal alignment lies outside it.
+    seq_a = "TCACGTTGTCTGTGTCTACGAATTATACTGAGAGGCCTGTCTTAGAGGAAGCCGAC"
+    seq_b = "TCCGTTGTCGGTCTACGAATTATACTGAGAGCACTGTGTCTTAGAGGAAGCCACAC"
+
+    result = banded_global_align(
+        _bytes(seq_a), _bytes(seq_b), BandPolicy(min_width=2, expected_divergence=0.0), **SCORES
+    )
+
+    assert result.optimal and result.half_width > 2
+    assert result.score == align_sequences(seq_a, seq_b).score == 44.5
+
+
+def test_band_respects_memory_cap():
+    with pytest.raises(AlignmentTooLargeError):
+        banded_global_align(_bytes("ACGT" * 50), _bytes("ACGT" * 50), BandPolicy(max_dp_bytes=16), **SCORES)
+
+
+def test_oversized_query_is_left_unaligned_without_failing_the_others():
+    engine = AlignerEngine(band=BandPolicy(min_cells=0, max_dp_bytes=4000))
+    references = [("short", "ACGTTGCAAC"), ("long", "ACGTTGCAAC" * 20)]
+    stats = MatchStats()
+
+    matches = [best_match(query, references, engine=engine, stats=stats) for query in ("ACGTTGCAAC", "ACGTTGCAAC" * 20)]
+
+    assert matches[0][0] == "short" and matches[0][1].identity == 100.0
+    assert matches[1][0] == "" and matches[1][1].identity == 0.0
+    assert stats.oversized >= 1
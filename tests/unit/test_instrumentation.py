@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from backend.instrumentation import MetricsRegistry, StageRecorder, current_rss_bytes
+
+
+def test_nested_stages_count_their_time_once():
+    recorder = StageRecorder()
+    with recorder.stage("write") as write:
+        write.records += 3
+        for _ in range(2):
+            with recorder.stage("scan") as scan:
+                time.sleep(0.02)
+                scan.records += 1
+                scan.bases += 100
+
+    stages = recorder.as_dict()
+    assert stages["scan"]["records"] == 2 and stages["scan"]["bases"] == 200
+    assert stages["scan"]["wall_seconds"] >= 0.04
+    assert stages["write"]["wall_seconds"] < 0.02
+    assert stages["scan"]["bases_per_second"] > 0
+
+
+@pytest.mark.skipif(current_rss_bytes() is None, reason="needs /proc/self/statm")
+def test_stage_rss_is_sampled_per_stage_not_the_process_high_water_mark():
+    recorder = StageRecorder()
+    with recorder.stage("allocate"):
+        block = b"x" * (64 << 20)
+    del block
+    with recorder.stage("idle"):
+        pass
+
+    stages = recorder.as_dict()
+    assert stages["allocate"]["rss_delta_bytes"] >= 32 << 20
+    assert abs(stages["idle"]["rss_delta_bytes"]) < 16 << 20
+
+
+def test_registry_renders_prometheus_histograms_and_gauges():
+    recorder = StageRecorder()
+    with recorder.stage("scan") as scan:
+        scan.records += 5
+    registry = MetricsRegistry()
+    registry.job_queued()
+    registry.job_started(queued=True)
+    registry.observe(recorder.stages)
+    registry.job_finished("completed")
+    registry.job_queued()
+
+    text = registry.render()
+
+    assert "vetpathogen_jobs_queued 1" in text
+    assert "vetpathogen_jobs_active 0" in text
+    assert 'vetpathogen_jobs_total{status="completed"} 1' in text
+    assert 'vetpathogen_stage_wall_seconds_bucket{stage="scan",le="+Inf"} 1' in text
+    assert 'vetpathogen_stage_wall_seconds_count{stage="scan"} 1' in text
+    assert 'vetpathogen_stage_records_total{stage="scan"} 5' in text
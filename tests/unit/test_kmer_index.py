@@ -0,0 +1,25 @@
+from backend.alignment import best_match
+from backend.kmer_index import KmerIndex
+
+REFERENCES = [
+    ("blaTEM", "ATGAGTATTCAACATTTCCGTGTCGCCCTTATTCCCTTTTTTG"),
+    ("tetA", "ATGGCAGCTATTGTTGACGTTATCGCGGTGATTTTTATC"),
+    ("decoy", "CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC"),
+]
+
+
+def test_shortlist_keeps_best_reference_and_matches_exhaustive_search():
+    index = KmerIndex(REFERENCES, k=7, top_n=1)
+    query = "ATGGCAGCTATTGTTGACGTTATCGCGGTGATTTTTATC"
+
+    shortlist = index.shortlist(query)
+
+    assert [label for label, _ in shortlist] == ["tetA"]
+    assert best_match(query, shortlist) == best_match(query, REFERENCES)
+
+
+def test_shortlist_falls_back_to_full_catalog_without_shared_kmers():
+    index = KmerIndex(REFERENCES, k=7, top_n=1)
+
+    assert index.shortlist("GGGGGGGGGGGG") == index.records
+    assert index.shortlist("ACG") == index.records
@@ -0,0 +1,64 @@
+import random
+
+import pandas as pd
+
+from backend.alignment import MatchStats, best_match
+from backend.kmer_index import KmerIndex
+from backend.parallel import AlignmentExecutor
+from backend.reference_bundle import build_bundle, read_reference, reference_records
+from backend.reference_clusters import ReferenceClusters
+
+
+def test_parallel_best_matches_equal_serial_results():
+    rng = random.Random(11)
+    references = [(f"ref_{i}", "".join(rng.choice("ACGT") for _ in range(60))) for i in range(12)]
+    references.append(("ref_dup", references[3][1]))
+    queries = [references[i][1][5:55] for i in (3, 7, 9)] + ["ACGT" * 10, ""]
+
+    index = KmerIndex(references, k=7, top_n=4)
+    executor = AlignmentExecutor({"refs": references}, indexes={"refs": index}, workers=2, chunk_size=2)
+    try:
+        parallel = executor.matcher("refs").best_matches(queries)
+    finally:
+        executor.shutdown()
+
+    assert parallel == [best_match(query, index.shortlist(query)) for query in queries]
+
+
+def test_parallel_best_matches_search_clusters_in_the_workers():
+    rng = random.Random(5)
+    base = "".join(rng.choice("ACGT") for _ in range(80))
+    references = [(f"allele_{i}", base[:i] + ("A" if base[i] != "A" else "C") + base[i + 1 :]) for i in range(0, 40, 8)]
+    references += [(f"ref_{i}", "".join(rng.choice("ACGT") for _ in range(80))) for i in range(4)]
+    queries = [references[2][1][4:76], references[6][1], "ACGT" * 10]
+
+    clusters = ReferenceClusters(references, identity=95.0, k=7)
+    executor = AlignmentExecutor({"refs": references}, clusters={"refs": clusters}, workers=2, chunk_size=1)
+    try:
+        stats = MatchStats()
+        parallel = executor.matcher("refs").best_matches(queries, stats)
+    finally:
+        executor.shutdown()
+
+    assert parallel == [clusters.best_match(query) for query in queries]
+    assert stats.pruned > 0
+
+
+def test_parallel_best_matches_over_a_memory_mapped_bundle(tmp_path):
+    rng = random.Random(3)
+    sequences = ["".join(rng.choice("ACGT") for _ in range(60)) for _ in range(10)]
+    reference = pd.DataFrame({"gene_name": [f"ref_{i}" for i in range(10)], "sequence": sequences})
+    records = reference_records(
+        read_reference(build_bundle(reference, tmp_path / "refs.vpref", label_column="gene_name"), "gene_name"),
+        "gene_name",
+    )
+    queries = [sequences[i][4:56] for i in (1, 6)]
+
+    executor = AlignmentExecutor({"refs": records}, workers=2, chunk_size=1)
+    try:
+        parallel = executor.matcher("refs").best_matches(queries)
+    finally:
+        executor.shutdown()
+
+    assert executor.catalogs["refs"] is records
+    assert parallel == [best_match(query, list(reference.itertuples(index=False, name=None))) for query in queries]
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from backend.pdf_renderer import PdfRenderer, pdf_path_for
+from backend.report import save_report
+
+
+def _report_csv(tmp_path, rows: int):
+    report = pd.DataFrame(
+        {
+            "id": [f"seq_{i}" for i in range(rows)],
+            "predicted_species": ["Escherichia_coli"] * rows,
+            "species_identity": [99.5] * rows,
+            "amr_gene": ["N/A" if i % 3 else "blaTEM" for i in range(rows)],
+            "amr_identity": [0.0 if i % 3 else 98.0 for i in range(rows)],
+            "resistance_risk": ["Low"] * rows,
+        }
+    )
+    return save_report(report, tmp_path / "report_job-1.csv")
+
+
+def test_pdf_is_rendered_once_and_served_from_disk(tmp_path):
+    report_path = _report_csv(tmp_path, 130)
+    renderer = PdfRenderer(max_rows=100)
+    renders = []
+    original = renderer._render
+    renderer._render = lambda *args: renders.append(args) or original(*args)
+
+    first = renderer.render(report_path, {"sample_id": "S1"})
+    second = renderer.render(report_path, {"sample_id": "S1"})
+
+    assert first == second == pdf_path_for(report_path)
+    assert first.read_bytes().startswith(b"%PDF")
+    assert len(renders) == 1
+
+
+def test_background_render_is_shared_with_a_waiting_download(tmp_path):
+    report_path = _report_csv(tmp_path, 5)
+    renderer = PdfRenderer()
+
+    queued = renderer.submit(report_path)
+    downloaded = renderer.render(report_path)
+    renderer.shutdown()
+
+    assert queued.result() == downloaded
+    assert downloaded.exists()
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from backend.amr_detection import detect_amr_genes, load_reference as load_amr_reference
+from backend.classify_pathogen import classify_batch, load_reference as load_pathogen_reference
+from backend.kmer_index import KmerIndex
+from backend.query_scan import CatalogSearch, scan_batch
+from backend.report import amr_columns
+from backend.sequence_batch import SequenceBatch
+
+
+def test_fused_scan_matches_separate_classification_and_amr_detection():
+    batch = SequenceBatch.from_source(Path("data/sample_sequences.fasta"))
+    amr_df = load_amr_reference("data/resistance_genes_reference.csv")
+    pathogen_df = load_pathogen_reference("data/pathogen_reference.csv")
+    pathogen_index = KmerIndex.from_dataframe(pathogen_df, "species", k=7, top_n=1)
+
+    scan = scan_batch(
+        batch,
+        pathogen=CatalogSearch.from_dataframe(pathogen_df, "species", index=pathogen_index),
+        amr=CatalogSearch.from_dataframe(amr_df, "gene_name"),
+    )
+
+    assert scan.species == classify_batch(batch, pathogen_df, index=pathogen_index)
+    assert scan.amr == {"id": list(batch.ids), **amr_columns(batch.ids, detect_amr_genes(batch, amr_df))}
+    assert scan.amr_stats.aligned + scan.amr_stats.pruned == len(batch) * len(amr_df)
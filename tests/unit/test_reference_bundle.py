@@ -0,0 +1,56 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from backend.reference_bundle import (
+    BundleRecords,
+    build_bundle,
+    load_bundle,
+    preferred_reference_path,
+    read_reference,
+    reference_records,
+)
+
+
+def test_bundle_round_trips_catalog_and_version(tmp_path):
+    reference = pd.DataFrame(
+        {
+            "gene_name": ["blaTEM", "tetA", "empty"],
+            "sequence": ["acgtnRYacgtA", "GGGCCCTTTAA", ""],
+            "drug_class": ["beta-lactam", "tetracycline", None],
+        }
+    )
+    csv_path = tmp_path / "genes.csv"
+    reference.to_csv(csv_path, index=False)
+
+    bundle_path = build_bundle(pd.read_csv(csv_path), tmp_path / "genes.vpref", label_column="gene_name")
+    bundle = load_bundle(bundle_path)
+
+    assert bundle.decode() == ["ACGTNRYACGTA", "GGGCCCTTTAA", ""]
+    assert bundle.sequence(1) == "GGGCCCTTTAA"
+    from_csv = read_reference(csv_path, "gene_name")
+    from_bundle = read_reference(bundle_path, "gene_name")
+    assert from_bundle.attrs["catalog_version"] == from_csv.attrs["catalog_version"]
+    assert from_bundle["drug_class"].tolist()[:2] == ["beta-lactam", "tetracycline"]
+    assert preferred_reference_path(csv_path) == bundle_path
+
+
+def test_bundle_catalog_is_decoded_on_demand_and_pickled_by_path(tmp_path):
+    reference = pd.DataFrame({"gene_name": [f"gene_{i}" for i in range(100)], "sequence": ["ACGTTGCA" * 50] * 100})
+    bundle_path = build_bundle(reference, tmp_path / "genes.vpref", label_column="gene_name")
+
+    loaded = read_reference(bundle_path, "gene_name")
+    records = reference_records(loaded, "gene_name")
+
+    assert "sequence" not in loaded.columns
+    assert isinstance(records, BundleRecords)
+    assert list(records) == list(reference.itertuples(index=False, name=None))
+    assert records[-1] == ("gene_99", "ACGTTGCA" * 50) and records[2:4] == list(records)[2:4]
+    payload = pickle.dumps(records)
+    assert len(payload) < 1_000  # the path and version, not 40 kb of bases
+    assert list(pickle.loads(payload)) == list(records)
+
+    build_bundle(reference.iloc[:10], bundle_path, label_column="gene_name")
+    with pytest.raises(ValueError, match="changed"):
+        pickle.loads(payload)
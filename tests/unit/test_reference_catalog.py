@@ -0,0 +1,49 @@
+import pandas as pd
+
+from backend.alignment import get_engine
+from backend.reference_catalog import CatalogManager, CatalogSnapshot
+
+
+class _Snapshot(CatalogSnapshot):
+    def shutdown(self) -> None:
+        self.closed = True
+
+
+def _snapshot(gene_sequence: str) -> _Snapshot:
+    amr = pd.DataFrame({"gene_name": ["blaTEM"], "sequence": [gene_sequence]})
+    pathogen = pd.DataFrame({"species": ["E. coli"], "sequence": ["ACGT"]})
+    snapshot = _Snapshot(amr_reference_df=amr, pathogen_reference_df=pathogen, engine=get_engine())
+    snapshot.versions = {"amr_reference": gene_sequence, "pathogen_reference": "ACGT"}
+    snapshot.closed = False
+    return snapshot
+
+
+def test_running_job_keeps_its_snapshot_across_a_swap():
+    old, new = _snapshot("AAAA"), _snapshot("CCCC")
+    manager = CatalogManager(old)
+
+    with manager.acquire() as pinned:
+        manager.swap(new)
+        assert pinned is old
+        assert manager.current is new
+        assert not old.closed
+        assert manager.status()["retired_versions_in_use"] == 1
+    assert old.closed
+    assert manager.status()["retired_versions_in_use"] == 0
+
+
+def test_reload_swaps_only_when_the_version_changes():
+    current = _snapshot("AAAA")
+    sequences = iter(["AAAA", "GGGG"])
+    manager = CatalogManager(
+        current,
+        loader=lambda: (None, None),
+        builder=lambda amr, pathogen: _snapshot(next(sequences)),
+    )
+
+    assert manager.reload()["reloaded"] is False
+    assert manager.current is current
+    result = manager.reload()
+    assert result["reloaded"] is True
+    assert manager.current.versions["amr_reference"] == "GGGG"
+    assert current.closed
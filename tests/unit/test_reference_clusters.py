@@ -0,0 +1,53 @@
+import pandas as pd
+
+from backend.alignment import MatchStats, best_match
+from backend.reference_bundle import build_bundle, read_reference
+from backend.reference_clusters import ReferenceClusters, cluster_representatives
+
+BLA_TEM = "ATGAGTATTCAACATTTCCGTGTCGCCCTTATTCCCTTTTTTGCGGCATTTTGCCTTCCTGTTTTTGCTCACCCAGAAACG"
+TET_A = "ATGGCAGCTATTGTTGACGTTATCGCGGTGATTTTTATCGGCGTGACCGCACTGCTGGTGGCTCTGGCGATCATCAGCG"
+
+
+def _variant(sequence: str, *positions: int) -> str:
+    bases = list(sequence)
+    for position in positions:
+        bases[position] = "A" if bases[position] != "A" else "C"
+    return "".join(bases)
+
+
+REFERENCES = [
+    ("blaTEM-1", BLA_TEM),
+    ("blaTEM-2", _variant(BLA_TEM, 10)),
+    ("blaTEM-3", _variant(BLA_TEM, 10, 40)),
+    ("tetA", TET_A),
+    ("tetA-2", _variant(TET_A, 5, 60)),
+]
+
+
+def test_near_identical_alleles_share_a_representative():
+    representatives = cluster_representatives(REFERENCES, identity=95.0, k=7).tolist()
+
+    assert representatives[0] == representatives[1] == representatives[2]
+    assert representatives[3] == representatives[4]
+    assert representatives[0] != representatives[3]
+
+
+def test_representative_first_search_matches_exhaustive_search():
+    clusters = ReferenceClusters(REFERENCES, identity=95.0, k=7)
+    stats = MatchStats()
+
+    for query in (REFERENCES[2][1], _variant(TET_A, 5, 61), _variant(BLA_TEM, 10, 41, 70)):
+        assert clusters.best_match(query, stats=stats) == best_match(query, REFERENCES)
+    assert clusters.cluster_count == 2
+    assert stats.aligned + stats.pruned == 3 * len(REFERENCES)
+
+
+def test_clusters_compiled_into_a_bundle_are_reused(tmp_path):
+    reference = pd.DataFrame(REFERENCES, columns=["gene_name", "sequence"])
+    bundle_path = build_bundle(reference, tmp_path / "genes.vpref", label_column="gene_name", cluster_identity=95.0)
+
+    loaded = read_reference(bundle_path, "gene_name")
+    clusters = ReferenceClusters.from_dataframe(loaded, "gene_name", identity=95.0)
+
+    assert loaded.attrs["clusters"]["representatives"] == clusters.representatives.tolist()
+    assert clusters.cluster_count == 2
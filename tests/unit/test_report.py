@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pandas as pd
+
+from backend.amr_detection import detect_amr_genes, load_reference as load_amr_reference
+from backend.classify_pathogen import classify_batch, load_reference as load_pathogen_reference
+from backend.query_scan import CatalogSearch, scan_batch
+from backend.report import REPORT_COLUMNS, attach_resistance_risk, build_report, merge_amr_results
+from backend.sequence_batch import SequenceBatch
+
+
+def _legacy_report(batch: SequenceBatch, amr_df, pathogen_df, *, seed: int, metadata: dict) -> pd.DataFrame:
+    """The DataFrame chain build_report replaced: classify, merge AMR rows on id, add risk and metadata, reorder."""
+
+    df = batch.to_dataframe()
+    df["sequence"] = list(batch.iter_sequences())
+    classified = df.copy()
+    for name, values in classify_batch(batch, pathogen_df).items():
+        classified[name] = values
+    merged = merge_amr_results(classified, detect_amr_genes(batch, amr_df))
+    final = attach_resistance_risk(merged, seed=seed).copy()
+    final["sample_id"] = metadata["sample_id"]
+    final["notes"] = metadata["notes"]
+    return final[[name for name in REPORT_COLUMNS if name in final.columns]]
+
+
+def test_build_report_equals_the_legacy_dataframe_chain():
+    batch = SequenceBatch.from_source(Path("data/sample_sequences.fasta"))
+    amr_df = load_amr_reference("data/resistance_genes_reference.csv")
+    pathogen_df = load_pathogen_reference("data/pathogen_reference.csv")
+    metadata = {"sample_id": "S-1", "notes": "bench"}
+
+    scan = scan_batch(
+        batch,
+        pathogen=CatalogSearch.from_dataframe(pathogen_df, "species"),
+        amr=CatalogSearch.from_dataframe(amr_df, "gene_name"),
+    )
+    report = build_report(
+        batch, amr_results=scan.amr, seed=3, species_columns=scan.species, submission_metadata=metadata
+    )
+
+    legacy = _legacy_report(batch, amr_df, pathogen_df, seed=3, metadata=metadata)
+    pd.testing.assert_frame_equal(report, legacy)
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from backend.report_writer import iter_chunks, latest_report_path, update_latest_report, write_report
+
+
+def _report() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": [f"seq_{i}" for i in range(25)],
+            "gc_content": [i / 3 for i in range(25)],
+            "amr_start": [None if i < 10 or i % 2 else i for i in range(25)],
+            "qc_flags": [["short"] if i % 5 == 0 else [] for i in range(25)],
+        }
+    )
+
+
+def test_chunked_csv_matches_a_single_write_and_moves_the_latest_pointer(tmp_path):
+    report = _report()
+
+    paths = write_report(iter_chunks(report, 7), tmp_path, "job-1")
+    update_latest_report(tmp_path, "job-1", paths)
+
+    assert paths["csv"].read_text() == report.to_csv(index=False)
+    assert latest_report_path(tmp_path) == paths["csv"]
+    assert latest_report_path(tmp_path, "parquet") is None
+
+
+def test_parquet_and_arrow_round_trip(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    report = _report()
+
+    # Chunks built separately, as when streaming: amr_start is all empty in the first one.
+    chunks = [pd.DataFrame(chunk.to_dict("list")) for chunk in iter_chunks(report, 10)]
+
+    paths = write_report(chunks, tmp_path, "job-2", ("csv", "parquet", "arrow"))
+
+    parquet = pd.read_parquet(paths["parquet"])
+    with pa.ipc.open_file(paths["arrow"]) as reader:
+        arrow = reader.read_pandas()
+    for frame in (parquet, arrow):
+        assert frame["id"].tolist() == report["id"].tolist()
+        assert frame["gc_content"].tolist() == report["gc_content"].tolist()
+        assert frame["amr_start"].dropna().tolist() == [10, 12, 14, 16, 18, 20, 22, 24]
+        assert [list(flags) for flags in frame["qc_flags"]] == report["qc_flags"].tolist()
+
+
+def test_arrow_schema_does_not_depend_on_the_first_chunk(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    # The first chunk has no QC flags and no AMR coordinates, the second has both.
+    chunks = [
+        pd.DataFrame({"id": ["a", "b"], "qc_flags": [[], []], "amr_start": [None, None], "amr_hit_count": [0, 0]}),
+        pd.DataFrame({"id": ["c"], "qc_flags": [["short"]], "amr_start": [4], "amr_hit_count": [1]}),
+    ]
+
+    paths = write_report(chunks, tmp_path, "job-3", ("parquet", "arrow"))
+
+    parquet = pytest.importorskip("pyarrow.parquet").read_table(paths["parquet"])
+    assert parquet.schema.field("qc_flags").type == pa.list_(pa.string())
+    assert parquet.schema.field("amr_start").type == pa.float64()
+    assert parquet.schema.field("amr_hit_count").type == pa.int64()
+    assert parquet.column("qc_flags").to_pylist() == [[], [], ["short"]]
+    with pa.ipc.open_file(paths["arrow"]) as reader:
+        assert reader.read_all().column("amr_start").to_pylist() == [None, None, 4.0]
@@ -0,0 +1,71 @@
+import random
+
+from backend.amr_detection import detect_amr_genes, load_reference
+from backend.seed_search import SeedIndex
+
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+def _random_sequence(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def test_detect_amr_genes_localises_gene_inside_contig():
+    reference_df = load_reference("data/resistance_genes_reference.csv")
+    gene = reference_df.loc[reference_df["gene_name"] == "tetA", "sequence"].iloc[0]
+    rng = random.Random(7)
+    contig = _random_sequence(rng, 500) + gene + _random_sequence(rng, 700)
+
+    seed_index = SeedIndex.from_dataframe(reference_df)
+    (result,) = detect_amr_genes([{"id": "contig_1", "sequence": contig}], reference_df, seed_index=seed_index)
+
+    assert result["amr_gene"] == "tetA"
+    assert result["amr_identity"] == 100.0
+    assert (result["amr_start"], result["amr_end"]) == (501, 500 + len(gene))
+
+
+def test_reverse_strand_gene_is_located_in_forward_coordinates():
+    reference_df = load_reference("data/resistance_genes_reference.csv")
+    gene = reference_df.loc[reference_df["gene_name"] == "tetA", "sequence"].iloc[0]
+    rng = random.Random(7)
+    contig = _random_sequence(rng, 200) + gene.translate(_COMPLEMENT)[::-1] + _random_sequence(rng, 300)
+
+    seed_index = SeedIndex.from_dataframe(reference_df)
+    (result,) = detect_amr_genes([{"id": "contig_1", "sequence": contig}], reference_df, seed_index=seed_index)
+
+    assert result["amr_gene"] == "tetA"
+    assert result["amr_identity"] == 100.0
+    assert result["amr_strand"] == "-"
+    assert (result["amr_start"], result["amr_end"]) == (201, 200 + len(gene))
+
+
+def test_short_records_keep_whole_sequence_matching():
+    reference_df = load_reference("data/resistance_genes_reference.csv")
+    gene = reference_df["sequence"].iloc[0]
+
+    seeded = detect_amr_genes(
+        [{"id": "isolate", "sequence": gene}], reference_df, seed_index=SeedIndex.from_dataframe(reference_df)
+    )
+
+    assert seeded == detect_amr_genes([{"id": "isolate", "sequence": gene}], reference_df)
+    assert (seeded[0]["amr_start"], seeded[0]["amr_end"]) == (1, len(gene))
+
+
+def test_contig_reports_every_distinct_gene_hit():
+    reference_df = load_reference("data/resistance_genes_reference.csv")
+    genes = dict(reference_df[["gene_name", "sequence"]].itertuples(index=False, name=None))
+    rng = random.Random(11)
+    contig = _random_sequence(rng, 300) + genes["tetA"] + _random_sequence(rng, 400) + genes["blaTEM"]
+    contig += _random_sequence(rng, 200)
+
+    (result,) = detect_amr_genes(
+        [{"id": "contig_1", "sequence": contig}], reference_df, seed_index=SeedIndex.from_dataframe(reference_df)
+    )
+
+    tet_end = 300 + len(genes["tetA"])
+    bla_start = tet_end + 401
+    assert result["amr_hit_count"] == 2
+    assert result["amr_hits"] == (
+        f"tetA:301-{tet_end}:+:100.0:100.0;blaTEM:{bla_start}-{bla_start + len(genes['blaTEM']) - 1}:+:100.0:100.0"
+    )
+    assert result["amr_gene"] in {"tetA", "blaTEM"}
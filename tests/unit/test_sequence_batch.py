@@ -0,0 +1,57 @@
+from io import StringIO
+
+import numpy as np
+
+from backend.report import amr_columns
+from backend.sequence_batch import SequenceBatch
+from backend.sequence_handler import iter_sequences
+
+
+FASTA = ">seq1\nACGTNNACGT\n>seq2\n\n>seq3\nGGGGGGGGGGCC\n"
+
+
+def test_batch_columns_match_record_dicts():
+    batch = SequenceBatch.from_fasta(StringIO(FASTA))
+    records = list(iter_sequences(StringIO(FASTA)))
+
+    assert len(batch) == 3
+    assert [batch.sequence(position) for position in range(3)] == ["ACGTNNACGT", "", "GGGGGGGGGGCC"]
+    assert batch.to_records() == records
+
+
+def test_slice_shares_the_base_buffer():
+    batch = SequenceBatch.from_fasta(StringIO(FASTA))
+
+    tail = batch.slice(1, 3)
+
+    assert np.shares_memory(tail.bases, batch.bases)
+    assert list(tail.ids) == ["seq2", "seq3"]
+    assert tail.sequence(1) == "GGGGGGGGGGCC"
+    assert tail.metrics["longest_homopolymer"].tolist() == [0, 10]
+
+
+def test_streamed_batches_match_the_whole_batch():
+    whole = SequenceBatch.from_fasta(StringIO(FASTA))
+
+    streamed = list(SequenceBatch.iter_source(StringIO(FASTA), 2))
+
+    assert [len(batch) for batch in streamed] == [2, 1]
+    assert [len(batch) for batch in whole.batches(2)] == [2, 1]
+    assert [batch.to_records() for batch in streamed] == [batch.to_records() for batch in whole.batches(2)]
+    assert sum((batch.to_records() for batch in streamed), []) == whole.to_records()
+
+
+def test_sequence_column_reads_the_batch_buffer():
+    whole = SequenceBatch.from_fasta(StringIO(FASTA))
+    tail = whole.slice(1, 3)
+
+    assert list(whole.sequence_column()) == ["ACGTNNACGT", "", "GGGGGGGGGGCC"]
+    assert list(tail.sequence_column()) == ["", "GGGGGGGGGGCC"]
+    assert list(whole.slice(3, 3).sequence_column()) == []
+
+
+def test_amr_columns_fall_back_to_id_lookup():
+    records = [{"id": "b", "amr_gene": "tetA"}, {"id": "a", "amr_gene": "blaTEM"}]
+
+    assert amr_columns(["a", "b"], records) == {"amr_gene": ["blaTEM", "tetA"]}
+    assert amr_columns(["a", "c"], records[::-1]) == {"amr_gene": ["blaTEM", None]}
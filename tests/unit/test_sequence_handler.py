@@ -0,0 +1,73 @@
+import gzip
+from io import BytesIO, StringIO
+
+import pytest
+
+from backend.sequence_handler import (
+    FastaFormatError,
+    FastqFormatError,
+    compute_gc_content,
+    iter_fasta_records,
+    iter_sequences,
+    load_sequences,
+    qc_check_sequence,
+    qc_records,
+)
+
+
+def test_iter_fasta_records_streams_multiline_records():
+    handle = StringIO("\n>seq1 first record\nacgt\nAC GT\n>seq2\n\nTTTT\n")
+
+    records = iter_fasta_records(handle)
+
+    assert next(records) == ("seq1", "ACGTACGT")
+    assert list(records) == [("seq2", "TTTT")]
+
+
+def test_sequence_data_before_first_header_is_rejected():
+    with pytest.raises(FastaFormatError):
+        list(iter_sequences(StringIO("ACGT\n>seq1\nACGT\n")))
+
+
+def test_qc_records_match_single_sequence_helpers():
+    sequences = ["acgtNNRY" * 10, "", "GGGGGGGGGCAT", "AT" * 64]
+
+    results = qc_records(sequences)
+
+    for sequence, result in zip(sequences, results):
+        assert result["gc_content"] == compute_gc_content(sequence)
+        single = qc_check_sequence(sequence)
+        assert {key: result[key] for key in single} == single
+    assert results[0]["ambiguous"] == 20
+    assert results[0]["iupac_ambiguous"] == 20
+    assert results[1]["qc_flags"] == ["too_short"]
+    assert results[2]["longest_homopolymer"] == 9
+    assert results[2]["homopolymer_runs"] == 1
+    assert results[3]["low_complexity_windows"] == 2
+    assert results[0]["qc_flags"] == ["high_ambiguous_content"]
+
+
+def test_gzipped_fastq_is_detected_and_scored():
+    fastq = b"@read1 lane 1\nacgtn\n+\nIII#5\n@read2\nGGCC\n+\n!!!!\n"
+    # bgzip output is a series of gzip members.
+    upload = BytesIO(gzip.compress(fastq[:22]) + gzip.compress(fastq[22:]))
+
+    records = list(iter_sequences(upload))
+
+    assert [record["sequence"] for record in records] == ["ACGTN", "GGCC"]
+    assert records[0]["mean_quality"] == 28.4
+    assert records[0]["q30_fraction"] == 0.6
+    assert records[1]["mean_quality"] == 0.0
+    assert records[0]["qc_flags"] == ["too_short"]
+
+
+def test_fastq_quality_length_mismatch_is_rejected():
+    with pytest.raises(FastqFormatError):
+        list(iter_sequences(StringIO("@read1\nACGT\n+\nII\n")))
+
+
+def test_list_loader_is_deprecated_in_favour_of_the_iterator():
+    with pytest.warns(DeprecationWarning):
+        records = load_sequences(StringIO(">seq1\nACGT\n"))
+
+    assert records == list(iter_sequences(StringIO(">seq1\nACGT\n")))
@@ -0,0 +1,70 @@
+import random
+
+from backend.classify_pathogen import classify_batch
+from backend.sequence_batch import SequenceBatch
+from backend.sketch import SketchIndex, sketch_sequence
+
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+def _genome(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def _mutate(rng: random.Random, sequence: str, rate: float) -> str:
+    bases = list(sequence)
+    for position in rng.sample(range(len(bases)), int(len(bases) * rate)):
+        bases[position] = rng.choice("ACGT".replace(bases[position], ""))
+    return "".join(bases)
+
+
+def test_sketches_are_strand_independent():
+    sequence = _genome(random.Random(1), 5000)
+
+    forward = sketch_sequence(sequence, k=15, scaled=10)
+    reverse = sketch_sequence(sequence.translate(_COMPLEMENT)[::-1], k=15, scaled=10)
+
+    assert len(forward) and forward.tolist() == reverse.tolist()
+
+
+def test_sketch_classification_estimates_identity_and_flags_the_method():
+    rng = random.Random(5)
+    genomes = [("E. coli", _genome(rng, 50_000)), ("S. aureus", _genome(rng, 50_000))]
+    sketches = SketchIndex(genomes, k=21, scaled=50)
+    batch = SequenceBatch.from_pairs([("isolate", _mutate(rng, genomes[1][1], 0.01))])
+
+    columns = classify_batch(batch, sketches=sketches)
+
+    assert columns["predicted_species"] == ["S. aureus"]
+    assert 97.0 <= columns["species_identity"][0] <= 100.0
+    assert columns["species_method"] == ["sketch"]
+
+
+def test_short_references_do_not_outrank_genomes_on_a_chance_hash():
+    rng = random.Random(9)
+    genome = _genome(rng, 50_000)
+    query = _mutate(rng, genome, 0.02)
+    # A fragment sharing a single sketch hash with the query would have had containment 1.0.
+    query_hashes = set(sketch_sequence(query, k=21, scaled=50).tolist())
+    fragment = next(
+        query[start : start + 60]
+        for start in range(0, len(query) - 60, 7)
+        if len(set(sketch_sequence(query[start : start + 60], k=21, scaled=50).tolist()) & query_hashes) == 1
+    )
+    sketches = SketchIndex([("fragment", fragment), ("genome", genome)], k=21, scaled=50)
+
+    label, metrics = sketches.best_match(query)
+
+    assert sketches.skipped == ["fragment"]
+    assert label == "genome"
+    assert 95.0 <= metrics.identity < 100.0
+
+
+def test_ranking_prefers_the_reference_sharing_most_hashes():
+    rng = random.Random(13)
+    genome = _genome(rng, 40_000)
+    sketches = SketchIndex([("half", genome[:20_000]), ("whole", genome)], k=21, scaled=50)
+
+    label, metrics = sketches.best_match(genome)
+
+    assert label == "whole" and metrics.identity == 100.0
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from backend.instrumentation import StageRecorder
+from backend.stage_graph import StageGraph
+
+
+def test_independent_stages_run_concurrently_after_their_inputs():
+    recorder = StageRecorder()
+    graph = StageGraph(recorder, max_workers=4)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def side(value):
+        def run(done):
+            barrier.wait()  # both branches must be running at the same time
+            time.sleep(0.05)
+            return done["source"] + value
+
+        return run
+
+    graph.add("source", lambda done: 1, records=3)
+    graph.add("left", side(10), after=("source",))
+    graph.add("right", side(20), after=("source",))
+    graph.add("join", lambda done: done["left"] + done["right"], after=("left", "right"))
+
+    results = graph.run()
+
+    assert results["join"] == 32
+    described = graph.describe()
+    assert described["critical_path"][0] == "source" and described["critical_path"][-1] == "join"
+    assert recorder.as_dict()["source"]["records"] == 3
+    assert set(recorder.stages) == {"source", "left", "right", "join"}
+
+
+def test_failure_stops_dependent_stages():
+    graph = StageGraph(max_workers=2)
+    ran = []
+
+    def fail(done):
+        raise RuntimeError("boom")
+
+    graph.add("fail", fail)
+    graph.add("after", lambda done: ran.append(True), after=("fail",))
+
+    with pytest.raises(RuntimeError, match="boom"):
+        graph.run()
+    assert not ran
+
+
+def test_dependencies_must_be_declared_first():
+    graph = StageGraph()
+
+    with pytest.raises(ValueError):
+        graph.add("report", lambda done: None, after=("scan",))
@@ -0,0 +1,52 @@
+import csv
+
+import pandas as pd
+
+from backend.report_builder import SummaryAccumulator, build_summary, save_summary_csv
+from backend.report_writer import iter_chunks
+
+
+def _report(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": [f"seq_{i}" for i in range(rows)],
+            "predicted_species": ["Escherichia_coli" if i % 4 else "Salmonella_enterica" for i in range(rows)],
+            "species_identity": [float(i % 101) for i in range(rows)],
+            "amr_gene": ["N/A" if i % 3 else "blaTEM" for i in range(rows)],
+            "amr_identity": [0.0 if i % 3 else 100.0 for i in range(rows)],
+            "qc_flags": [["short"] if i % 5 == 0 else [] for i in range(rows)],
+        }
+    )
+
+
+def test_merged_chunk_summaries_match_a_single_pass():
+    report = _report(250)
+    partials = [SummaryAccumulator().update(chunk) for chunk in iter_chunks(report, chunk_rows=40)]
+    merged = SummaryAccumulator()
+    for partial in partials:
+        merged.merge(partial)
+
+    summary = merged.summary(submission_metadata={"sample_id": "S1"})
+
+    assert summary == build_summary(report, submission_metadata={"sample_id": "S1"})
+    assert summary["sequence_count"] == 250
+    assert dict(summary["qc_flag_counts"]) == {"short": 50}
+    histogram = summary["identity_histograms"]["amr_identity"]
+    # Records without an AMR hit stay out of the identity histogram.
+    assert histogram["90-100"] == 84 and sum(histogram.values()) == 84
+
+
+def test_accumulator_takes_column_mappings(tmp_path):
+    report = _report(12)
+    columns = {name: report[name].tolist() for name in report.columns}
+    summary = SummaryAccumulator().update(columns).summary()
+
+    path = save_summary_csv(summary, tmp_path / "summary.csv")
+    with open(path, newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+
+    counts = {(row["category"], row["name"]): int(row["count"]) for row in rows}
+    assert counts[("species", "Escherichia_coli")] == 9
+    assert counts[("amr_gene", "blaTEM")] == 4
+    assert counts[("qc_flag", "short")] == 3
+    assert sum(count for (category, _), count in counts.items() if category == "species_identity") == 12
@@ -0,0 +1,137 @@
+"""Peak memory of report assembly: the columnar assembler vs the old DataFrame chain.
+
+Run from the repository root::
+
+    python tools/benchmarks/report_memory.py --records 100000
+
+Stage outputs (species columns, AMR results) are synthesised so only the
+assembly itself is measured: AMR results reach the old chain as one dict per
+record and the assembler as columns, as the fused scan emits them. Each
+assembler runs in a fresh process, and the peak of pyarrow's memory pool,
+which ``tracemalloc`` does not see, is reported next to the Python peak.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pandas as pd  # noqa: E402
+
+from backend.report import (  # noqa: E402
+    REPORT_COLUMNS,
+    attach_resistance_risk,
+    build_report,
+    merge_amr_results,
+)
+from backend.sequence_batch import SequenceBatch  # noqa: E402
+
+
+def _inputs(records: int, length: int) -> tuple[SequenceBatch, dict[str, list[object]], list[dict[str, object]]]:
+    rng = random.Random(0)
+    batch = SequenceBatch.from_pairs(
+        (f"seq_{i}", "".join(rng.choice("ACGT") for _ in range(length))) for i in range(records)
+    )
+    species = {
+        "predicted_species": ["Escherichia coli"] * records,
+        "species_identity": [99.0] * records,
+        "species_coverage": [100.0] * records,
+        "species_score": [float(length)] * records,
+        "species_method": ["alignment"] * records,
+    }
+    amr = [
+        {
+            "id": record_id,
+            "amr_gene": "blaTEM",
+            "amr_identity": 98.5,
+            "amr_coverage": 100.0,
+            "amr_score": float(length),
+            "amr_start": 1,
+            "amr_end": length,
+            "amr_strand": "+",
+            "amr_hit_count": 1,
+            "amr_hits": f"blaTEM:1-{length}:+:98.5:100.0",
+            "similarity": 98.5,
+        }
+        for record_id in batch.ids
+    ]
+    return batch, species, amr
+
+
+def legacy_report(
+    batch: SequenceBatch, species: dict[str, list[object]], amr: list[dict[str, object]]
+) -> pd.DataFrame:
+    """The pre-columnar chain: DataFrame, classify copy, merge on id, risk copy, metadata copy, reorder."""
+
+    df = batch.to_dataframe()
+    classified = df.copy()
+    for name, values in species.items():
+        classified[name] = values
+    merged = merge_amr_results(classified, amr)
+    enriched = attach_resistance_risk(merged, seed=1).copy()
+    enriched["sample_id"] = ""
+    enriched["notes"] = ""
+    return enriched[[name for name in REPORT_COLUMNS if name in enriched.columns]]
+
+
+def columnar_report(
+    batch: SequenceBatch, species: dict[str, list[object]], amr: list[dict[str, object]]
+) -> pd.DataFrame:
+    return build_report(batch, amr_results=amr, seed=1, species_columns=species)
+
+
+def _arrow_pool():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow.default_memory_pool()
+
+
+def _measure(label: str, records: int, length: int) -> None:
+    batch, species, amr = _inputs(records, length)
+    if label == "legacy":
+        build, amr_input = legacy_report, amr
+    else:
+        build, amr_input = columnar_report, {name: [row[name] for row in amr] for name in amr[0]}
+    del amr
+    pool = _arrow_pool()
+    arrow_start = pool.bytes_allocated() if pool is not None else 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    build(batch, species, amr_input)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_peak = pool.max_memory() - arrow_start if pool is not None else 0
+    print(f"{label:>9}: peak {peak / 2**20:8.1f} MiB (+{arrow_peak / 2**20:.1f} MiB pyarrow), {elapsed:6.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--length", type=int, default=300)
+    parser.add_argument("--only", choices=("legacy", "columnar"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.only:
+        _measure(args.only, args.records, args.length)
+        return
+    print(f"{args.records} records of {args.length} bases")
+    for label in ("legacy", "columnar"):
+        # A fresh process per assembler, so neither inherits the other's allocations or pool peak.
+        subprocess.run(
+            [sys.executable, __file__, "--records", str(args.records), "--length", str(args.length), "--only", label],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()